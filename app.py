@@ -1,5 +1,3 @@
-import ast
-import json
 import subprocess
 import time
 import uuid
@@ -8,73 +6,59 @@ import streamlit as st
 
 from dotenv import load_dotenv
 
-from src.core.catalog import list_templates, load_template
-from src.core.layout import layout_text
-from src.core.runner import run_openscad
-from src.core.validate import validate_stl
+from src.core.batch import check_job_name
+from src.core.build import build_job, build_job_async
+from src.core.cache import default_cache
+from src.core.catalog import list_templates, load_template, template_registry
+from src.core.jobindex import job_index
+from src.core.metrics import append_metrics
+from src.core.metrics import start as start_metrics
+from src.core.native import native_available
+from src.core.params import apply_emblem_snap, apply_text_layout
+from src.core.preview import ensure_preview
+from src.core.stl_io import read_stl, stl_info
+from src.core.thumbnails import find_thumbnail, submit_thumbnails
+from src.core.workers import default_pool
 from src.intent.router import route_intent
 from streamlit_stl import stl_from_file
-import trimesh
-try:
-    import pyvista as pv
-except Exception:
-    pv = None
 
 
 DEFAULT_OPENSCAD = "openscad"  # on mac: usually in PATH
 
 OUT_DIR = Path(__file__).resolve().parent / "out"
 PLACEHOLDER_STL = Path(__file__).resolve().parent / "templates" / "placeholder.stl"
-TEXT_MARGIN = 0.9
+STL_PAGE_SIZE = 50
+GALLERY_SIZE = 12
+GALLERY_COLUMNS = 4
 
 load_dotenv()
 
 
-def eval_expr(value, params):
-    if isinstance(value, (int, float)):
-        return float(value)
-    if not isinstance(value, str):
-        return 0.0
-
-    def _eval(node):
-        if isinstance(node, ast.Expression):
-            return _eval(node.body)
-        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub, ast.Mult, ast.Div)):
-            left = _eval(node.left)
-            right = _eval(node.right)
-            if isinstance(node.op, ast.Add):
-                return left + right
-            if isinstance(node.op, ast.Sub):
-                return left - right
-            if isinstance(node.op, ast.Mult):
-                return left * right
-            if isinstance(node.op, ast.Div):
-                return left / right if right != 0 else 0.0
-        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
-            val = _eval(node.operand)
-            return val if isinstance(node.op, ast.UAdd) else -val
-        if isinstance(node, ast.Name):
-            return float(params.get(node.id, 0.0))
-        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
-            return float(node.value)
-        return 0.0
-
-    try:
-        parsed = ast.parse(value, mode="eval")
-        return float(_eval(parsed))
-    except Exception:
-        return 0.0
-
 st.set_page_config(page_title="PromptToSTL", layout="wide")
 st.title("PromptToSTL (Local GUI)")
 
 if "preview_nonce" not in st.session_state:
     st.session_state["preview_nonce"] = 0
 
+# Spans recorded during this script run (layout, build) end up in the
+# build's report.json.
+start_metrics()
+
 with st.sidebar:
     st.header("Engine")
     openscad_exe = st.text_input("OpenSCAD executable", value=DEFAULT_OPENSCAD)
     mode = st.radio("Mode", ["Manual", "Describe it"], horizontal=True)
+    use_cache = st.checkbox("Use build cache", value=True)
+    use_pool = st.checkbox("Warm render workers", value=False,
+                           help="Render on long-lived workers that keep their own font cache "
+                                "and have done a throwaway render before the first job.")
+    use_draft = st.checkbox("Draft preview first", value=True,
+                            help="Render a low-poly draft immediately, then the full-quality model in the background.")
+    cache_stats = default_cache().stats()
+    st.caption(
+        f"Cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+        f"{cache_stats['entries']} entries ({cache_stats['bytes'] / 1e6:.1f} MB)"
+    )
 
 templates = list_templates()
 if not templates:
@@ -89,10 +73,7 @@ with colL:
         st.subheader("Describe it")
         description = st.text_area("Describe your object", height=120)
         if st.button("Generate Proposal"):
-            template_map = {}
-            for tid in templates:
-                schema, _ = load_template(tid)
-                template_map[tid] = schema
+            template_map = template_registry().schemas()
             proposal = route_intent(description, template_map)
             st.session_state["intent_proposal"] = proposal
             if hasattr(st, "rerun"):
@@ -112,16 +93,15 @@ with colL:
             notes = proposal.get("notes", "")
             if notes:
                 st.info(notes)
+            if proposal.get("cached"):
+                st.caption("Answered from the intent cache.")
 
             if st.button("Apply to Form"):
                 st.session_state["intent_template_id"] = proposal.get("template_id")
                 st.session_state["intent_params"] = proposal.get("params", {})
                 st.session_state["template_select"] = proposal.get("template_id")
             if st.button("Regenerate"):
-                template_map = {}
-                for tid in templates:
-                    schema, _ = load_template(tid)
-                    template_map[tid] = schema
+                template_map = template_registry().schemas()
                 proposal = route_intent(description, template_map)
                 st.session_state["intent_proposal"] = proposal
                 if hasattr(st, "rerun"):
@@ -177,144 +157,21 @@ with colL:
         st.subheader("Emblem")
         uploaded_svg = st.file_uploader("SVG emblem", type=["svg"])
 
-    layout_debug = None
-    text_box = schema.get("text_box") or {}
-    if text_box and "text_size" in params:
-        max_text_size = float(params.get("text_size", 0))
-        min_text_size = float(schema["params"].get("text_size", {}).get("min", max_text_size))
-        max_lines = int(schema.get("max_lines", 1))
-        box_w = eval_expr(text_box.get("box_w", 0), params)
-        box_h = eval_expr(text_box.get("box_h", 0), params)
-        offset_x = eval_expr(text_box.get("offset_x", 0), params)
-        offset_y = eval_expr(text_box.get("offset_y", 0), params)
-
-        params["offset_x"] = offset_x
-        params["offset_y"] = offset_y
-
-        if template_id == "nameplate":
-            layout_debug = {
-                "lines": [params.get("line1", ""), params.get("line2", ""), params.get("line3", "")],
-                "text_size": params.get("text_size"),
-                "offsets_y": [],
-                "warning": "",
-                "truncated": False,
-            }
-        else:
-            raw_lines = []
-            for key in ("line1", "line2", "line3"):
-                if key in params:
-                    raw_lines.append(str(params.get(key, "")))
-            if not raw_lines and "text" in params:
-                raw_lines = [str(params.get("text", ""))]
-
-            line_gap = float(params.get("line_gap", 0))
-            layout = layout_text(
-                raw_lines,
-                max_lines=max_lines,
-                box_w_mm=box_w,
-                box_h_mm=box_h,
-                max_text_size=max_text_size,
-                min_text_size=min_text_size,
-                margin=TEXT_MARGIN,
-                line_gap_mm=line_gap,
-            )
-            layout_debug = layout
-
-            params["text_size"] = layout["text_size"]
-            if "line_gap" in params and "line_gap_mm" in layout:
-                params["line_gap"] = layout["line_gap_mm"]
-
-            lines = layout["lines"] + ["", "", ""]
-            if "line1" in params:
-                params["line1"] = lines[0]
-            if "line2" in params:
-                params["line2"] = lines[1]
-            if "line3" in params:
-                params["line3"] = lines[2]
-
-            if layout.get("warning"):
-                st.warning(layout["warning"])
-            elif layout.get("truncated"):
-                st.warning("Text was truncated to fit the text box.")
-
-    emblem_snap = params.get("emblem_snap") if isinstance(params.get("emblem_snap"), str) else None
-    if emblem_snap and emblem_snap != "custom":
-        box_w = float(params.get("text_box_w", 0.0))
-        box_h = float(params.get("text_box_h", 0.0))
-        box_off_x = float(params.get("text_box_offset_x", 0.0))
-        box_off_y = float(params.get("text_box_offset_y", 0.0))
-        margin = min(box_w, box_h) * 0.1 if min(box_w, box_h) > 0 else 0.0
-
-        def snap_pos(kind):
-            if kind == "center":
-                return 0.0, 0.0
-            if kind == "left":
-                return -box_w / 2 + margin, 0.0
-            if kind == "right":
-                return box_w / 2 - margin, 0.0
-            if kind == "above_text":
-                return 0.0, box_h / 2 - margin
-            if kind == "below_text":
-                return 0.0, -box_h / 2 + margin
-            if kind == "top_left":
-                return -box_w / 2 + margin, box_h / 2 - margin
-            if kind == "top_right":
-                return box_w / 2 - margin, box_h / 2 - margin
-            if kind == "bottom_left":
-                return -box_w / 2 + margin, -box_h / 2 + margin
-            if kind == "bottom_right":
-                return box_w / 2 - margin, -box_h / 2 + margin
-            return 0.0, 0.0
-
-        snap_x, snap_y = snap_pos(emblem_snap)
-        autocenter = int(params.get("emblem_autocenter", 1)) == 1
-        if emblem_snap == "center" and autocenter:
-            snap_x, snap_y = 0.0, 0.0
-        params["emblem_x"] = snap_x + box_off_x
-        params["emblem_y"] = snap_y + box_off_y
-
-    emblem_snap = params.get("emblem_snap") if isinstance(params.get("emblem_snap"), str) else None
-    if emblem_snap and emblem_snap != "custom":
-        box_w = float(params.get("text_box_w", 0.0))
-        box_h = float(params.get("text_box_h", 0.0))
-        box_off_x = float(params.get("text_box_offset_x", 0.0))
-        box_off_y = float(params.get("text_box_offset_y", 0.0))
-        margin = min(box_w, box_h) * 0.1 if min(box_w, box_h) > 0 else 0.0
-
-        def snap_pos(kind):
-            if kind == "center":
-                return 0.0, 0.0
-            if kind == "left":
-                return -box_w / 2 + margin, 0.0
-            if kind == "right":
-                return box_w / 2 - margin, 0.0
-            if kind == "above_text":
-                return 0.0, box_h / 2 - margin
-            if kind == "below_text":
-                return 0.0, -box_h / 2 + margin
-            if kind == "top_left":
-                return -box_w / 2 + margin, box_h / 2 - margin
-            if kind == "top_right":
-                return box_w / 2 - margin, box_h / 2 - margin
-            if kind == "bottom_left":
-                return -box_w / 2 + margin, -box_h / 2 + margin
-            if kind == "bottom_right":
-                return box_w / 2 - margin, -box_h / 2 + margin
-            return 0.0, 0.0
-
-        snap_x, snap_y = snap_pos(emblem_snap)
-        autocenter = int(params.get("emblem_autocenter", 1)) == 1
-        if emblem_snap == "center" and autocenter:
-            snap_x, snap_y = 0.0, 0.0
-        params["emblem_x"] = snap_x + box_off_x
-        params["emblem_y"] = snap_y + box_off_y
+    layout_debug, text_box_dims = apply_text_layout(template_id, schema, params)
+    if layout_debug and template_id != "nameplate":
+        if layout_debug.get("warning"):
+            st.warning(layout_debug["warning"])
+        elif layout_debug.get("truncated"):
+            st.warning("Text was truncated to fit the text box.")
+
+    apply_emblem_snap(params)
 
     with st.expander("Layout Debug", expanded=False):
         if layout_debug:
-            st.write(f"box_w: {box_w}")
-            st.write(f"box_h: {box_h}")
-            st.write(f"offset_x: {offset_x}")
-            st.write(f"offset_y: {offset_y}")
+            st.write(f"box_w: {text_box_dims['box_w']}")
+            st.write(f"box_h: {text_box_dims['box_h']}")
+            st.write(f"offset_x: {text_box_dims['offset_x']}")
+            st.write(f"offset_y: {text_box_dims['offset_y']}")
             st.write(f"text_size: {layout_debug.get('text_size')}")
             st.write(f"lines: {layout_debug.get('lines')}")
             st.write(f"offsets_y: {layout_debug.get('offsets_y')}")
@@ -335,28 +192,89 @@ with colR:
     use_placeholder = st.checkbox("Use placeholder")
     open_external = st.checkbox("Open in external viewer")
 
-    st.caption("Load STL")
-    stl_files = [p for p in OUT_DIR.rglob("*.stl") if p.resolve() != PLACEHOLDER_STL]
-    stl_files = sorted(stl_files, key=lambda p: p.stat().st_mtime, reverse=True)
-    stl_labels = {}
-    for p in stl_files:
-        rel = p.relative_to(OUT_DIR)
-        job = rel.parts[0] if rel.parts else ""
-        mtime_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(p.stat().st_mtime))
-        label = f"{job}/{p.name} ({mtime_str})"
-        stl_labels[label] = p
-
-    if stl_labels:
-        selected_label = st.selectbox("Select STL", list(stl_labels.keys()))
-        if st.button("Load selected"):
-            st.session_state["last_stl_path"] = str(stl_labels[selected_label])
-            st.session_state["preview_nonce"] += 1
-    else:
-        st.info("No STL files found in /out.")
+    # the job index is only synced (and queried) while the list is shown,
+    # not on every rerun
+    if st.checkbox("Browse built jobs", key="browse_jobs"):
+        index = job_index(OUT_DIR)
+        index.sync()
+        filter_cols = st.columns([1, 1, 1])
+        with filter_cols[0]:
+            filter_template = st.selectbox("Template", ["(all)"] + templates, key="stl_filter_template")
+        with filter_cols[1]:
+            filter_text = st.text_input("Search", key="stl_filter_text")
+        filter_args = {
+            "template_id": None if filter_template == "(all)" else filter_template,
+            "search": filter_text.strip() or None,
+        }
+        total = index.count(**filter_args)
+        pages = max(1, (total + STL_PAGE_SIZE - 1) // STL_PAGE_SIZE)
+        with filter_cols[2]:
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1)
+        stl_labels = {}
+        for row in index.query(limit=STL_PAGE_SIZE, offset=(int(page) - 1) * STL_PAGE_SIZE, **filter_args):
+            p = Path(row["stl_path"])
+            if p == PLACEHOLDER_STL:
+                continue
+            mtime_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["mtime"]))
+            label = f"{row['job']}/{p.name} ({mtime_str})"
+            stl_labels[label] = p
+
+        if stl_labels:
+            selected_label = st.selectbox("Select STL", list(stl_labels.keys()))
+            if st.button("Load selected"):
+                st.session_state["last_stl_path"] = str(stl_labels[selected_label])
+                st.session_state["preview_nonce"] += 1
+        else:
+            st.info("No STL files found in /out.")
+
+        if st.checkbox("Show gallery", key="show_gallery"):
+            gallery = [row for row in index.query(limit=GALLERY_SIZE, **filter_args)
+                       if Path(row["stl_path"]) != PLACEHOLDER_STL]
+            if not gallery:
+                st.caption("No jobs yet.")
+            pending = 0
+            for start in range(0, len(gallery), GALLERY_COLUMNS):
+                for col, row in zip(st.columns(GALLERY_COLUMNS), gallery[start:start + GALLERY_COLUMNS]):
+                    p = Path(row["stl_path"])
+                    with col:
+                        thumb = find_thumbnail(p, 256) if p.exists() else None
+                        if thumb is not None:
+                            st.image(str(thumb))
+                        else:
+                            # older jobs, or a render still in flight: queue it, never render here
+                            if p.exists() and submit_thumbnails(p) is not None:
+                                pending += 1
+                            st.caption("(no thumbnail yet)")
+                        st.caption(f"{row['job']}/{p.name}")
+                        if st.button("Load", key=f"gallery_{row['stl_path']}"):
+                            st.session_state["last_stl_path"] = str(p)
+                            st.session_state["preview_nonce"] += 1
+            if pending:
+                st.caption(f"{pending} thumbnail(s) rendering in the background; refresh to see them.")
 
     if st.button("Refresh preview"):
         st.session_state["preview_nonce"] += 1
 
+    final_future = st.session_state.get("final_future")
+    if final_future is not None and final_future.done():
+        st.session_state.pop("final_future")
+        try:
+            final = final_future.result()
+            st.session_state["last_stl_path"] = final["stl_path"]
+            st.session_state["preview_nonce"] += 1
+            st.success("Final render ready" + (" (from cache)" if final["cache_hit"] else ""))
+        except Exception as e:
+            st.warning(f"Final render failed: {e}")
+    elif final_future is not None:
+        st.info("Showing the draft; the full-quality render replaces it when done.")
+        if hasattr(st, "fragment"):
+            @st.fragment(run_every=2)
+            def _poll_final_render():
+                if st.session_state["final_future"].done():
+                    st.rerun()
+
+            _poll_final_render()
+
     last = st.session_state.get("last_stl_path")
     preview_path = Path(last) if last else None
     if use_placeholder:
@@ -376,14 +294,18 @@ with colR:
 
     if resolved_path and exists:
         try:
-            with resolved_path.open("r", encoding="utf-8", errors="replace") as f:
-                lines = []
-                for _ in range(5):
-                    line = f.readline()
-                    if not line:
-                        break
-                    lines.append(line.rstrip("\n"))
-            st.code("\n".join(lines) if lines else "(file is empty)", language="text")
+            info = stl_info(resolved_path)
+            if info["format"] == "binary":
+                st.code(f"binary STL, {info['triangles']} triangles\nheader: {info['header']}", language="text")
+            else:
+                with resolved_path.open("r", encoding="utf-8", errors="replace") as f:
+                    lines = []
+                    for _ in range(5):
+                        line = f.readline()
+                        if not line:
+                            break
+                        lines.append(line.rstrip("\n"))
+                st.code("\n".join(lines) if lines else "(file is empty)", language="text")
         except Exception as e:
             st.warning(f"Could not read preview lines: {e}")
     else:
@@ -398,70 +320,94 @@ with colR:
             st.info("No preview path available.")
 
     if resolved_path and exists and size > 0:
+        full_res = st.checkbox("Full resolution", value=False, key="preview_full_res",
+                               help="The viewer loads a decimated copy by default; this sends the full mesh.")
+        viewer_path = resolved_path
+        if not full_res and not use_placeholder:
+            try:
+                viewer_path = ensure_preview(resolved_path)
+            except Exception as e:
+                st.warning(f"Preview mesh failed, showing the full STL: {e}")
+        viewer_size = viewer_path.stat().st_size
+        if viewer_path != resolved_path:
+            st.caption(f"Decimated preview: {viewer_size / 1e3:.0f} KB of {size / 1e3:.0f} KB")
         try:
+            t0 = time.perf_counter()
             stl_from_file(
-                str(resolved_path),
+                str(viewer_path),
                 height=500,
-                key=f"stl_{st.session_state['preview_nonce']}",
+                key=f"stl_{st.session_state['preview_nonce']}_{int(full_res)}",
             )
+            if st.session_state.get("preview_logged_nonce") != st.session_state["preview_nonce"]:
+                st.session_state["preview_logged_nonce"] = st.session_state["preview_nonce"]
+                append_metrics({"kind": "preview", "stl": resolved_path.name, "bytes": viewer_size,
+                                "full_bytes": size, "full_res": full_res,
+                                "load_ms": (time.perf_counter() - t0) * 1000.0})
         except Exception as e:
             st.error(f"streamlit_stl failed: {e}")
             try:
-                mesh = trimesh.load_mesh(resolved_path, force="mesh")
-                st.write(f"Bounds: {mesh.bounds.tolist()}")
-                st.write(f"Extents: {mesh.extents.tolist()}")
+                vertices, _ = read_stl(resolved_path)
+                bounds = [vertices.min(axis=0).tolist(), vertices.max(axis=0).tolist()]
+                st.write(f"Bounds: {bounds}")
+                st.write(f"Extents: {(vertices.max(axis=0) - vertices.min(axis=0)).tolist()}")
             except Exception as mesh_err:
-                st.warning(f"trimesh failed: {mesh_err}")
-            if pv is None:
-                st.warning("PyVista is not available for fallback rendering.")
-            else:
-                try:
-                    pv_mesh = pv.read(str(resolved_path))
-                    plotter = pv.Plotter(off_screen=True)
-                    plotter.add_mesh(pv_mesh, color="#d0d0d0")
-                    plotter.view_isometric()
-                    img = plotter.screenshot(None, return_img=True, window_size=(800, 600))
-                    plotter.close()
-                    if img is not None:
-                        st.image(img, caption="Fallback preview (PyVista)")
-                    else:
-                        st.warning("PyVista did not return an image.")
-                except Exception as pv_err:
-                    st.warning(f"PyVista failed: {pv_err}")
+                st.warning(f"STL read failed: {mesh_err}")
+            thumb = None if use_placeholder else find_thumbnail(resolved_path, 512)
+            if thumb is not None:
+                st.image(str(thumb), caption="Fallback preview (thumbnail)")
+            elif not use_placeholder and submit_thumbnails(resolved_path) is not None:
+                st.info("Thumbnail is rendering in the background; use Refresh preview to show it.")
     else:
         st.info("No STL built yet. Click Build STL.")
     
 st.subheader("Output")
 if st.session_state.pop("build_requested", False):
-    job_dir = OUT_DIR / job_name
-    job_dir.mkdir(parents=True, exist_ok=True)
-
-    spec_path = job_dir / "spec.json"
-    stamp = int(time.time() * 1000)
-    stl_path = job_dir / f"model_{stamp}.stl"
+    try:
+        job_dir = OUT_DIR / check_job_name(job_name)
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
     log_path = job_dir / "logs.txt"
-
+    emblem_svg = None
     if template_id in {"keychain_roundrect", "coaster_round", "nameplate"} and uploaded_svg is not None:
-        emblem_path = job_dir / "emblem.svg"
-        emblem_path.write_bytes(uploaded_svg.getvalue())
-        params["emblem_enabled"] = 1
-        params["emblem_path"] = str(emblem_path.resolve())
-
-    spec_path.write_text(json.dumps(
-        {"template_id": template_id, "params": params},
-        indent=2
-    ))
+        emblem_svg = uploaded_svg.getvalue()
 
     try:
-        logs = run_openscad(openscad_exe, scad_path, stl_path, params)
-        st.session_state["last_stl_path"] = str(stl_path)
+        build_args = (openscad_exe, template_id, scad_path, params, job_dir)
+        build_kwargs = dict(emblem_svg=emblem_svg, use_cache=use_cache,
+                            pool=default_pool(openscad_exe) if use_pool else None,
+                            validation=schema.get("validation"),
+                            dependencies=schema.get("dependencies"),
+                            render_config=schema.get("render"),
+                            native=schema.get("native"))
+        previous = st.session_state.pop("final_future", None)
+        if previous is not None:
+            # a final still queued is dropped; one already running finishes
+            # first, since build_job serializes builds into the same job dir
+            previous.cancel()
+        # a native build takes milliseconds, so a draft pass would only add one
+        draft_first = use_draft and not (schema.get("native") and native_available() and emblem_svg is None)
+        if draft_first:
+            built = build_job(*build_args, draft=schema.get("draft", {}), **build_kwargs)
+            st.session_state["final_future"] = build_job_async(*build_args, **build_kwargs)
+        else:
+            built = build_job(*build_args, **build_kwargs)
+        logs = built["logs"]
+        report = built["report"]
+        st.session_state["last_stl_path"] = built["stl_path"]
         st.session_state["preview_nonce"] += 1
-        log_path.write_text(logs)
-
-        report = validate_stl(stl_path)
-        (job_dir / "report.json").write_text(json.dumps(report, indent=2))
 
-        st.success("Build completed")
+        label = "Draft completed; final render running" if draft_first else "Build completed"
+        st.success(label + (" (from cache)" if built["cache_hit"] else ""))
+        render_timings = built["render_timings"]
+        if render_timings:
+            openscad_s = render_timings.get("openscad_render_s")
+            st.caption(f"OpenSCAD: {render_timings['wall_s']:.2f}s wall"
+                       + (f" = {render_timings['startup_s']:.2f}s startup + {openscad_s:.2f}s rendering"
+                          if openscad_s is not None else ""))
+        stage_timings = report.get("stage_timings_ms")
+        if stage_timings:
+            st.caption(" | ".join(f"{k}: {v:.1f} ms" for k, v in stage_timings.items()))
         st.code(logs[-2000:] if len(logs) > 2000 else logs)
 
 
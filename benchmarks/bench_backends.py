@@ -0,0 +1,143 @@
+"""
+Compares OpenSCAD geometry backends (CGAL vs Manifold) per template.
+
+    python -m benchmarks.bench_backends [--openscad EXE] [--repeat N] [--json OUT]
+
+Renders each template's defaults plus a few stress specs on both backends
+and reports wall time, peak RSS of the OpenSCAD process and whether the two
+meshes agree (volume, surface area and bounds). Unix only (os.wait4).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.core.catalog import list_templates, load_template
+from src.core.deps import normalize_params
+from src.core.params import prepare_params
+from src.core.runner import backend_args, build_command
+from src.core.stl_io import read_stl
+from src.core.validate import MeshArrays
+
+BACKENDS = ("cgal", "manifold")
+VOLUME_RTOL = 1e-3
+AREA_RTOL = 1e-2
+BOUNDS_ATOL_MM = 0.05
+
+STRESS = {
+    "long_text": {"line1": "Department of Applied Mathematics and Theoretical Physics"},
+    "engrave": {"emboss": 0, "line1": "ENGRAVED QUALITY"},
+    "emblem": {"emblem_enabled": 1, "emblem_mode": 0, "emblem_scale": 0.2},
+}
+
+
+def _star_svg(path: Path, points: int = 96) -> Path:
+    """
+    Spiky emblem with many short edges: a worst case for CSG.
+    """
+    coords = []
+    for i in range(points * 2):
+        r = 100 if i % 2 == 0 else 45
+        a = math.pi * i / points
+        coords.append(f"{100 + r * math.cos(a):.3f},{100 + r * math.sin(a):.3f}")
+    path.write_text(
+        '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 200 200">'
+        f'<polygon points="{" ".join(coords)}"/></svg>'
+    )
+    return path
+
+
+def render(openscad_exe: str, scad_path: Path, out_stl: Path, params: dict, extra_args) -> dict:
+    cmd = build_command(openscad_exe, scad_path, out_stl, params, extra_args=extra_args)
+    with tempfile.TemporaryFile() as log:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - t0
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    return {"wall_s": wall, "peak_rss_mb": usage.ru_maxrss / 1024.0, "ok": proc.returncode == 0 and out_stl.exists()}
+
+
+def summarize(stl_path: Path) -> dict:
+    vertices, faces = read_stl(stl_path)
+    mesh = MeshArrays(vertices, faces)
+    return {
+        "faces": int(len(faces)),
+        "volume_mm3": abs(mesh.signed_volume),
+        "area_mm2": float(mesh.areas.sum()),
+        "bounds": np.array([vertices.min(axis=0), vertices.max(axis=0)], dtype=np.float64),
+    }
+
+
+def meshes_match(a: dict, b: dict) -> bool:
+    return (
+        math.isclose(a["volume_mm3"], b["volume_mm3"], rel_tol=VOLUME_RTOL)
+        and math.isclose(a["area_mm2"], b["area_mm2"], rel_tol=AREA_RTOL)
+        and bool(np.allclose(a["bounds"], b["bounds"], atol=BOUNDS_ATOL_MM))
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--openscad", default="openscad")
+    parser.add_argument("--templates", nargs="*", default=None)
+    parser.add_argument("--repeat", type=int, default=1, help="Renders per case; the fastest is reported")
+    parser.add_argument("--json", type=Path, default=None, help="Also write results as JSON")
+    args = parser.parse_args(argv)
+
+    available = {b: backend_args(args.openscad, b) for b in BACKENDS}
+    if not available["manifold"]:
+        print("note: this OpenSCAD has no Manifold backend; only CGAL is measured")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_backends_") as tmp:
+        tmp_dir = Path(tmp)
+        emblem = _star_svg(tmp_dir / "emblem.svg")
+        print(f"{'template':<20}{'spec':<12}{'backend':<10}{'wall s':>9}{'rss MB':>9}{'faces':>9}  match")
+        for template_id in args.templates or list_templates():
+            schema, scad_path = load_template(template_id)
+            cases = {"defaults": {}}
+            cases.update(STRESS)
+            for case, overrides in cases.items():
+                raw = dict(overrides)
+                if raw.get("emblem_enabled"):
+                    raw["emblem_path"] = str(emblem)
+                params, _ = prepare_params(template_id, schema, raw)
+                params = normalize_params(params, scad_path, schema.get("dependencies"))
+                meshes, case_rows = {}, []
+                for backend in BACKENDS:
+                    if backend == "manifold" and not available["manifold"]:
+                        continue
+                    out_stl = tmp_dir / f"{template_id}_{case}_{backend}.stl"
+                    runs = [render(args.openscad, scad_path, out_stl, params, available[backend])
+                            for _ in range(max(1, args.repeat))]
+                    best = min(runs, key=lambda r: r["wall_s"])
+                    row = {"template_id": template_id, "case": case, "backend": backend,
+                           "wall_s": best["wall_s"], "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+                           "ok": all(r["ok"] for r in runs)}
+                    if row["ok"]:
+                        meshes[backend] = summarize(out_stl)
+                        row["faces"] = meshes[backend]["faces"]
+                    case_rows.append(row)
+                match = meshes_match(meshes["cgal"], meshes["manifold"]) if len(meshes) == 2 else None
+                for row in case_rows:
+                    row["match"] = match
+                    print(f"{template_id:<20}{case:<12}{row['backend']:<10}{row['wall_s']:>9.2f}"
+                          f"{row['peak_rss_mb']:>9.1f}{row.get('faces', 0):>9}  "
+                          f"{'-' if match is None else ('yes' if match else 'NO')}")
+                results.extend(case_rows)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Microbenchmark for src.core.layout.layout_text.
+
+    python -m benchmarks.bench_layout [--repeat N]
+
+Reports per-call time with the layout memo cleared before every call (cold)
+and with it populated (warm).
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from src.core.layout import clear_layout_cache, layout_text
+
+CORPUS = [
+    ("short", ["EDGE"], 2, 50.0, 14.0),
+    ("two_words", ["EDGE TECH"], 2, 78.0, 78.0),
+    ("long_name", ["Maximilian Alexander Fitzgerald-Worthington"], 2, 42.5, 14.0),
+    ("unbreakable", ["SUPERCALIFRAGILISTICEXPIALIDOCIOUS"], 2, 42.5, 14.0),
+    ("three_lines", ["Department of Applied Mathematics and Theoretical Physics"], 3, 84.0, 18.0),
+    ("three_unbreakable", ["PNEUMONOULTRAMICROSCOPICSILICOVOLCANOCONIOSIS"], 3, 84.0, 30.0),
+]
+
+
+def _time(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<20}{'cold us':>12}{'warm us':>12}")
+    for name, lines, max_lines, box_w, box_h in CORPUS:
+        def call():
+            return layout_text(lines, max_lines=max_lines, box_w_mm=box_w, box_h_mm=box_h,
+                               max_text_size=30, min_text_size=6, margin=0.9, line_gap_mm=8)
+
+        def cold():
+            clear_layout_cache()
+            call()
+
+        cold_s = _time(cold, args.repeat)
+        call()
+        warm_s = _time(call, args.repeat)
+        print(f"{name:<20}{cold_s * 1e6:>12.1f}{warm_s * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the openscad CLI used by the benchmark suite.
+
+Accepts the flags the runner passes (-o, --export-format, -D, --backend,
+--version, --help) and writes a deterministic closed box mesh sized from
+the w/h/th or diameter defines, so the rest of the pipeline (validation,
+STL loading, caching) sees realistic input without OpenSCAD installed.
+Composition parts (-D part=...) get a slab on top ("text", "overlay") or
+a small through-cut ("cut") instead of the plate.
+"""
+import struct
+import sys
+import time
+
+SUBDIV = 48  # faces per box side = 2 * SUBDIV**2
+
+
+def _defines(argv):
+    out = {}
+    for i, arg in enumerate(argv):
+        if arg == "-D" and i + 1 < len(argv):
+            key, _, value = argv[i + 1].partition("=")
+            try:
+                out[key] = float(value)
+            except ValueError:
+                out[key] = value.strip('"')
+    return out
+
+
+def _box_triangles(sx, sy, sz, n, z0=0.0):
+    # Each face is an n x n grid; corners are generated from integer grid
+    # coordinates so shared edges line up exactly.
+    def point(axis, sign, u, v):
+        a, b = u / n, v / n
+        if axis == 0:
+            p = (sign, a * 2 - 1, b * 2 - 1)
+        elif axis == 1:
+            p = (b * 2 - 1, sign, a * 2 - 1)
+        else:
+            p = (a * 2 - 1, b * 2 - 1, sign)
+        return (p[0] * sx / 2, p[1] * sy / 2, p[2] * sz / 2 + sz / 2 + z0)
+
+    for axis in range(3):
+        for sign in (-1, 1):
+            for u in range(n):
+                for v in range(n):
+                    p00, p10 = point(axis, sign, u, v), point(axis, sign, u + 1, v)
+                    p01, p11 = point(axis, sign, u, v + 1), point(axis, sign, u + 1, v + 1)
+                    if sign > 0:
+                        yield p00, p10, p11
+                        yield p00, p11, p01
+                    else:
+                        yield p00, p11, p10
+                        yield p00, p01, p11
+
+
+def main(argv):
+    if "--version" in argv:
+        print("OpenSCAD version 0.0.0-stub", file=sys.stderr)
+        return 0
+    if "--help" in argv:
+        print("Usage: openscad [options] file.scad\n  --backend arg  3D rendering backend", file=sys.stderr)
+        return 0
+    t0 = time.perf_counter()
+    out = argv[argv.index("-o") + 1]
+    d = _defines(argv)
+    sx = float(d.get("w", d.get("diameter", 80)))
+    sy = float(d.get("h", d.get("diameter", 30)))
+    sz = float(d.get("th", 4))
+    part = d.get("part", "all")
+    if part in ("text", "overlay"):
+        # a slab standing on the top face, like embossed text
+        tris = list(_box_triangles(sx * 0.6, sy * 0.3, 1.0, SUBDIV, z0=sz))
+    elif part == "cut":
+        tris = list(_box_triangles(sx * 0.05, sy * 0.2, sz + 0.2, SUBDIV // 4, z0=-0.1))
+    else:
+        tris = list(_box_triangles(sx, sy, sz, SUBDIV))
+    with open(out, "wb") as f:
+        f.write(b"stub".ljust(80, b"\0"))
+        f.write(struct.pack("<I", len(tris)))
+        pack = struct.Struct("<12fH").pack
+        for a, b, c in tris:
+            f.write(pack(0.0, 0.0, 0.0, *a, *b, *c, 0))
+    elapsed = time.perf_counter() - t0
+    print(f"Total rendering time: 0:00:{elapsed:06.3f}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
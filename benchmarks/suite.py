@@ -0,0 +1,222 @@
+"""
+Benchmark suite for the build pipeline with JSON baselines.
+
+    python -m benchmarks.suite run [--openscad EXE] [--repeat N] [--filter TEXT] [--out FILE] [--save]
+    python -m benchmarks.suite compare CURRENT [--baseline FILE] [--threshold 0.2]
+
+"run" times layout_text, eval_expr, prepare_params, run_openscad, STL
+loading, validate_stl, build_job and (when available) the native geometry
+backend over fixed corpora (short/long/
+unbreakable names, 1-3 lines, emblem on/off, every template). Without
+--openscad it renders with benchmarks/stub_openscad.py, so the numbers
+cover the Python side only. "compare" exits non-zero when any case's
+median is slower than the baseline by more than the threshold.
+
+Timings are absolute and only comparable on one machine, so baselines are
+not committed: "run --save" writes benchmarks/baselines/<stub|openscad>.json
+(git-ignored) and "compare" uses the matching one unless --baseline is given.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.core.build import build_job
+from src.core.cache import openscad_version
+from src.core.catalog import list_templates, load_template
+from src.core.deps import normalize_params
+from src.core.layout import clear_layout_cache, layout_text
+from src.core.native import build_native, native_available
+from src.core.params import eval_expr, prepare_params
+from src.core.runner import run_openscad
+from src.core.stl_io import read_stl
+from src.core.validate import validate_stl
+
+BENCH_DIR = Path(__file__).resolve().parent
+STUB_OPENSCAD = BENCH_DIR / "stub_openscad.py"
+BASELINE_DIR = BENCH_DIR / "baselines"
+DEFAULT_THRESHOLD = 0.2
+
+NAMES = {
+    "short": ["EDGE"],
+    "long": ["Maximilian Alexander Fitzgerald-Worthington"],
+    "unbreakable": ["SUPERCALIFRAGILISTICEXPIALIDOCIOUS"],
+    "two_lines": ["ACME Robotics", "Building 7"],
+    "three_lines": ["Department of", "Applied Mathematics", "and Theoretical Physics"],
+}
+EMBLEM_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100">'
+    '<path d="M50 5 L61 39 L97 39 L68 60 L79 95 L50 74 L21 95 L32 60 L3 39 L39 39 Z"/></svg>'
+)
+
+
+def _lines_params(lines: List[str]) -> dict:
+    return {f"line{i + 1}": line for i, line in enumerate(lines)}
+
+
+def _measure(fn: Callable[[], object], repeat: int, min_time: float = 0.0) -> Dict[str, float]:
+    samples = []
+    t_end = time.perf_counter() + min_time
+    while len(samples) < repeat or time.perf_counter() < t_end:
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return {
+        "median_us": statistics.median(samples) * 1e6,
+        "min_us": min(samples) * 1e6,
+        "n": len(samples),
+    }
+
+
+def cases(openscad_exe: str, work_dir: Path) -> List[Tuple[str, Callable[[], object], bool]]:
+    """
+    (name, fn, slow) for every benchmark case. Slow cases spawn OpenSCAD and
+    get fewer repetitions.
+    """
+    out = []
+    emblem = work_dir / "emblem.svg"
+    emblem.write_text(EMBLEM_SVG)
+
+    for name, lines in NAMES.items():
+        def cold_layout(lines=lines):
+            clear_layout_cache()
+            layout_text(lines, max_lines=3, box_w_mm=84, box_h_mm=18, max_text_size=14,
+                        min_text_size=6, margin=0.9, line_gap_mm=8)
+        out.append((f"layout_text/{name}", cold_layout, False))
+
+    for template_id in list_templates():
+        schema, scad_path = load_template(template_id)
+        defaults, _ = prepare_params(template_id, schema, {})
+        exprs = [v for v in (schema.get("text_box") or {}).values() if isinstance(v, str)]
+        if exprs:
+            out.append((f"eval_expr/{template_id}", lambda exprs=exprs, p=defaults: [eval_expr(e, p) for e in exprs],
+                        False))
+
+        for name, lines in NAMES.items():
+            for emblem_on in (False, True):
+                raw = _lines_params(lines)
+                if emblem_on:
+                    raw.update(emblem_enabled=1, emblem_path=str(emblem), emblem_snap="center")
+                tag = f"{template_id}/{name}{'+emblem' if emblem_on else ''}"
+
+                def prep(raw=raw, template_id=template_id, schema=schema):
+                    clear_layout_cache()
+                    prepare_params(template_id, schema, raw)
+                out.append((f"prepare_params/{tag}", prep, False))
+
+        params = normalize_params(defaults, scad_path, schema.get("dependencies"))
+        stl = work_dir / f"{template_id}.stl"
+        out.append((f"run_openscad/{template_id}",
+                    lambda s=scad_path, o=stl, p=params: run_openscad(openscad_exe, s, o, p), True))
+        out.append((f"read_stl/{template_id}", lambda o=stl: read_stl(o), False))
+        out.append((f"validate_stl/{template_id}",
+                    lambda o=stl, v=schema.get("validation"): validate_stl(o, v), False))
+        out.append((f"build_job/{template_id}",
+                    lambda t=template_id, s=scad_path, p=defaults, sc=schema: build_job(
+                        openscad_exe, t, s, p, work_dir / f"job_{t}", use_cache=False,
+                        validation=sc.get("validation"), dependencies=sc.get("dependencies"),
+                        render_config=sc.get("render"), thumbnails=False), True))
+        if schema.get("native") and native_available():
+            out.append((f"build_native/{template_id}",
+                        lambda m=schema["native"]["model"], s=scad_path, p=params: build_native(m, s, p), False))
+    return out
+
+
+def run(openscad_exe: Optional[str], repeat: int, slow_repeat: int, name_filter: Optional[str]) -> dict:
+    exe = openscad_exe or str(STUB_OPENSCAD)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_suite_") as tmp:
+        for name, fn, slow in cases(exe, Path(tmp)):
+            if name_filter and name_filter not in name:
+                continue
+            fn()  # warm-up; also produces the STL the load/validate cases read
+            results[name] = _measure(fn, slow_repeat if slow else repeat)
+            print(f"{name:<55}{results[name]['median_us']:>14.1f} us", flush=True)
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "openscad": "stub" if openscad_exe is None else openscad_version(openscad_exe),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def baseline_path(result: dict) -> Path:
+    """
+    The local baseline file for results from the stub or a real OpenSCAD.
+    """
+    kind = "stub" if result.get("meta", {}).get("openscad") == "stub" else "openscad"
+    return BASELINE_DIR / f"{kind}.json"
+
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    """
+    Per-case ratio of current to baseline median; "regressed" when the
+    ratio exceeds 1 + threshold.
+    """
+    rows = []
+    base = baseline.get("results", {})
+    for name, cur in sorted(current.get("results", {}).items()):
+        if name not in base:
+            continue
+        ratio = cur["median_us"] / base[name]["median_us"] if base[name]["median_us"] > 0 else 1.0
+        rows.append({"name": name, "baseline_us": base[name]["median_us"], "current_us": cur["median_us"],
+                     "ratio": ratio, "regressed": ratio > 1.0 + threshold})
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_run = sub.add_parser("run", help="Run the suite and write results JSON")
+    p_run.add_argument("--openscad", default=None, help="Real OpenSCAD executable (default: offline stub)")
+    p_run.add_argument("--repeat", type=int, default=50, help="Repetitions for in-process cases")
+    p_run.add_argument("--slow-repeat", type=int, default=5, help="Repetitions for cases that spawn OpenSCAD")
+    p_run.add_argument("--filter", default=None, help="Only cases whose name contains this text")
+    p_run.add_argument("--out", type=Path, default=None, help="Results file (default: print only)")
+    p_run.add_argument("--save", action="store_true", help="Also save as this machine's baseline")
+    p_cmp = sub.add_parser("compare", help="Compare results against a baseline")
+    p_cmp.add_argument("current", type=Path)
+    p_cmp.add_argument("--baseline", type=Path, default=None,
+                       help="Baseline results (default: the one saved by run --save)")
+    p_cmp.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                       help="Allowed slowdown as a fraction (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        result = run(args.openscad, args.repeat, args.slow_repeat, args.filter)
+        outs = [args.out] if args.out else []
+        if args.save:
+            outs.append(baseline_path(result))
+        for out in outs:
+            out.parent.mkdir(parents=True, exist_ok=True)
+            out.write_text(json.dumps(result, indent=2, sort_keys=True))
+            print(f"wrote {out}", file=sys.stderr)
+        return 0
+
+    current = json.loads(args.current.read_text())
+    baseline_file = args.baseline or baseline_path(current)
+    if not baseline_file.exists():
+        print(f"no baseline at {baseline_file}; run the suite with --save on this machine first", file=sys.stderr)
+        return 2
+    rows = compare(json.loads(baseline_file.read_text()), current, args.threshold)
+    for row in rows:
+        flag = "  REGRESSED" if row["regressed"] else ""
+        print(f"{row['name']:<55}{row['baseline_us']:>12.1f}{row['current_us']:>12.1f}{row['ratio']:>8.2f}x{flag}")
+    regressed = [r for r in rows if r["regressed"]]
+    print(f"{len(regressed)} of {len(rows)} cases slower than {1 + args.threshold:.2f}x baseline", file=sys.stderr)
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.core.build import build_job
+from src.core.catalog import load_template
+from src.core.params import prepare_params, prepare_params_many
+
+OUT_DIR = Path(__file__).resolve().parents[2] / "out"
+PREPARE_CHUNK = 256
+
+
+def read_rows(path: Path) -> List[Dict[str, Any]]:
+    """
+    Reads batch rows from JSONL ({"template_id", "params", "job_name"?}) or
+    CSV (template_id and optional job_name columns, every other non-empty
+    column is a param; a "params" column holding JSON is merged in).
+    """
+    path = Path(path)
+    rows = []
+    if path.suffix.lower() == ".csv":
+        with path.open(newline="", encoding="utf-8") as f:
+            for rec in csv.DictReader(f):
+                params = {}
+                if rec.get("params"):
+                    params.update(json.loads(rec["params"]))
+                for key, value in rec.items():
+                    if key in {"template_id", "job_name", "params"} or value in (None, ""):
+                        continue
+                    params[key] = value
+                row = {"template_id": (rec.get("template_id") or "").strip(), "params": params}
+                if rec.get("job_name"):
+                    row["job_name"] = rec["job_name"].strip()
+                rows.append(row)
+        return rows
+
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rows.append(json.loads(line))
+    return rows
+
+
+def check_job_name(job_name: str) -> str:
+    """
+    job_name if it is a single plain directory name; raises ValueError for
+    anything that would resolve outside the output directory (path
+    separators, "." or "..", drive prefixes).
+    """
+    name = str(job_name)
+    if not name.strip() or name in {".", ".."} or any(sep in name for sep in ("/", "\\", ":", "\0")):
+        raise ValueError(f"Invalid job_name {job_name!r}: must be a plain directory name")
+    return name
+
+
+def build_row(index: int, row: Dict[str, Any], openscad_exe: str, out_dir: str, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Runs the full param pipeline and build for one row. Never raises; failures
+    are reported in the result. A row that carries "prepared" (params,
+    layout) from prepare_rows skips the param pipeline.
+    """
+    t0 = time.perf_counter()
+    template_id = str(row.get("template_id", ""))
+    job_name = row.get("job_name") or f"{template_id}_{uuid.uuid4().hex[:8]}"
+    result: Dict[str, Any] = {"index": index, "template_id": template_id, "job_name": job_name}
+    try:
+        schema, scad_path = load_template(template_id)
+        t1 = time.perf_counter()
+        prepared = row.get("prepared")
+        if prepared is not None:
+            params, layout = prepared
+        else:
+            params, layout = prepare_params(template_id, schema, row.get("params") or {})
+        t2 = time.perf_counter()
+        built = build_job(openscad_exe, template_id, scad_path, params, Path(out_dir) / check_job_name(job_name),
+                          use_cache=use_cache, validation=schema.get("validation"),
+                          dependencies=schema.get("dependencies"), render_config=schema.get("render"),
+                          compose=schema.get("compose"), native=schema.get("native"))
+        result.update({
+            "ok": bool(built["report"].get("ok")),
+            "stl_path": built["stl_path"],
+            "report_path": built["report_path"],
+            "report": built["report"],
+            "cache_hit": built["cache_hit"],
+            "warning": (layout or {}).get("warning", ""),
+            "timings": {
+                "load_s": t1 - t0,
+                "params_s": t2 - t1,
+                "build_s": built["render_s"],
+                "total_s": time.perf_counter() - t0,
+            },
+        })
+    except Exception as e:
+        result.update({
+            "ok": False,
+            "error": str(e),
+            "traceback": traceback.format_exc(),
+            "timings": {"total_s": time.perf_counter() - t0},
+        })
+    return result
+
+
+def prepare_rows(chunk: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Runs the param pipeline for a chunk of (index, row) pairs with one
+    vectorized text-box pass per template (see prepare_params_many) and
+    returns copies of the rows carrying the result as "prepared". Rows that
+    already carry it (e.g. from plan_sweep) and rows of a template that
+    fails to load or prepare are returned as they were; build_row prepares
+    and reports the latter.
+    """
+    by_template: Dict[str, List[int]] = {}
+    for pos, (_, row) in enumerate(chunk):
+        if "prepared" in row:
+            continue
+        by_template.setdefault(str(row.get("template_id", "")), []).append(pos)
+    out = list(chunk)
+    for template_id, positions in by_template.items():
+        try:
+            schema, _ = load_template(template_id)
+            prepared = prepare_params_many(template_id, schema, [chunk[p][1].get("params") or {} for p in positions])
+        except Exception:
+            continue
+        for pos, item in zip(positions, prepared):
+            index, row = chunk[pos]
+            out[pos] = (index, dict(row, prepared=item))
+    return out
+
+
+def run_batch(
+    rows: Iterable[Dict[str, Any]],
+    openscad_exe: str = "openscad",
+    out_dir: Path = OUT_DIR,
+    workers: Optional[int] = None,
+    use_cache: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Builds rows on a process pool and yields each result as soon as it
+    finishes (not in input order). At most 2 * workers rows are in flight.
+    Params are prepared here, PREPARE_CHUNK rows at a time (see
+    prepare_rows), so workers only build.
+    """
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    pending = set()
+    row_iter = iter(enumerate(rows))
+    ready: deque = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def fill():
+            while len(pending) < 2 * workers:
+                if not ready:
+                    chunk = list(itertools.islice(row_iter, PREPARE_CHUNK))
+                    if not chunk:
+                        return
+                    ready.extend(prepare_rows(chunk))
+                index, row = ready.popleft()
+                pending.add(pool.submit(build_row, index, row, openscad_exe, str(out_dir), use_cache))
+
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                pending.discard(fut)
+                yield fut.result()
+            fill()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build many STLs from a CSV/JSONL of {template_id, params} rows.")
+    parser.add_argument("rows", type=Path, help="CSV or JSONL file")
+    parser.add_argument("--openscad", default="openscad", help="OpenSCAD executable")
+    parser.add_argument("--out", type=Path, default=OUT_DIR, help="Output directory for job dirs")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--results", type=Path, default=None, help="Also append JSONL results to this file")
+    parser.add_argument("--no-cache", action="store_true", help="Always render, bypassing the build cache")
+    args = parser.parse_args(argv)
+
+    rows = read_rows(args.rows)
+    results_file = args.results.open("a", encoding="utf-8") if args.results else None
+    t0 = time.perf_counter()
+    failed = 0
+    try:
+        for result in run_batch(rows, args.openscad, args.out, args.workers, not args.no_cache):
+            line = json.dumps(result)
+            print(line, flush=True)
+            if results_file:
+                results_file.write(line + "\n")
+                results_file.flush()
+            if not result.get("ok"):
+                failed += 1
+    finally:
+        if results_file:
+            results_file.close()
+    print(f"{len(rows) - failed}/{len(rows)} built in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.core.cache import cached_build
+from src.core.compose import compose_available, compose_key, compose_render
+from src.core.deps import normalize_params
+from src.core.emblem import prepare_emblem
+from src.core.jobindex import job_index
+from src.core.metrics import append_metrics, recording, span
+from src.core.native import native_available, native_key, native_render
+from src.core.params import draft_params
+from src.core.preview import ensure_preview
+from src.core.runner import render_args, run_openscad
+from src.core.thumbnails import submit_thumbnails
+from src.core.validate import validate_stl
+from src.core.workers import RenderThreadPool
+
+
+_dir_locks: Dict[str, List[Any]] = {}
+_dir_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _job_dir_lock(job_dir: Path) -> Iterator[None]:
+    """
+    Serializes builds into the same job dir within this process, e.g. a
+    new draft and the previous build's final render still running in the
+    background; both write spec.json, logs.txt, report.json and emblem.svg.
+    """
+    key = str(Path(job_dir).resolve())
+    with _dir_locks_guard:
+        entry = _dir_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _dir_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _dir_locks[key]
+
+
+def build_job(
+    openscad_exe: str,
+    template_id: str,
+    scad_path: Path,
+    params: Dict[str, Any],
+    job_dir: Path,
+    emblem_svg: Optional[bytes] = None,
+    use_cache: bool = True,
+    pool: Optional[RenderThreadPool] = None,
+    validation: Optional[dict] = None,
+    dependencies: Optional[dict] = None,
+    draft: Optional[dict] = None,
+    render_config: Optional[dict] = None,
+    compose: Optional[dict] = None,
+    native: Optional[dict] = None,
+    thumbnails: bool = True,
+) -> Dict[str, Any]:
+    """
+    Writes spec.json, renders the STL and writes logs.txt and report.json
+    into job_dir. params must already be prepared (see prepare_params).
+    With a pool, the OpenSCAD process runs on one of its warm workers and
+    its timings (wall, startup and rendering) are returned as
+    render_timings. Per-stage
+    durations and peak RSS (of this build's OpenSCAD processes, and this
+    process's lifetime high-water mark) go into report.json when metrics
+    are enabled (see src/core/metrics.py). validation is the template's
+    "validation" config (see validate_stl). Params that cannot change the mesh
+    are dropped before rendering and hashing (see normalize_params), so
+    builds that differ only in those hit the cache. draft (the template's
+    "draft" block, {} for the defaults) makes this a low-poly draft render,
+    written as model_<stamp>_draft.stl and cached apart from the final
+    render. render_config is the template's "render" block (backend and
+    extra OpenSCAD flags, see render_args). compose is the template's
+    "compose" block: final renders then reuse cached body parts and only
+    render the text (see compose_render) when manifold3d is installed.
+    Only batch runs pass it; one-off builds from the app and the service
+    render whole models.
+    native is the template's "native" block: with manifold3d, fontTools and
+    a font available, the model is built in-process instead of by OpenSCAD
+    (see native_render), which still handles what that cannot build.
+    emblem_svg is flattened and simplified once per distinct upload (see
+    prepare_emblem); the upload itself is kept as emblem_original.svg.
+    A decimated preview mesh for the viewer is written alongside (see
+    ensure_preview); its path is returned as preview_path. Unless
+    thumbnails is False, isometric PNG thumbnails are then rendered off the
+    caller's thread into <job>/thumbs/ (see submit_thumbnails). Builds
+    into the same job_dir run one at a time.
+    Raises RuntimeError when OpenSCAD fails.
+    """
+    with _job_dir_lock(job_dir):
+        return _build_job(openscad_exe, template_id, scad_path, params, job_dir, emblem_svg, use_cache, pool,
+                          validation, dependencies, draft, render_config, compose, native, thumbnails)
+
+
+def _build_job(openscad_exe, template_id, scad_path, params, job_dir, emblem_svg, use_cache, pool,
+               validation, dependencies, draft, render_config, compose, native, thumbnails) -> Dict[str, Any]:
+    job_dir = Path(job_dir)
+    job_dir.mkdir(parents=True, exist_ok=True)
+    params = dict(params)
+
+    spec_path = job_dir / "spec.json"
+    stamp = int(time.time() * 1000)
+    stl_path = job_dir / f"model_{stamp}{'_draft' if draft is not None else ''}.stl"
+    log_path = job_dir / "logs.txt"
+    report_path = job_dir / "report.json"
+
+    with recording() as rec:
+        with span("build.spec_write"):
+            if emblem_svg is not None:
+                emblem_path = job_dir / "emblem.svg"
+                with span("build.emblem"):
+                    prepared = prepare_emblem(emblem_svg)
+                emblem_path.write_bytes(prepared)
+                if prepared is not emblem_svg:
+                    (job_dir / "emblem_original.svg").write_bytes(emblem_svg)
+                params["emblem_enabled"] = 1
+                params["emblem_path"] = str(emblem_path.resolve())
+
+            render_params = normalize_params(params, scad_path, dependencies)
+            if draft is not None:
+                render_params = draft_params(render_params, draft)
+            extra_args = render_args(openscad_exe, render_config)
+            composed = bool(compose) and draft is None and compose_available()
+            use_native = bool(native) and native_available()
+            spec_path.write_text(json.dumps(
+                {"template_id": template_id, "params": params, "render_params": render_params,
+                 "quality": "draft" if draft is not None else "final", "render_args": extra_args,
+                 "composed": composed, "native": use_native},
+                indent=2
+            ))
+
+        render_timings: Dict[str, float] = {}
+        if pool is None:
+            render = partial(run_openscad, extra_args=extra_args)
+        else:
+            render = partial(pool.run_openscad, timings=render_timings, extra_args=extra_args)
+        if composed:
+            render = partial(compose_render, compose=compose, render=render, extra_args=extra_args)
+        if use_native:
+            render = partial(native_render, native=native, render=render)
+
+        key_extra: Dict[str, Any] = {}
+        if composed:
+            key_extra.update(compose_key(compose))
+        if use_native:
+            key_extra.update(native_key())
+
+        t0 = time.perf_counter()
+        with span("build.render"):
+            if use_cache:
+                logs, report, cache_hit = cached_build(openscad_exe, scad_path, stl_path, render_params,
+                                                       render=render, validation=validation,
+                                                       extra_args=extra_args, key_extra=key_extra)
+            else:
+                logs = render(openscad_exe, scad_path, stl_path, render_params)
+                report = validate_stl(stl_path, validation)
+                cache_hit = False
+        render_s = time.perf_counter() - t0
+
+        with span("build.write_outputs"):
+            log_path.write_text(logs)
+
+        preview = None
+        if stl_path.exists():
+            try:
+                with span("build.preview"):
+                    preview = ensure_preview(stl_path)
+            except (OSError, ValueError):
+                pass  # the viewer falls back to the full STL
+
+    if rec is not None:
+        metrics = rec.summary()
+        report = dict(report, stage_timings_ms=metrics["stages_ms"], peak_rss_mb=metrics["peak_rss_mb"])
+        append_metrics(dict(metrics, kind="build", template_id=template_id, job=job_dir.name,
+                            cache_hit=cache_hit, render_s=render_s,
+                            quality="draft" if draft is not None else "final"))
+    report_path.write_text(json.dumps(report, indent=2))
+    try:
+        job_index(job_dir.parent).record(job_dir, stl_path, template_id, render_params, report)
+    except (OSError, sqlite3.Error):
+        pass  # the index catches up on its next sync()
+    if thumbnails and stl_path.exists():
+        submit_thumbnails(stl_path)
+
+    return {
+        "stl_path": str(stl_path),
+        "preview_path": str(preview) if preview is not None else None,
+        "report_path": str(report_path),
+        "log_path": str(log_path),
+        "logs": logs,
+        "report": report,
+        "cache_hit": cache_hit,
+        "render_s": render_s,
+        "render_timings": render_timings,
+        "render_params": render_params,
+    }
+
+
+_background: Optional[ThreadPoolExecutor] = None
+_background_lock = threading.Lock()
+
+
+def build_job_async(*args, **kwargs) -> Future:
+    """
+    Runs build_job on a small background thread pool, e.g. the full-quality
+    render that follows a draft. The future resolves to build_job's result.
+    """
+    global _background
+    with _background_lock:
+        if _background is None:
+            _background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="final-render")
+    return _background.submit(build_job, *args, **kwargs)
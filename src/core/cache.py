@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from src.core.runner import DEFAULT_EXPORT_FORMAT, run_openscad
+from src.core.validate import validate_stl
+
+CACHE_DIR = Path(__file__).resolve().parents[2] / ".build_cache"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_MAX_ENTRIES = 5000
+
+STL_NAME = "model.stl"
+LOGS_NAME = "logs.txt"
+REPORT_NAME = "report.json"
+MARKS_DIR = ".marks"
+
+_IMPORT_VAR_RE = re.compile(r"\bimport\s*\(\s*(?:file\s*=\s*)?([A-Za-z_]\w*)\s*[,)]")
+_IMPORT_LIT_RE = re.compile(r"\bimport\s*\(\s*(?:file\s*=\s*)?\"([^\"]+)\"")
+_USE_RE = re.compile(r"^\s*(?:use|include)\s*<([^>]+)>", re.MULTILINE)
+
+
+@lru_cache(maxsize=16)
+def openscad_version(openscad_exe: str) -> str:
+    try:
+        p = subprocess.run([openscad_exe, "--version"], capture_output=True, text=True, timeout=30)
+    except Exception:
+        return "unavailable"
+    text = ((p.stdout or "") + (p.stderr or "")).strip()
+    return text.splitlines()[-1] if text else "unknown"
+
+
+def _file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def import_params(scad_source: str) -> set:
+    """
+    Names of variables passed to import() in a scad file (e.g. emblem_path).
+    """
+    return set(_IMPORT_VAR_RE.findall(scad_source))
+
+
+def _scad_dependencies(scad_path: Path, source: str) -> Iterable[Path]:
+    base = scad_path.parent
+    for rel in _USE_RE.findall(source) + _IMPORT_LIT_RE.findall(source):
+        dep = (base / rel).resolve()
+        if dep.exists():
+            yield dep
+
+
+def _canonical_value(value: Any) -> Any:
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return repr(float(value))
+    if value is None:
+        return None
+    return str(value)
+
+
+def canonical_params(params: Dict[str, Any], file_params: Iterable[str] = (),
+                     file_digests: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Params normalized so that 12 and 12.0 hash alike, and file params are
+    replaced by the digest of the file they point to instead of its path.
+    file_digests gives the sha256 for file params whose content is known
+    but not (yet) on disk, e.g. an uploaded emblem.
+    """
+    file_params = set(file_params)
+    file_digests = file_digests or {}
+    out = {}
+    for key in sorted(params):
+        value = params[key]
+        if value is None:
+            continue
+        if key in file_params and key in file_digests:
+            out[key] = {"sha256": file_digests[key]}
+            continue
+        if key in file_params and isinstance(value, str) and value:
+            path = Path(value)
+            out[key] = {"sha256": _file_digest(path)} if path.exists() else {"missing": value}
+            continue
+        out[key] = _canonical_value(value)
+    return out
+
+
+def cache_key(openscad_exe: str, scad_path: Path, params: Dict[str, Any], extra: Optional[Dict[str, Any]] = None) -> str:
+    scad_path = Path(scad_path).resolve()
+    source = scad_path.read_text()
+    h = hashlib.sha256()
+    h.update(b"scad\0" + source.encode("utf-8"))
+    for dep in sorted(set(_scad_dependencies(scad_path, source))):
+        h.update(b"dep\0" + dep.name.encode("utf-8") + b"\0" + _file_digest(dep).encode("ascii"))
+    payload = {
+        "params": canonical_params(params, import_params(source)),
+        "openscad": openscad_version(openscad_exe),
+        "extra": extra or {},
+    }
+    h.update(b"spec\0" + json.dumps(payload, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def geometry_key(scad_path: Path, render_params: Dict[str, Any], file_digests: Optional[Dict[str, str]] = None) -> str:
+    """
+    Digest of the geometry render_params describe for scad_path: canonical
+    params with file params by content (see canonical_params). Unlike
+    cache_key it leaves out the OpenSCAD version and render options, so it
+    identifies a model rather than a particular render of it.
+    """
+    source = Path(scad_path).read_text()
+    payload = json.dumps(canonical_params(render_params, import_params(source), file_digests), sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.iterdir() if f.is_file())
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    """
+    Hardlinks src to dst (copying across filesystems). Callers link cache
+    entries, which are read-only, and everything that writes an STL replaces
+    the file rather than rewriting it, so a linked job output can't change
+    the entry behind it.
+    """
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class BuildCache:
+    """
+    Content-addressed store of rendered STLs with their logs and validation
+    report. Entries are evicted least-recently-used once the store grows past
+    max_bytes or max_entries. The store's size and entry count are kept as
+    running totals, seeded by one scan of the directory, so the directory is
+    only walked again when they cross a limit (other processes sharing the
+    store are caught up by that scan).
+    """
+
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self.max_entries = int(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes: Optional[int] = None
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def contains(self, key: str) -> bool:
+        return (self._entry_dir(key) / STL_NAME).exists()
+
+    def mark(self, name: str) -> bool:
+        """
+        Records name on disk, where every process sharing the store sees it.
+        True only for the one call that created the mark. Marks are hints
+        and are dropped whenever the store is evicted.
+        """
+        marks = self.root / MARKS_DIR
+        marks.mkdir(parents=True, exist_ok=True)
+        try:
+            os.close(os.open(marks / name, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        return True
+
+    def fetch(self, key: str, out_stl: Path) -> Optional[Dict[str, Any]]:
+        entry = self._entry_dir(key)
+        stl = entry / STL_NAME
+        if not stl.exists():
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            _link_or_copy(stl, Path(out_stl))
+            logs = (entry / LOGS_NAME).read_text()
+            report = json.loads((entry / REPORT_NAME).read_text())
+            now = time.time()
+            os.utime(entry, (now, now))
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return {"logs": logs, "report": report}
+
+    def store(self, key: str, stl_path: Path, logs: str, report: Dict[str, Any]) -> None:
+        entry = self._entry_dir(key)
+        if (entry / STL_NAME).exists():
+            return
+        with self._lock:
+            # seeded before the entry lands so the scan doesn't count it too
+            self._load_totals()
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=f".{key[:8]}_", dir=entry.parent))
+        try:
+            _link_or_copy(Path(stl_path), tmp / STL_NAME)
+            os.chmod(tmp / STL_NAME, 0o444)
+            (tmp / LOGS_NAME).write_text(logs)
+            (tmp / REPORT_NAME).write_text(json.dumps(report, indent=2))
+            size = _dir_bytes(tmp)
+            os.replace(tmp, entry)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        with self._lock:
+            self._bytes += size
+            self._count += 1
+            over = self._bytes > self.max_bytes or self._count > self.max_entries
+        if over:
+            self.evict()
+
+    def _entries(self):
+        if not self.root.exists():
+            return []
+        items = []
+        for shard in self.root.iterdir():
+            if not shard.is_dir() or shard.name.startswith("."):
+                continue
+            for entry in shard.iterdir():
+                if entry.name.startswith(".") or not entry.is_dir():
+                    continue
+                items.append((entry.stat().st_mtime, _dir_bytes(entry), entry))
+        return items
+
+    def _load_totals(self) -> None:
+        # caller holds self._lock
+        if self._bytes is None:
+            items = self._entries()
+            self._bytes = sum(size for _, size, _ in items)
+            self._count = len(items)
+
+    def evict(self) -> int:
+        with self._lock:
+            items = sorted(self._entries(), key=lambda item: item[0])
+            total = sum(size for _, size, _ in items)
+            removed = 0
+            while items and (total > self.max_bytes or len(items) > self.max_entries):
+                _, size, entry = items.pop(0)
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                removed += 1
+            shutil.rmtree(self.root / MARKS_DIR, ignore_errors=True)
+            self.evictions += removed
+            self._bytes, self._count = total, len(items)
+            return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            shutil.rmtree(self.root, ignore_errors=True)
+            self._bytes, self._count = 0, 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._load_totals()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": self._count,
+                "bytes": self._bytes,
+            }
+
+
+_default_cache: Optional[BuildCache] = None
+
+
+def default_cache() -> BuildCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = BuildCache()
+    return _default_cache
+
+
+def cached_build(
+    openscad_exe: str,
+    scad_path: Path,
+    out_stl: Path,
+    params: dict,
+    cache: Optional[BuildCache] = None,
+    render: Callable[..., str] = run_openscad,
+    export_format: Optional[str] = DEFAULT_EXPORT_FORMAT,
+    validation: Optional[dict] = None,
+    extra_args: Optional[list] = None,
+    key_extra: Optional[dict] = None,
+) -> Tuple[str, dict, bool]:
+    """
+    Renders params through render (run_openscad by default) unless an
+    identical build is cached. validation is the template's validation
+    config; extra_args are the OpenSCAD flags render was bound to (backend
+    selection etc.), which only take part in the key, as does key_extra
+    (anything else the output depends on, e.g. the native backend).
+    Returns (logs, validation report, cache_hit).
+    """
+    cache = cache or default_cache()
+    extra = {"export_format": export_format, "validation": validation or {}}
+    if extra_args:
+        extra["args"] = list(extra_args)
+    if key_extra:
+        extra.update(key_extra)
+    key = cache_key(openscad_exe, scad_path, params, extra=extra)
+    hit = cache.fetch(key, out_stl)
+    if hit is not None:
+        return hit["logs"], hit["report"], True
+
+    logs = render(openscad_exe, scad_path, out_stl, params, export_format=export_format)
+    report = validate_stl(out_stl, validation)
+    if report.get("ok"):
+        cache.store(key, out_stl, logs, report)
+    return logs, report, False
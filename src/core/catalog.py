@@ -1,24 +1,129 @@
 import json
+import threading
 from pathlib import Path
 
+from src.core.expr import compile_expr
+
 TEMPLATES_DIR = Path(__file__).resolve().parents[2] / "templates"
 
+PARAM_TYPES = {"string", "int", "integer", "number"}
+COMPOSE_PARTS = ("body", "text", "cut", "overlay")
+NATIVE_MODELS = ("coaster_round", "keychain_roundrect", "nameplate")
+PLATE_FOOTPRINTS = ("rect", "circle")
+
+
+def validate_schema(template_id: str, schema: dict) -> None:
+    """
+    Raises ValueError describing the first problem found in a template schema.
+    Compiling the text_box expressions here also warms the expression cache.
+    """
+    where = f"templates/{template_id}/schema.json"
+    for key in ("scad_file", "params"):
+        if key not in schema:
+            raise ValueError(f"{where}: missing '{key}'")
+    if not isinstance(schema["params"], dict):
+        raise ValueError(f"{where}: 'params' must be an object")
+    for name, spec in schema["params"].items():
+        vtype = spec.get("type", "string")
+        if vtype not in PARAM_TYPES:
+            raise ValueError(f"{where}: param '{name}' has unknown type '{vtype}'")
+        if "default" not in spec:
+            raise ValueError(f"{where}: param '{name}' has no default")
+        lo, hi = spec.get("min"), spec.get("max")
+        if lo is not None and hi is not None and lo > hi:
+            raise ValueError(f"{where}: param '{name}' has min > max")
+    for key, expr in (schema.get("text_box") or {}).items():
+        if isinstance(expr, str):
+            try:
+                compile_expr(expr)
+            except SyntaxError as e:
+                raise ValueError(f"{where}: text_box.{key} is not a valid expression: {e.msg}")
+    compose = schema.get("compose")
+    if compose is not None:
+        parts = compose.get("parts", [])
+        unknown = [p for p in parts if p not in COMPOSE_PARTS]
+        if unknown:
+            raise ValueError(f"{where}: compose has unknown parts {unknown}, expected {list(COMPOSE_PARTS)}")
+        if "body" not in parts:
+            raise ValueError(f"{where}: compose needs a 'body' part")
+    native = schema.get("native")
+    if native is not None and native.get("model") not in NATIVE_MODELS:
+        raise ValueError(f"{where}: native.model must be one of {list(NATIVE_MODELS)}")
+    plate = schema.get("plate")
+    if plate is not None and plate.get("footprint", "rect") not in PLATE_FOOTPRINTS:
+        raise ValueError(f"{where}: plate.footprint must be one of {list(PLATE_FOOTPRINTS)}")
+
+
+class TemplateRegistry:
+    """
+    In-process cache of template schemas. Each schema is read, validated and
+    its text_box expressions compiled once; an entry is reloaded only when
+    schema.json or the scad file changes mtime. Returned schemas are shared
+    and must not be mutated.
+    """
+
+    def __init__(self, root: Path = TEMPLATES_DIR):
+        self.root = Path(root)
+        self._ids = None
+        self._root_mtime_ns = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def list(self):
+        mtime_ns = self.root.stat().st_mtime_ns
+        with self._lock:
+            if self._ids is None or mtime_ns != self._root_mtime_ns:
+                self._ids = [d.name for d in sorted(self.root.iterdir())
+                             if d.is_dir() and (d / "schema.json").exists()]
+                self._root_mtime_ns = mtime_ns
+            return list(self._ids)
+
+    def load(self, template_id: str):
+        tdir = self.root / template_id
+        schema_path = tdir / "schema.json"
+        try:
+            schema_mtime = schema_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Missing schema: {schema_path}")
+
+        with self._lock:
+            entry = self._entries.get(template_id)
+        if entry is not None and entry[0] == schema_mtime:
+            _, scad_mtime, schema, scad_path = entry
+            try:
+                if scad_path.stat().st_mtime_ns == scad_mtime:
+                    return schema, scad_path
+            except FileNotFoundError:
+                pass
+
+        schema = json.loads(schema_path.read_text())
+        validate_schema(template_id, schema)
+        scad_path = tdir / schema["scad_file"]
+        if not scad_path.exists():
+            raise FileNotFoundError(f"Missing scad: {scad_path}")
+        with self._lock:
+            self._entries[template_id] = (schema_mtime, scad_path.stat().st_mtime_ns, schema, scad_path)
+        return schema, scad_path
+
+    def schemas(self):
+        return {tid: self.load(tid)[0] for tid in self.list()}
+
+    def clear(self):
+        with self._lock:
+            self._ids = None
+            self._entries.clear()
+
+
+_registry = TemplateRegistry()
+
+
+def template_registry() -> TemplateRegistry:
+    return _registry
+
+
 def list_templates():
-    items = []
-    for d in sorted(TEMPLATES_DIR.iterdir()):
-        if d.is_dir():
-            schema = d / "schema.json"
-            if schema.exists():
-                items.append(d.name)
-    return items
+    return _registry.list()
+
 
 def load_template(template_id: str):
-    tdir = TEMPLATES_DIR / template_id
-    schema_path = tdir / "schema.json"
-    if not schema_path.exists():
-        raise FileNotFoundError(f"Missing schema: {schema_path}")
-    schema = json.loads(schema_path.read_text())
-    scad_path = tdir / schema["scad_file"]
-    if not scad_path.exists():
-        raise FileNotFoundError(f"Missing scad: {scad_path}")
-    return schema, scad_path
\ No newline at end of file
+    return _registry.load(template_id)
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.cache import BuildCache, cache_key, default_cache
+from src.core.catalog import COMPOSE_PARTS
+from src.core.deps import conditions_match, default_values
+from src.core.metrics import span
+from src.core.runner import DEFAULT_EXPORT_FORMAT, run_openscad
+from src.core.stl_io import read_stl, write_binary_stl
+
+try:
+    import manifold3d
+except ImportError:
+    manifold3d = None
+
+ENABLED = os.environ.get("PROMPTTOSTL_COMPOSE", "1") != "0"
+COMPOSE_VERSION = "1"
+SOLID_CACHE_SIZE = 32
+
+_solids: "OrderedDict[str, Any]" = OrderedDict()
+_solids_lock = threading.Lock()
+
+
+class CompositionError(RuntimeError):
+    pass
+
+
+def compose_available() -> bool:
+    """
+    Composition needs the optional manifold3d package; PROMPTTOSTL_COMPOSE=0
+    turns it off.
+    """
+    return ENABLED and manifold3d is not None
+
+
+def compose_key(compose: dict) -> Dict[str, Any]:
+    """
+    What composed output depends on besides params, for build cache keys:
+    it is meshed by manifold3d rather than OpenSCAD, so it must not be
+    served for (or from) a whole-model render.
+    """
+    return {"compose": dict(compose, version=COMPOSE_VERSION)}
+
+
+def _to_solid(vertices: np.ndarray, faces: np.ndarray):
+    mesh = manifold3d.Mesh(vert_properties=np.ascontiguousarray(vertices, dtype=np.float32),
+                           tri_verts=np.ascontiguousarray(faces, dtype=np.uint32))
+    solid = manifold3d.Manifold(mesh)
+    if solid.status() != manifold3d.Error.NoError:
+        raise CompositionError(f"part is not a closed manifold ({solid.status().name})")
+    return solid
+
+
+def _remember(key: str, solid) -> None:
+    with _solids_lock:
+        _solids[key] = solid
+        _solids.move_to_end(key)
+        while len(_solids) > SOLID_CACHE_SIZE:
+            _solids.popitem(last=False)
+
+
+def clear_solid_cache() -> None:
+    with _solids_lock:
+        _solids.clear()
+
+
+def _is_cached(key: str, cache: BuildCache) -> bool:
+    with _solids_lock:
+        if key in _solids:
+            return True
+    return cache.contains(key)
+
+
+def _first_request(keys: Tuple[str, ...], cache: BuildCache) -> bool:
+    """
+    Whether this is the first time these shared parts are asked for. The
+    answer is marked in the build cache, so it holds across the processes
+    of a batch rather than once per worker.
+    """
+    return cache.mark("compose_" + hashlib.sha256("\0".join(keys).encode("ascii")).hexdigest())
+
+
+def _part_solid(
+    name: str,
+    key: str,
+    openscad_exe: str,
+    scad_path: Path,
+    params: Dict[str, Any],
+    render: Callable[..., str],
+    cache: BuildCache,
+    work_dir: Path,
+) -> Tuple[Any, str]:
+    """
+    (solid or None if the part is empty, log line). Looks in memory, then the
+    build cache, and renders the part with OpenSCAD only on a miss.
+    """
+    with _solids_lock:
+        if key in _solids:
+            _solids.move_to_end(key)
+            return _solids[key], f"[compose] {name}: in memory"
+
+    out = work_dir / f"part_{name}.stl"
+    if cache.fetch(key, out) is not None:
+        source = "cached"
+    else:
+        logs = render(openscad_exe, scad_path, out, params, export_format=DEFAULT_EXPORT_FORMAT)
+        source = "rendered\n" + logs.strip()
+        if out.exists() and out.stat().st_size > 84:
+            cache.store(key, out, logs, {"part": name})
+
+    solid = None
+    if out.exists():
+        vertices, faces = read_stl(out)
+        if len(faces):
+            solid = _to_solid(vertices, faces)
+    _remember(key, solid)
+    return solid, f"[compose] {name}: {source}"
+
+
+def compose_render(
+    openscad_exe: str,
+    scad_path: Path,
+    out_stl: Path,
+    params: Dict[str, Any],
+    export_format: Optional[str] = DEFAULT_EXPORT_FORMAT,
+    *,
+    compose: dict,
+    render: Callable[..., str] = run_openscad,
+    extra_args: Optional[List[str]] = None,
+    cache: Optional[BuildCache] = None,
+) -> str:
+    """
+    Drop-in for run_openscad that renders a template as separate parts and
+    joins them in Python: ((body op text) - cut) + overlay, where op is a
+    union when the compose block's "union_when" matches and a difference
+    otherwise. The scad file selects a part through compose["part_param"].
+
+    Every part except "text" is rendered without the compose block's
+    "text_params", so a batch that only changes names renders the body,
+    cut and overlay once and reuses them from memory or the build cache.
+    Parts matching a "skip_when" rule (checked against params over the scad
+    defaults) are empty and left out. Parts that are not cached render
+    concurrently.
+
+    Composing only pays off once the shared parts are reused: the first
+    time a set of them is asked for while not cached, the whole model is
+    rendered in one OpenSCAD run instead, and parts are rendered and cached
+    from the next build that needs them, in whichever process sharing the
+    build cache that runs. The result is always written as
+    binary STL. Falls back to a whole-model render when a part is not a
+    closed manifold.
+    """
+    out_stl = Path(out_stl)
+    part_param = compose.get("part_param", "part")
+    text_params = set(compose.get("text_params", []))
+    shared = {k: v for k, v in params.items() if k not in text_params}
+    extra = {"export_format": DEFAULT_EXPORT_FORMAT, "args": list(extra_args or [])}
+    cache = cache or default_cache()
+    skip_when = compose.get("skip_when", {})
+    # Rules see the scad defaults for params normalize_params dropped.
+    state = dict(default_values(scad_path), **params)
+
+    parts = []
+    logs = []
+    for name in compose.get("parts", COMPOSE_PARTS):
+        if any(conditions_match(state, when) for when in skip_when.get(name, [])):
+            logs.append(f"[compose] {name}: empty")
+            continue
+        part_params = dict(params if name == "text" else shared, **{part_param: name})
+        parts.append((name, cache_key(openscad_exe, scad_path, part_params, extra=extra), part_params))
+
+    shared_keys = tuple(key for name, key, _ in parts if name != "text")
+    if not all(_is_cached(key, cache) for key in shared_keys) and _first_request(shared_keys, cache):
+        logs.append("[compose] shared parts not cached yet; rendering the whole model")
+        logs.append(render(openscad_exe, scad_path, out_stl, params, export_format=export_format))
+        return "\n".join(logs)
+
+    def part_solid(name: str, key: str, part_params: Dict[str, Any], work_dir: Path) -> Tuple[Any, str]:
+        with span(f"compose.part_{name}"):
+            return _part_solid(name, key, openscad_exe, scad_path, part_params, render, cache, work_dir)
+
+    solids: Dict[str, Any] = {}
+    try:
+        with tempfile.TemporaryDirectory(prefix=".compose_", dir=out_stl.parent) as tmp:
+            with ThreadPoolExecutor(max_workers=max(1, len(parts)), thread_name_prefix="compose-part") as ex:
+                # each part runs in a copy of this context so its span lands in the build's recorder
+                futures = [(name, ex.submit(contextvars.copy_context().run, part_solid,
+                                            name, key, part_params, Path(tmp)))
+                           for name, key, part_params in parts]
+                for name, future in futures:
+                    solids[name], log = future.result()
+                    logs.append(log)
+
+        if solids.get("body") is None:
+            raise CompositionError("composition needs a non-empty body part")
+        with span("compose.boolean"):
+            result = solids["body"]
+            if solids.get("text") is not None:
+                union = conditions_match(state, compose.get("union_when", {}))
+                result = result + solids["text"] if union else result - solids["text"]
+            if solids.get("cut") is not None:
+                result = result - solids["cut"]
+            if solids.get("overlay") is not None:
+                result = result + solids["overlay"]
+            mesh = result.to_mesh()
+            write_binary_stl(out_stl, np.asarray(mesh.vert_properties)[:, :3], np.asarray(mesh.tri_verts))
+    except CompositionError as e:
+        logs.append(f"[compose] {e}; rendering the whole model instead")
+        logs.append(render(openscad_exe, scad_path, out_stl, params, export_format=export_format))
+    return "\n".join(logs)
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+
+# Top-level assignments start in column 0; module/function locals are indented.
+_TOP_ASSIGN_RE = re.compile(r"^([A-Za-z_]\w*)\s*=(?!=)", re.MULTILINE)
+_IDENT_RE = re.compile(r"\$?[A-Za-z_]\w*")
+_COMMENT_RE = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+_STRING_RE = re.compile(r"\"(?:\\.|[^\"\\])*\"")
+_TOP_LITERAL_RE = re.compile(
+    r"^([A-Za-z_]\w*)\s*=\s*(\"(?:\\.|[^\"\\])*\"|-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)\s*;", re.MULTILINE
+)
+
+
+def _strip(source: str) -> str:
+    source = _STRING_RE.sub('""', source)
+    return _COMMENT_RE.sub("", source)
+
+
+def scad_variables(source: str) -> Set[str]:
+    """
+    Names assigned at the top level of a scad file, i.e. the ones -D can set.
+    """
+    return set(_TOP_ASSIGN_RE.findall(_strip(source)))
+
+
+def referenced_variables(source: str) -> Set[str]:
+    """
+    Top-level variables that are read somewhere other than their own
+    assignment. A variable that is only declared cannot affect the mesh.
+    """
+    source = _strip(source)
+    declared = set(_TOP_ASSIGN_RE.findall(source))
+    used: Set[str] = set()
+    for line in source.splitlines():
+        m = _TOP_ASSIGN_RE.match(line)
+        if m:
+            line = line[m.end():]
+        used.update(_IDENT_RE.findall(line))
+    return declared & used
+
+
+def scad_defaults(source: str) -> Dict[str, Any]:
+    """
+    Top-level variables assigned a plain number or string literal, with
+    their values: what a param falls back to when it is not passed with -D.
+    """
+    out: Dict[str, Any] = {}
+    for name, literal in _TOP_LITERAL_RE.findall(_COMMENT_RE.sub("", source)):
+        if literal.startswith('"'):
+            out[name] = literal[1:-1]
+        else:
+            value = float(literal)
+            out[name] = int(value) if value.is_integer() and "." not in literal else value
+    return out
+
+
+@lru_cache(maxsize=32)
+def _scad_defaults(scad_path: str, mtime_ns: int) -> Dict[str, Any]:
+    return scad_defaults(Path(scad_path).read_text())
+
+
+def default_values(scad_path: Path) -> Dict[str, Any]:
+    scad_path = Path(scad_path).resolve()
+    return dict(_scad_defaults(str(scad_path), scad_path.stat().st_mtime_ns))
+
+
+@lru_cache(maxsize=32)
+def _scad_live(scad_path: str, mtime_ns: int) -> Tuple[frozenset, frozenset]:
+    source = Path(scad_path).read_text()
+    return frozenset(scad_variables(source)), frozenset(referenced_variables(source))
+
+
+def live_variables(scad_path: Path) -> Set[str]:
+    """
+    Params that can reach geometry according to the scad source itself.
+    """
+    scad_path = Path(scad_path).resolve()
+    _, live = _scad_live(str(scad_path), scad_path.stat().st_mtime_ns)
+    return set(live)
+
+
+def _matches(value: Any, expected: Any) -> bool:
+    if isinstance(expected, str) or isinstance(value, str):
+        return str(value) == str(expected)
+    try:
+        return float(value) == float(expected)
+    except (TypeError, ValueError):
+        return False
+
+
+def conditions_match(params: Dict[str, Any], when: Dict[str, Any]) -> bool:
+    """
+    True when every key in when is present in params with a matching value
+    (numbers compare numerically, so 0 matches 0.0).
+    """
+    return bool(when) and all(k in params and _matches(params[k], v) for k, v in when.items())
+
+
+def normalize_params(params: Dict[str, Any], scad_path: Path, dependencies: Optional[dict] = None) -> Dict[str, Any]:
+    """
+    Drops params that cannot change the mesh so that equivalent builds render
+    and hash alike. Dropped params fall back to their scad defaults.
+
+    A param is dead when the scad file never reads it, when the template's
+    "dependencies" block lists it under "non_geometry", or when a
+    "dead_when" rule matches, e.g.
+    {"when": {"emblem_enabled": 0}, "drop": ["emblem_path", ...]}.
+    """
+    dependencies = dependencies or {}
+    live = live_variables(scad_path) - set(dependencies.get("non_geometry", []))
+    out = {k: v for k, v in params.items() if k in live}
+    for rule in dependencies.get("dead_when", []):
+        if conditions_match(params, rule.get("when", {})):
+            for key in rule.get("drop", []):
+                out.pop(key, None)
+    return out
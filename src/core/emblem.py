@@ -0,0 +1,421 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import math
+import os
+import re
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+EMBLEM_CACHE_DIR = Path(__file__).resolve().parents[2] / ".emblem_cache"
+# Max deviation from the original outline, as a fraction of the drawing's
+# larger side (viewBox, else width/height). 0 turns preprocessing off.
+DEFAULT_TOLERANCE = float(os.environ.get("PROMPTTOSTL_EMBLEM_TOLERANCE", "0.001"))
+PIPELINE_VERSION = "1"
+MAX_CURVE_SEGMENTS = 512
+
+SVG_NS = "http://www.w3.org/2000/svg"
+ET.register_namespace("", SVG_NS)
+ET.register_namespace("xlink", "http://www.w3.org/1999/xlink")
+
+_NUMBER_RE = re.compile(r"[-+]?(?:\d*\.\d+|\d+\.?)(?:[eE][-+]?\d+)?")
+_TRANSFORM_RE = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+_ARC_FLAG_RE = re.compile(r"[\s,]*([01])")
+_PARAM_COUNTS = {"m": 2, "l": 2, "h": 1, "v": 1, "c": 6, "s": 4, "q": 4, "t": 2, "a": 7, "z": 0}
+
+
+def _tag(el: ET.Element) -> str:
+    return el.tag.rsplit("}", 1)[-1]
+
+
+def parse_transform(text: Optional[str]) -> np.ndarray:
+    """
+    SVG transform attribute as a 3x3 affine matrix.
+    """
+    m = np.eye(3)
+    for name, args in _TRANSFORM_RE.findall(text or ""):
+        v = [float(x) for x in _NUMBER_RE.findall(args)]
+        t = np.eye(3)
+        if name == "matrix" and len(v) == 6:
+            t[:2] = [[v[0], v[2], v[4]], [v[1], v[3], v[5]]]
+        elif name == "translate" and v:
+            t[0, 2], t[1, 2] = v[0], (v[1] if len(v) > 1 else 0.0)
+        elif name == "scale" and v:
+            t[0, 0], t[1, 1] = v[0], (v[1] if len(v) > 1 else v[0])
+        elif name == "rotate" and v:
+            a = math.radians(v[0])
+            c, s = math.cos(a), math.sin(a)
+            t[:2, :2] = [[c, -s], [s, c]]
+            if len(v) == 3:
+                pre, post = np.eye(3), np.eye(3)
+                pre[:2, 2], post[:2, 2] = v[1:], [-v[1], -v[2]]
+                t = pre @ t @ post
+        elif name == "skewX" and v:
+            t[0, 1] = math.tan(math.radians(v[0]))
+        elif name == "skewY" and v:
+            t[1, 0] = math.tan(math.radians(v[0]))
+        m = m @ t
+    return m
+
+
+def _path_tokens(d: str) -> List[Tuple[str, List[float]]]:
+    """
+    (command, params) pairs with implicit repeats split out. Arc flags may
+    be written without separators ("a5 5 0 015 5").
+    """
+    out: List[Tuple[str, List[float]]] = []
+    pos, cmd = 0, None
+    d = d.strip()
+    while pos < len(d):
+        if d[pos] in " \t\r\n,":
+            pos += 1
+            continue
+        if d[pos].isalpha():
+            if d[pos].lower() not in _PARAM_COUNTS:
+                raise ValueError(f"unknown path command {d[pos]!r}")
+            cmd = d[pos]
+            pos += 1
+            if cmd in "Zz":
+                out.append((cmd, []))
+            continue
+        if cmd is None or cmd in "Zz":
+            raise ValueError(f"path data has numbers without a command at {pos}")
+        values = []
+        for i in range(_PARAM_COUNTS[cmd.lower()]):
+            if cmd in "Aa" and i in (3, 4):
+                m = _ARC_FLAG_RE.match(d, pos)
+            else:
+                while pos < len(d) and d[pos] in " \t\r\n,":
+                    pos += 1
+                m = _NUMBER_RE.match(d, pos)
+            if m is None:
+                raise ValueError(f"bad path data near {d[pos:pos + 20]!r}")
+            values.append(float(m.group(m.lastindex or 0)))
+            pos = m.end()
+        out.append((cmd, values))
+        if cmd == "M":
+            cmd = "L"
+        elif cmd == "m":
+            cmd = "l"
+    return out
+
+
+def flatten_cubic(p0, p1, p2, p3, tol: float) -> np.ndarray:
+    """
+    Points after p0 along a cubic Bezier, with as many segments as Wang's
+    formula needs to keep the chord error below tol.
+    """
+    m = max(np.hypot(*(p0 - 2 * p1 + p2)), np.hypot(*(p1 - 2 * p2 + p3)))
+    n = int(min(MAX_CURVE_SEGMENTS, max(1, math.ceil(math.sqrt(0.75 * m / tol)))))
+    t = np.linspace(0.0, 1.0, n + 1)[1:, None]
+    u = 1.0 - t
+    return u ** 3 * p0 + 3 * u * u * t * p1 + 3 * u * t * t * p2 + t ** 3 * p3
+
+
+def flatten_quad(p0, p1, p2, tol: float) -> np.ndarray:
+    m = np.hypot(*(p0 - 2 * p1 + p2))
+    n = int(min(MAX_CURVE_SEGMENTS, max(1, math.ceil(math.sqrt(0.25 * m / tol)))))
+    t = np.linspace(0.0, 1.0, n + 1)[1:, None]
+    u = 1.0 - t
+    return u * u * p0 + 2 * u * t * p1 + t * t * p2
+
+
+def _arc(p0, rx: float, ry: float, phi_deg: float, large: float, sweep: float, p1, tol: float) -> np.ndarray:
+    """
+    Endpoint-parameterized elliptical arc (SVG 1.1 F.6.5) sampled so the
+    sagitta stays below tol.
+    """
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0 or np.array_equal(p0, p1):
+        return p1[None, :]
+    phi = math.radians(phi_deg % 360)
+    c, s = math.cos(phi), math.sin(phi)
+    dx, dy = (p0 - p1) / 2
+    x1, y1 = c * dx + s * dy, -s * dx + c * dy
+    lam = (x1 / rx) ** 2 + (y1 / ry) ** 2
+    if lam > 1:
+        rx, ry = rx * math.sqrt(lam), ry * math.sqrt(lam)
+    num = rx * rx * ry * ry - rx * rx * y1 * y1 - ry * ry * x1 * x1
+    den = rx * rx * y1 * y1 + ry * ry * x1 * x1
+    k = math.sqrt(max(0.0, num / den)) if den else 0.0
+    if bool(large) == bool(sweep):
+        k = -k
+    cx1, cy1 = k * rx * y1 / ry, -k * ry * x1 / rx
+    cx = c * cx1 - s * cy1 + (p0[0] + p1[0]) / 2
+    cy = s * cx1 + c * cy1 + (p0[1] + p1[1]) / 2
+    theta1 = math.atan2((y1 - cy1) / ry, (x1 - cx1) / rx)
+    theta2 = math.atan2((-y1 - cy1) / ry, (-x1 - cx1) / rx)
+    dtheta = theta2 - theta1
+    if sweep and dtheta < 0:
+        dtheta += 2 * math.pi
+    elif not sweep and dtheta > 0:
+        dtheta -= 2 * math.pi
+    r = max(rx, ry)
+    step = 2 * math.acos(max(-1.0, 1 - tol / r)) if tol < r else math.pi / 2
+    n = int(min(MAX_CURVE_SEGMENTS, max(1, math.ceil(abs(dtheta) / max(step, 1e-9)))))
+    t = theta1 + dtheta * np.linspace(0.0, 1.0, n + 1)[1:]
+    ex, ey = rx * np.cos(t), ry * np.sin(t)
+    pts = np.column_stack([c * ex - s * ey + cx, s * ex + c * ey + cy])
+    pts[-1] = p1
+    return pts
+
+
+def flatten_path(d: str, tolerance: float) -> List[Tuple[np.ndarray, bool]]:
+    """
+    Path data as polylines: [(points (N, 2), closed)], one per subpath, with
+    curves and arcs replaced by chords within tolerance.
+    """
+    subpaths: List[Tuple[np.ndarray, bool]] = []
+    pts: List[np.ndarray] = []
+    cur = np.zeros(2)
+    start = np.zeros(2)
+    last_ctrl = None
+    last_cmd = ""
+
+    def finish(closed: bool):
+        if len(pts) > 1:
+            subpaths.append((np.vstack(pts), closed))
+
+    for cmd, v in _path_tokens(d):
+        rel = cmd.islower()
+        op = cmd.upper()
+        base = cur if rel else np.zeros(2)
+        ctrl = None
+        if op == "M":
+            finish(False)
+            cur = base + v[:2]
+            start = cur
+            pts = [cur[None, :]]
+        elif op == "Z":
+            finish(True)
+            cur = start
+            pts = [cur[None, :]]
+        elif op in "LHV":
+            if op == "L":
+                nxt = base + v[:2]
+            elif op == "H":
+                nxt = np.array([v[0] + (cur[0] if rel else 0.0), cur[1]])
+            else:
+                nxt = np.array([cur[0], v[0] + (cur[1] if rel else 0.0)])
+            pts.append(nxt[None, :])
+            cur = nxt
+        elif op in "CS":
+            if op == "C":
+                c1, c2, end = base + v[0:2], base + v[2:4], base + v[4:6]
+            else:
+                c1 = 2 * cur - last_ctrl if last_cmd in "CS" and last_ctrl is not None else cur
+                c2, end = base + v[0:2], base + v[2:4]
+            pts.append(flatten_cubic(cur, c1, c2, end, tolerance))
+            ctrl, cur = c2, end
+        elif op in "QT":
+            if op == "Q":
+                c1, end = base + v[0:2], base + v[2:4]
+            else:
+                c1 = 2 * cur - last_ctrl if last_cmd in "QT" and last_ctrl is not None else cur
+                end = base + v[0:2]
+            pts.append(flatten_quad(cur, c1, end, tolerance))
+            ctrl, cur = c1, end
+        elif op == "A":
+            end = base + v[5:7]
+            pts.append(_arc(cur, v[0], v[1], v[2], v[3], v[4], end, tolerance))
+            cur = end
+        last_ctrl, last_cmd = ctrl, op
+    finish(False)
+    return subpaths
+
+
+def simplify_polyline(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Douglas-Peucker: drops points closer than tolerance to the chord of
+    their kept neighbours. Endpoints are always kept.
+    """
+    n = len(points)
+    if n < 3 or tolerance <= 0:
+        return points
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j <= i + 1:
+            continue
+        seg = points[j] - points[i]
+        rel = points[i + 1:j] - points[i]
+        length = math.hypot(seg[0], seg[1])
+        if length == 0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / length
+        k = int(np.argmax(dist))
+        if dist[k] > tolerance:
+            m = i + 1 + k
+            keep[m] = True
+            stack.append((i, m))
+            stack.append((m, j))
+    return points[keep]
+
+
+def simplify_ring(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Douglas-Peucker for a closed outline, split at the point farthest from
+    the first so both halves have a stable anchor.
+    """
+    if len(points) > 1 and np.allclose(points[0], points[-1]):
+        points = points[:-1]
+    if len(points) < 4:
+        return points
+    far = int(np.argmax(np.hypot(*(points - points[0]).T)))
+    a = simplify_polyline(points[:far + 1], tolerance)
+    b = simplify_polyline(np.vstack([points[far:], points[:1]]), tolerance)
+    return np.vstack([a, b[1:-1]])
+
+
+def _fmt(value: float, decimals: int) -> str:
+    text = f"{value:.{decimals}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text in ("-0", "") else text
+
+
+def _decimals(tolerance: float) -> int:
+    return int(min(6, max(0, math.ceil(-math.log10(tolerance)) + 1))) if tolerance > 0 else 6
+
+
+def _path_data(subpaths: List[Tuple[np.ndarray, bool]], tolerance: float) -> Tuple[str, int]:
+    dec = _decimals(tolerance)
+    parts, count = [], 0
+    for pts, closed in subpaths:
+        pts = simplify_ring(pts, tolerance) if closed else simplify_polyline(pts, tolerance)
+        if len(pts) < (3 if closed else 2):
+            continue
+        xy = [f"{_fmt(x, dec)} {_fmt(y, dec)}" for x, y in pts]
+        parts.append("M" + xy[0] + ("L" + " ".join(xy[1:]) if len(xy) > 1 else "") + ("Z" if closed else ""))
+        count += len(pts)
+    return "".join(parts), count
+
+
+def _points_data(text: str, closed: bool, tolerance: float) -> Tuple[str, int]:
+    values = [float(x) for x in _NUMBER_RE.findall(text or "")]
+    pts = np.array(values[: len(values) // 2 * 2], dtype=np.float64).reshape(-1, 2)
+    pts = simplify_ring(pts, tolerance) if closed else simplify_polyline(pts, tolerance)
+    dec = _decimals(tolerance)
+    return " ".join(f"{_fmt(x, dec)},{_fmt(y, dec)}" for x, y in pts), len(pts)
+
+
+def document_size(root: ET.Element) -> float:
+    """
+    Larger side of the drawing in user units: the viewBox, else width and
+    height (unit suffixes ignored), else 100.
+    """
+    vb = [float(x) for x in _NUMBER_RE.findall(root.get("viewBox") or "")]
+    if len(vb) == 4 and max(vb[2], vb[3]) > 0:
+        return max(vb[2], vb[3])
+    sizes = []
+    for key in ("width", "height"):
+        m = _NUMBER_RE.match((root.get(key) or "").strip())
+        if m:
+            sizes.append(float(m.group(0)))
+    return max(sizes) if sizes and max(sizes) > 0 else 100.0
+
+
+def simplify_svg(svg: bytes, tolerance: float = DEFAULT_TOLERANCE) -> Tuple[bytes, Dict[str, int]]:
+    """
+    Rewrites every <path> as straight segments and thins <path>, <polygon>
+    and <polyline> outlines with Douglas-Peucker. The root element (width,
+    height, viewBox), groups, transforms and styles are kept as they are, so
+    OpenSCAD's import() scales and places the result exactly like the
+    original. tolerance is relative to document_size and is converted into
+    each element's local units through its transforms. Raises ValueError for
+    input that is not an SVG document.
+    """
+    try:
+        root = ET.fromstring(svg)
+    except ET.ParseError as e:
+        raise ValueError(f"emblem is not valid XML: {e}")
+    if _tag(root) != "svg":
+        raise ValueError("emblem root element is not <svg>")
+    abs_tol = tolerance * document_size(root)
+    stats = {"elements": 0, "points_in": 0, "points_out": 0}
+
+    def walk(el: ET.Element, ctm: np.ndarray) -> None:
+        ctm = ctm @ parse_transform(el.get("transform"))
+        scale = math.sqrt(abs(np.linalg.det(ctm[:2, :2]))) or 1.0
+        local_tol = abs_tol / scale
+        tag = _tag(el)
+        if tag == "path" and el.get("d"):
+            subpaths = flatten_path(el.get("d"), local_tol)
+            stats["points_in"] += sum(len(p) for p, _ in subpaths)
+            d, count = _path_data(subpaths, local_tol)
+            el.set("d", d)
+            stats["points_out"] += count
+            stats["elements"] += 1
+        elif tag in ("polygon", "polyline") and el.get("points"):
+            stats["points_in"] += len(_NUMBER_RE.findall(el.get("points"))) // 2
+            points, count = _points_data(el.get("points"), tag == "polygon", local_tol)
+            el.set("points", points)
+            stats["points_out"] += count
+            stats["elements"] += 1
+        for child in el:
+            walk(child, ctm)
+
+    walk(root, np.eye(3))
+    return ET.tostring(root, encoding="utf-8", xml_declaration=True), stats
+
+
+def emblem_key(svg: bytes, tolerance: float) -> str:
+    h = hashlib.sha256()
+    h.update(f"emblem\0{PIPELINE_VERSION}\0{tolerance!r}\0".encode("ascii"))
+    h.update(svg)
+    return h.hexdigest()
+
+
+def prepare_emblem(svg: bytes, tolerance: float = DEFAULT_TOLERANCE, cache_dir: Path = EMBLEM_CACHE_DIR) -> bytes:
+    """
+    Simplified emblem for OpenSCAD, keyed by the upload's content: a logo
+    seen before is read back instead of parsed again. Returns the original
+    bytes when tolerance is 0 or the SVG cannot be processed, leaving the
+    decision to OpenSCAD.
+    """
+    if tolerance <= 0:
+        return svg
+    path = Path(cache_dir) / f"{emblem_key(svg, tolerance)}.svg"
+    try:
+        return path.read_bytes()
+    except OSError:
+        pass
+    try:
+        out, _ = simplify_svg(svg, tolerance)
+    except ValueError:
+        return svg
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".emblem_", dir=path.parent)
+        with os.fdopen(fd, "wb") as f:
+            f.write(out)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Flatten and simplify an SVG emblem the way builds do.")
+    parser.add_argument("svg", type=Path)
+    parser.add_argument("out", type=Path)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Max deviation as a fraction of the drawing's larger side")
+    args = parser.parse_args(argv)
+    out, stats = simplify_svg(args.svg.read_bytes(), args.tolerance)
+    args.out.write_bytes(out)
+    print(f"{stats['elements']} elements, {stats['points_in']} -> {stats['points_out']} points", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
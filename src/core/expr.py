@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import ast
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Mapping, Optional, Union
+
+import numpy as np
+
+Number = Union[int, float]
+
+# Node kinds of the compiled tree: ("const", value), ("var", name),
+# ("neg", child), ("add" | "sub" | "mul" | "div", left, right).
+_BINOPS = {ast.Add: "add", ast.Sub: "sub", ast.Mult: "mul", ast.Div: "div"}
+
+
+def _div(a: float, b: float) -> float:
+    return a / b if b != 0 else 0.0
+
+
+def _fold(op: str, a: float, b: float) -> float:
+    if op == "add":
+        return a + b
+    if op == "sub":
+        return a - b
+    if op == "mul":
+        return a * b
+    return _div(a, b)
+
+
+def _build(node: ast.AST) -> tuple:
+    """
+    Converts the parsed expression into the compiled tree, folding constant
+    subtrees. Unsupported syntax evaluates to 0.0, as eval_expr always did.
+    """
+    if isinstance(node, ast.Expression):
+        return _build(node.body)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+        op = _BINOPS[type(node.op)]
+        left, right = _build(node.left), _build(node.right)
+        if left[0] == "const" and right[0] == "const":
+            return ("const", _fold(op, left[1], right[1]))
+        return (op, left, right)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        child = _build(node.operand)
+        if isinstance(node.op, ast.UAdd):
+            return child
+        if child[0] == "const":
+            return ("const", -child[1])
+        return ("neg", child)
+    if isinstance(node, ast.Name):
+        return ("var", node.id)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return ("const", float(node.value))
+    return ("const", 0.0)
+
+
+def _variables(tree: tuple) -> FrozenSet[str]:
+    if tree[0] == "var":
+        return frozenset([tree[1]])
+    if tree[0] == "const":
+        return frozenset()
+    return frozenset().union(*(_variables(child) for child in tree[1:]))
+
+
+def _source(tree: tuple) -> str:
+    kind = tree[0]
+    if kind == "const":
+        return repr(tree[1]) if np.isfinite(tree[1]) else f"_f({repr(tree[1])!r})"
+    if kind == "var":
+        return f"_f(_p.get({tree[1]!r}, 0.0))"
+    if kind == "neg":
+        return f"(-{_source(tree[1])})"
+    if kind == "div":
+        return f"_div({_source(tree[1])}, {_source(tree[2])})"
+    sym = {"add": "+", "sub": "-", "mul": "*"}[kind]
+    return f"({_source(tree[1])} {sym} {_source(tree[2])})"
+
+
+def _vector(tree: tuple, columns: Mapping[str, Any], n: int) -> np.ndarray:
+    kind = tree[0]
+    if kind == "const":
+        return np.full(n, tree[1], dtype=np.float64)
+    if kind == "var":
+        col = columns.get(tree[1], 0.0)
+        return np.broadcast_to(np.asarray(col, dtype=np.float64), (n,))
+    if kind == "neg":
+        return -_vector(tree[1], columns, n)
+    a = _vector(tree[1], columns, n)
+    b = _vector(tree[2], columns, n)
+    if kind == "add":
+        return a + b
+    if kind == "sub":
+        return a - b
+    if kind == "mul":
+        return a * b
+    return np.divide(a, b, out=np.zeros(n, dtype=np.float64), where=b != 0)
+
+
+class CompiledExpr:
+    """
+    A schema expression compiled to a Python function of a params dict.
+    Missing variables read as 0.0 and division by zero yields 0.0.
+    """
+
+    __slots__ = ("source", "variables", "constant", "_tree", "_fn")
+
+    def __init__(self, source: str, tree: tuple):
+        self.source = source
+        self._tree = tree
+        self.variables = _variables(tree)
+        self.constant: Optional[float] = tree[1] if tree[0] == "const" else None
+        code = compile(f"lambda _p: {_source(tree)}", f"<expr {source!r}>", "eval")
+        self._fn: Callable[[Mapping[str, Any]], float] = eval(code, {"_f": float, "_div": _div, "__builtins__": {}})
+
+    def __call__(self, params: Mapping[str, Any]) -> float:
+        if self.constant is not None:
+            return self.constant
+        return self._fn(params)
+
+    def evaluate(self, columns: Mapping[str, Any], n: Optional[int] = None) -> np.ndarray:
+        """
+        Vectorized evaluation over columns of param values (arrays or scalars,
+        one entry per variant). Returns a float64 array of length n.
+        """
+        if n is None:
+            lengths = [np.size(columns[v]) for v in self.variables if v in columns and np.ndim(columns[v]) > 0]
+            n = max(lengths) if lengths else 1
+        return _vector(self._tree, columns, n)
+
+    def __repr__(self) -> str:
+        return f"CompiledExpr({self.source!r})"
+
+
+@lru_cache(maxsize=1024)
+def compile_expr(source: str) -> CompiledExpr:
+    """
+    Compiles (and caches) a schema expression such as "w - 2*pad_x".
+    Raises SyntaxError for text that does not parse.
+    """
+    return CompiledExpr(source, _build(ast.parse(source, mode="eval")))
+
+
+def columns_from_rows(rows, names) -> Dict[str, np.ndarray]:
+    """
+    Columns of float values for names out of a list of param dicts; values
+    that are missing or not numeric become 0.0.
+    """
+    out = {}
+    for name in names:
+        col = np.zeros(len(rows), dtype=np.float64)
+        for i, row in enumerate(rows):
+            try:
+                col[i] = float(row.get(name, 0.0))
+            except (TypeError, ValueError):
+                col[i] = 0.0
+        out[name] = col
+    return out
+
+
+def evaluate(value: Union[str, Number, None], params: Mapping[str, Any]) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return 0.0
+    try:
+        return float(compile_expr(value)(params))
+    except Exception:
+        return 0.0
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from pathlib import Path
+
+FONTS_DIR = Path(__file__).resolve().parent / "fonts"
+DEFAULT_FONT = "liberation_sans"
+
+
+class FontMetrics:
+    """
+    Advance widths for one font, generated offline by tools/gen_font_metrics.py.
+    Advances are integers in units_per_em; units() converts to a width per
+    unit of OpenSCAD text size.
+    """
+
+    def __init__(self, table: dict):
+        self.font = table["font"]
+        self.units_per_em = int(table["units_per_em"])
+        self.size_to_em = float(table["size_to_em"])
+        self.default = int(table["default"])
+        self.first = int(table["first_codepoint"])
+        self.widths = [int(w) for w in table["widths"]]
+        self.extra = {int(cp): int(w) for cp, w in table.get("extra", {}).items()}
+        self.scale = self.size_to_em / self.units_per_em
+
+    def advance(self, ch: str) -> int:
+        cp = ord(ch)
+        i = cp - self.first
+        if 0 <= i < len(self.widths):
+            w = self.widths[i]
+            return w if w > 0 else self.default
+        return self.extra.get(cp, self.default)
+
+    def advance_sum(self, s: str) -> int:
+        return sum(self.advance(ch) for ch in s)
+
+    def units(self, s: str) -> float:
+        """
+        Advance width of s for text(size=1), in mm.
+        """
+        return self.advance_sum(s) * self.scale
+
+
+@lru_cache(maxsize=8)
+def load_metrics(name: str = DEFAULT_FONT) -> FontMetrics:
+    path = FONTS_DIR / f"{name}.json"
+    if not path.exists():
+        raise FileNotFoundError(f"Missing font metrics: {path}")
+    return FontMetrics(json.loads(path.read_text()))
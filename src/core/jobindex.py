@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+OUT_DIR = Path(__file__).resolve().parents[2] / "out"
+INDEX_NAME = ".jobs.sqlite"
+RESCAN_INTERVAL_S = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    stl_path TEXT PRIMARY KEY,
+    job TEXT NOT NULL,
+    template_id TEXT,
+    params_hash TEXT,
+    size INTEGER,
+    mtime REAL,
+    ok INTEGER,
+    watertight INTEGER,
+    faces INTEGER,
+    volume_mm3 REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_mtime ON jobs (mtime DESC);
+CREATE INDEX IF NOT EXISTS jobs_template ON jobs (template_id, mtime DESC);
+CREATE TABLE IF NOT EXISTS dirs (
+    job TEXT PRIMARY KEY,
+    mtime_ns INTEGER
+);
+"""
+
+
+def params_hash(params: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def _read_json(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def job_stl(job_dir: Path) -> Optional[Path]:
+    """
+    The STL a job's report.json describes: the newest model_<stamp>.stl,
+    draft or final, since every build rewrites the report.
+    """
+    stls = sorted(Path(job_dir).glob("model_*.stl"))
+    return stls[-1] if stls else None
+
+
+class JobIndex:
+    """
+    SQLite index of the STLs under an output dir, so listing jobs does not
+    walk the tree. build_job records each build as it finishes; sync()
+    picks up anything else (deleted jobs, copies, older outputs) by
+    rescanning only the job dirs whose mtime changed.
+    """
+
+    def __init__(self, out_dir: Path = OUT_DIR, db_path: Optional[Path] = None,
+                 rescan_interval: float = RESCAN_INTERVAL_S):
+        self.out_dir = Path(out_dir).resolve()
+        self.db_path = Path(db_path) if db_path else self.out_dir / INDEX_NAME
+        self.rescan_interval = float(rescan_interval)
+        self._last_scan = 0.0
+        self._last_root_mtime_ns = -1
+        self._lock = threading.Lock()
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as db, db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(str(self.db_path), timeout=10)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def _row(self, job: str, stl: Path, st: os.stat_result, template_id: Optional[str],
+             phash: Optional[str], report: Dict[str, Any]) -> tuple:
+        return (
+            str(stl), job, template_id, phash, st.st_size, st.st_mtime,
+            int(bool(report.get("ok"))) if report else None,
+            int(bool(report.get("watertight"))) if "watertight" in report else None,
+            report.get("faces"), report.get("volume_mm3"),
+        )
+
+    def record(self, job_dir: Path, stl_path: Path, template_id: str, params: Dict[str, Any],
+               report: Dict[str, Any]) -> None:
+        """
+        Upserts one finished build.
+        """
+        job_dir = Path(job_dir).resolve()
+        stl_path = Path(stl_path).resolve()
+        row = self._row(job_dir.name, stl_path, stl_path.stat(), template_id, params_hash(params), report)
+        with closing(self._connect()) as db, db:
+            db.execute("INSERT OR REPLACE INTO jobs VALUES (?,?,?,?,?,?,?,?,?,?)", row)
+            db.execute("INSERT OR REPLACE INTO dirs VALUES (?,?)", (job_dir.name, job_dir.stat().st_mtime_ns))
+
+    def _scan_dir(self, db: sqlite3.Connection, job: str, path: Path) -> None:
+        spec = _read_json(path / "spec.json")
+        report = _read_json(path / "report.json")
+        render_params = spec.get("render_params", spec.get("params"))
+        phash = params_hash(render_params) if render_params is not None else None
+        # report.json only describes the latest render; drafts and older
+        # renders are listed as unvalidated
+        reported = job_stl(path)
+        db.execute("DELETE FROM jobs WHERE job = ?", (job,))
+        rows = []
+        for entry in os.scandir(path):
+            if entry.is_file() and entry.name.lower().endswith(".stl"):
+                stl = Path(entry.path)
+                rows.append(self._row(job, stl, entry.stat(), spec.get("template_id"), phash,
+                                      report if stl == reported else {}))
+        db.executemany("INSERT OR REPLACE INTO jobs VALUES (?,?,?,?,?,?,?,?,?,?)", rows)
+
+    def sync(self, force: bool = False) -> int:
+        """
+        Rescans job dirs whose mtime changed since they were indexed. Runs
+        when the output dir itself changed or rescan_interval has passed.
+        Returns the number of dirs rescanned.
+        """
+        with self._lock:
+            root_mtime_ns = self.out_dir.stat().st_mtime_ns
+            now = time.monotonic()
+            if not force and root_mtime_ns == self._last_root_mtime_ns and now - self._last_scan < self.rescan_interval:
+                return 0
+            self._last_root_mtime_ns = root_mtime_ns
+            self._last_scan = now
+
+            with closing(self._connect()) as db, db:
+                known = {r["job"]: r["mtime_ns"] for r in db.execute("SELECT job, mtime_ns FROM dirs")}
+                seen = set()
+                rescanned = 0
+                for entry in os.scandir(self.out_dir):
+                    if not entry.is_dir() or entry.name.startswith("."):
+                        continue
+                    seen.add(entry.name)
+                    mtime_ns = entry.stat().st_mtime_ns
+                    if known.get(entry.name) == mtime_ns:
+                        continue
+                    self._scan_dir(db, entry.name, Path(entry.path))
+                    db.execute("INSERT OR REPLACE INTO dirs VALUES (?,?)", (entry.name, mtime_ns))
+                    rescanned += 1
+                gone = [(job,) for job in known if job not in seen]
+                db.executemany("DELETE FROM jobs WHERE job = ?", gone)
+                db.executemany("DELETE FROM dirs WHERE job = ?", gone)
+            return rescanned + len(gone)
+
+    def _where(self, template_id: Optional[str], search: Optional[str], ok: Optional[bool]):
+        clauses, args = [], []
+        if template_id:
+            clauses.append("template_id = ?")
+            args.append(template_id)
+        if search:
+            clauses.append("(job LIKE ? OR stl_path LIKE ?)")
+            args += [f"%{search}%", f"%{search}%"]
+        if ok is not None:
+            clauses.append("ok = ?")
+            args.append(int(ok))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def query(self, template_id: Optional[str] = None, search: Optional[str] = None, ok: Optional[bool] = None,
+              limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Newest-first page of indexed STLs, optionally filtered by template,
+        a substring of the job name/path, or validation result.
+        """
+        where, args = self._where(template_id, search, ok)
+        sql = f"SELECT * FROM jobs{where} ORDER BY mtime DESC LIMIT ? OFFSET ?"
+        with closing(self._connect()) as db:
+            return [dict(r) for r in db.execute(sql, args + [int(limit), int(offset)])]
+
+    def count(self, template_id: Optional[str] = None, search: Optional[str] = None, ok: Optional[bool] = None) -> int:
+        where, args = self._where(template_id, search, ok)
+        with closing(self._connect()) as db:
+            return int(db.execute(f"SELECT COUNT(*) FROM jobs{where}", args).fetchone()[0])
+
+
+_indexes: Dict[Path, JobIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def job_index(out_dir: Path = OUT_DIR) -> JobIndex:
+    out_dir = Path(out_dir).resolve()
+    with _indexes_lock:
+        if out_dir not in _indexes:
+            _indexes[out_dir] = JobIndex(out_dir)
+        return _indexes[out_dir]
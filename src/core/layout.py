@@ -1,6 +1,157 @@
 from __future__ import annotations
 
-from typing import Iterable, List, Union
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Sequence, Tuple, Union
+
+from src.core.font_metrics import load_metrics
+from src.core.metrics import span
+
+ELLIPSIS = "…"
+SIZE_STEP = 0.5
+LAYOUT_CACHE_SIZE = 4096
+
+
+def char_units(ch: str) -> int:
+    """
+    Advance of ch in font units; integer so that line widths can be summed
+    and compared exactly.
+    """
+    return load_metrics().advance(ch)
+
+
+def char_factor(ch: str) -> float:
+    metrics = load_metrics()
+    return metrics.advance(ch) * metrics.scale
+
+
+def units(s: str) -> float:
+    return load_metrics().units(s)
+
+
+def _prefix(weights: Sequence[int]) -> List[int]:
+    out = [0]
+    for w in weights:
+        out.append(out[-1] + w)
+    return out
+
+
+def _optimal_breaks(prefix: Sequence[int], count: int, sep: int) -> Iterator[List[int]]:
+    """
+    Splits items 0..m-1 (weights given as prefix sums) into count non-empty
+    consecutive pieces minimizing the widest piece, where a piece of k items
+    also pays (k - 1) * sep. Yields the count - 1 break indices of every
+    optimal split, in lexicographic order.
+    """
+    m = len(prefix) - 1
+
+    def cost(a: int, b: int) -> int:
+        return prefix[b] - prefix[a] + sep * (b - a - 1)
+
+    # best[k][i]: smallest achievable widest piece for items i..m-1 in k pieces
+    best = [None, [cost(i, m) if i < m else None for i in range(m + 1)]]
+    for k in range(2, count + 1):
+        prev = best[k - 1]
+        row: List = [None] * (m + 1)
+        for i in range(0, m - k + 1):
+            top = None
+            for b in range(i + 1, m - k + 2):
+                c = cost(i, b)
+                if top is not None and c >= top:
+                    break
+                score = max(c, prev[b])
+                if top is None or score < top:
+                    top = score
+            row[i] = top
+        best.append(row)
+
+    target = best[count][0]
+
+    def walk(i: int, k: int, breaks: List[int]) -> Iterator[List[int]]:
+        if k == 1:
+            yield breaks
+            return
+        for b in range(i + 1, m - k + 2):
+            if cost(i, b) > target:
+                return
+            if best[k - 1][b] <= target:
+                yield from walk(b, k - 1, breaks + [b])
+
+    yield from walk(0, count, [])
+
+
+def split_no_spaces(value: str, count: int) -> List[str]:
+    if count <= 1:
+        return [value]
+    n = len(value)
+    if n <= count:
+        return [value] + [""] * (count - 1)
+
+    breaks = next(_optimal_breaks(_prefix([char_units(ch) for ch in value]), count, 0))
+    cuts = [0] + breaks + [n]
+    return [value[a:b] for a, b in zip(cuts, cuts[1:])]
+
+
+def split_words(value: str, count: int) -> List[str]:
+    words = value.split()
+    if len(words) < count:
+        return split_no_spaces(value, count)
+
+    weights = [sum(char_units(ch) for ch in w) for w in words]
+    breaks = next(_optimal_breaks(_prefix(weights), count, char_units(" ")))
+    cuts = [0] + breaks + [len(words)]
+    return [" ".join(words[a:b]) for a, b in zip(cuts, cuts[1:])]
+
+
+def wrap(value: str, count: int) -> List[str]:
+    if count <= 1:
+        return [value]
+    if " " in value:
+        return split_words(value, count)
+    return split_no_spaces(value, count)
+
+
+def truncate_line(line: str, text_size: float, max_width: float) -> str:
+    if max_width <= 0 or text_size <= 0:
+        return ELLIPSIS
+    max_units = max_width / text_size
+    if units(line) <= max_units:
+        return line
+    allowed = max_units - units(ELLIPSIS)
+    if allowed <= 0:
+        return ELLIPSIS
+    acc = 0.0
+    out = ""
+    for ch in line:
+        u = char_factor(ch)
+        if acc + u > allowed:
+            break
+        out += ch
+        acc += u
+    return out + ELLIPSIS
+
+
+def _compute_offsets(count: int, gap: float) -> List[float]:
+    if count <= 1:
+        return [0.0]
+    mid = (count - 1) / 2.0
+    return [((mid - i) * gap) for i in range(count)]
+
+
+def _gap_for_height(text_size: float, count: int, box_h_eff: float, line_gap_mm: float) -> float:
+    if count <= 1:
+        return 0.0
+    max_gap = (box_h_eff - text_size) / (count - 1)
+    if max_gap < 0:
+        return -1.0
+    return min(line_gap_mm, max_gap)
+
+
+def _candidate_sizes(max_text_size: float, min_text_size: float) -> List[float]:
+    steps = int(round((max_text_size - min_text_size) / SIZE_STEP))
+    sizes = [max_text_size - i * SIZE_STEP for i in range(steps + 1)]
+    if sizes[-1] > min_text_size:
+        sizes.append(min_text_size)
+    return sizes
 
 
 def layout_text(
@@ -30,118 +181,40 @@ def layout_text(
         parts = [str(p).strip() for p in text_or_lines if str(p).strip()]
         raw_text = " ".join(parts).strip()
 
-    wide = set("WM")
-    medium = set("AVYXK")
-    narrow = set("Il1|")
-
-    def char_factor(ch: str) -> float:
-        if ch == " ":
-            return 0.35
-        if ch in narrow:
-            return 0.36
-        if ch in wide:
-            return 0.98
-        if ch in medium:
-            return 0.75
-        return 0.62
-
-    def units(s: str) -> float:
-        return sum(char_factor(ch) for ch in s)
-
-    def line_width(line: str, text_size: float) -> float:
-        return text_size * units(line)
-
-    def truncate_line(line: str, text_size: float, max_width: float) -> str:
-        if max_width <= 0 or text_size <= 0:
-            return "…"
-        max_units = max_width / text_size
-        if units(line) <= max_units:
-            return line
-        ellipsis = "…"
-        allowed = max_units - units(ellipsis)
-        if allowed <= 0:
-            return ellipsis
-        acc = 0.0
-        out = ""
-        for ch in line:
-            u = char_factor(ch)
-            if acc + u > allowed:
-                break
-            out += ch
-            acc += u
-        return out + ellipsis
-
-    def split_no_spaces(value: str, count: int) -> List[str]:
-        if count <= 1:
-            return [value]
-        n = len(value)
-        if n <= count:
-            return [value] + [""] * (count - 1)
-        if count == 2:
-            best = None
-            for i in range(1, n):
-                a = value[:i]
-                b = value[i:]
-                score = max(units(a), units(b))
-                if best is None or score < best[0]:
-                    best = (score, [a, b])
-            return best[1]
-        best = None
-        for i in range(1, n - 1):
-            for j in range(i + 1, n):
-                a = value[:i]
-                b = value[i:j]
-                c = value[j:]
-                score = max(units(a), units(b), units(c))
-                if best is None or score < best[0]:
-                    best = (score, [a, b, c])
-        return best[1]
-
-    def split_words(value: str, count: int) -> List[str]:
-        words = value.split()
-        if len(words) < count:
-            return split_no_spaces(value, count)
-        if count == 2:
-            best = None
-            for i in range(1, len(words)):
-                a = " ".join(words[:i])
-                b = " ".join(words[i:])
-                score = max(units(a), units(b))
-                if best is None or score < best[0]:
-                    best = (score, [a, b])
-            return best[1]
-        best = None
-        for i in range(1, len(words) - 1):
-            for j in range(i + 1, len(words)):
-                a = " ".join(words[:i])
-                b = " ".join(words[i:j])
-                c = " ".join(words[j:])
-                score = max(units(a), units(b), units(c))
-                if best is None or score < best[0]:
-                    best = (score, [a, b, c])
-        return best[1]
-
-    def wrap(value: str, count: int) -> List[str]:
-        if count <= 1:
-            return [value]
-        if " " in value:
-            return split_words(value, count)
-        return split_no_spaces(value, count)
+    with span("layout.layout_text"):
+        layout = _layout_cached(raw_text, max_lines, box_w_mm, box_h_mm, max_text_size, min_text_size, margin, line_gap_mm)
+    return {k: (list(v) if isinstance(v, tuple) else v) for k, v in layout}
+
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def _layout_cached(
+    raw_text: str,
+    max_lines: int,
+    box_w_mm: float,
+    box_h_mm: float,
+    max_text_size: float,
+    min_text_size: float,
+    margin: float,
+    line_gap_mm: float,
+) -> Tuple[Tuple[str, object], ...]:
+    layout = _layout(raw_text, max_lines, box_w_mm, box_h_mm, max_text_size, min_text_size, margin, line_gap_mm)
+    return tuple((k, tuple(v) if isinstance(v, list) else v) for k, v in layout.items())
 
-    def compute_offsets(count: int, gap: float) -> List[float]:
-        if count <= 1:
-            return [0.0]
-        mid = (count - 1) / 2.0
-        return [((mid - i) * gap) for i in range(count)]
 
-    def gap_for_height(text_size: float, count: int, box_h_eff: float) -> float:
-        if count <= 1:
-            return 0.0
-        max_gap = (box_h_eff - text_size) / (count - 1)
-        if max_gap < 0:
-            return -1.0
-        return min(line_gap_mm, max_gap)
+def clear_layout_cache() -> None:
+    _layout_cached.cache_clear()
 
+
+def _layout(
+    raw_text: str,
+    max_lines: int,
+    box_w_mm: float,
+    box_h_mm: float,
+    max_text_size: float,
+    min_text_size: float,
+    margin: float,
+    line_gap_mm: float,
+) -> dict:
     box_w_eff = box_w_mm * margin
     box_h_eff = box_h_mm * margin
 
@@ -156,48 +229,72 @@ def layout_text(
             "line_widths": [0.0],
         }
 
-    step = 0.5
-    steps = int(round((max_text_size - min_text_size) / step)) if step > 0 else 0
-    sizes = [max_text_size - i * step for i in range(steps + 1)]
-    if sizes[-1] > min_text_size:
-        sizes.append(min_text_size)
+    # Line breaks do not depend on the text size, so each candidate line
+    # count is wrapped once and its widest line measured once.
+    wrapped = {}
 
-    for text_size in sizes:
-        for count in range(1, max_lines + 1):
-            if count == 1 and text_size > box_h_eff:
-                continue
+    def wrapped_for(count: int) -> Tuple[List[str], List[float]]:
+        if count not in wrapped:
             lines = wrap(raw_text, count)
-            widths = [line_width(line, text_size) for line in lines]
-            if widths and max(widths) > box_w_eff:
-                continue
-            gap_eff = gap_for_height(text_size, count, box_h_eff)
-            if gap_eff < 0:
-                continue
-            offsets_y = compute_offsets(count, gap_eff)
-            warning = ""
-            if count > 1 and gap_eff < line_gap_mm:
-                warning = "Line gap reduced to fit the text box."
-            return {
-                "lines": lines,
-                "text_size": text_size,
-                "offsets_y": offsets_y,
-                "scale": 1.0,
-                "truncated": False,
-                "warning": warning,
-                "line_widths": widths,
-                "line_gap_mm": gap_eff,
-            }
+            wrapped[count] = (lines, [units(line) for line in lines])
+        return wrapped[count]
+
+    def fits(text_size: float, count: int) -> bool:
+        if count == 1 and text_size > box_h_eff:
+            return False
+        _, line_units = wrapped_for(count)
+        widths = [text_size * u for u in line_units]
+        if widths and max(widths) > box_w_eff:
+            return False
+        return _gap_for_height(text_size, count, box_h_eff, line_gap_mm) >= 0
+
+    def first_fit(text_size: float):
+        for count in range(1, max_lines + 1):
+            if fits(text_size, count):
+                return count
+        return None
+
+    # Fitting only gets easier as the text shrinks, so binary search for the
+    # largest candidate size that fits with any line count.
+    sizes = _candidate_sizes(max_text_size, min_text_size)
+    lo, hi = 0, len(sizes)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if first_fit(sizes[mid]) is not None:
+            hi = mid
+        else:
+            lo = mid + 1
+
+    if lo < len(sizes):
+        text_size = sizes[lo]
+        count = first_fit(text_size)
+        lines, line_units = wrapped_for(count)
+        widths = [text_size * u for u in line_units]
+        gap_eff = _gap_for_height(text_size, count, box_h_eff, line_gap_mm)
+        warning = ""
+        if count > 1 and gap_eff < line_gap_mm:
+            warning = "Line gap reduced to fit the text box."
+        return {
+            "lines": list(lines),
+            "text_size": text_size,
+            "offsets_y": _compute_offsets(count, gap_eff),
+            "scale": 1.0,
+            "truncated": False,
+            "warning": warning,
+            "line_widths": widths,
+            "line_gap_mm": gap_eff,
+        }
 
     final_text_size = min(min_text_size, box_h_eff) if box_h_eff > 0 else min_text_size
-    lines = wrap(raw_text, max_lines)
-    gap_eff = gap_for_height(final_text_size, len(lines), box_h_eff)
+    lines = list(wrapped_for(max_lines)[0])
+    gap_eff = _gap_for_height(final_text_size, len(lines), box_h_eff, line_gap_mm)
     if gap_eff < 0:
         gap_eff = 0.0
-    offsets_y = compute_offsets(len(lines), gap_eff)
-    widths = [line_width(line, final_text_size) for line in lines]
+    offsets_y = _compute_offsets(len(lines), gap_eff)
+    widths = [final_text_size * units(line) for line in lines]
     if widths:
         lines[-1] = truncate_line(lines[-1], final_text_size, box_w_eff)
-        widths[-1] = line_width(lines[-1], final_text_size)
+        widths[-1] = final_text_size * units(lines[-1])
     warning = "Text truncated to fit the text box."
     if len(lines) > 1 and gap_eff < line_gap_mm:
         warning = "Text truncated; line gap reduced to fit the text box."
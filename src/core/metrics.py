@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+METRICS_PATH = Path(__file__).resolve().parents[2] / "out" / "metrics.jsonl"
+METRICS_MAX_BYTES = 4 * 1024 * 1024
+
+ENABLED = os.environ.get("PROMPTTOSTL_METRICS", "1") != "0"
+
+_recorder: ContextVar[Optional["Recorder"]] = ContextVar("metrics_recorder", default=None)
+_append_lock = threading.Lock()
+
+
+class Recorder:
+    """
+    Accumulates span durations for one build. Spans with the same name are
+    summed and counted. The largest peak RSS of the OpenSCAD processes run
+    during the build is kept too (see record_child_rss).
+    """
+
+    def __init__(self):
+        self.stages_ms: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.child_rss_mb: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add_child_rss(self, mb: float) -> None:
+        with self._lock:
+            self.child_rss_mb = mb if self.child_rss_mb is None else max(self.child_rss_mb, mb)
+
+    def add(self, name: str, ms: float) -> None:
+        with self._lock:
+            self.stages_ms[name] = self.stages_ms.get(name, 0.0) + ms
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {k: round(v, 3) for k, v in self.stages_ms.items()}
+            calls = dict(self.calls)
+            child = self.child_rss_mb
+        return {"stages_ms": stages, "calls": calls,
+                "peak_rss_mb": {"openscad": child, "process_lifetime": process_peak_rss_mb()}}
+
+
+class _Span:
+    __slots__ = ("name", "recorder", "t0")
+
+    def __init__(self, name: str, recorder: Recorder):
+        self.name = name
+        self.recorder = recorder
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.add(self.name, (time.perf_counter() - self.t0) * 1000.0)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str):
+    """
+    Times the with-block under name when a recorder is active in this
+    context; otherwise a shared no-op.
+    """
+    rec = _recorder.get()
+    if rec is None:
+        return _NULL_SPAN
+    return _Span(name, rec)
+
+
+def current() -> Optional[Recorder]:
+    return _recorder.get()
+
+
+def start() -> Optional[Recorder]:
+    """
+    Installs a fresh recorder for the rest of the current context (e.g. one
+    Streamlit script run). Returns None when metrics are disabled.
+    """
+    if not ENABLED:
+        return None
+    rec = Recorder()
+    _recorder.set(rec)
+    return rec
+
+
+@contextmanager
+def recording() -> Iterator[Optional[Recorder]]:
+    """
+    Activates a recorder for the block, reusing the one already active so
+    that spans recorded by the caller end up in the same report.
+    """
+    rec = _recorder.get()
+    if rec is not None or not ENABLED:
+        yield rec
+        return
+    rec = Recorder()
+    token = _recorder.set(rec)
+    try:
+        yield rec
+    finally:
+        _recorder.reset(token)
+
+
+def maxrss_mb(rss: int) -> float:
+    """
+    An ru_maxrss value in MB: kilobytes on Linux, bytes on macOS.
+    """
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+def record_child_rss(rss: int) -> None:
+    """
+    Notes the ru_maxrss of a finished child process (as reported by
+    os.wait4 for that child alone) in the active recorder, if any.
+    """
+    rec = _recorder.get()
+    if rec is not None:
+        rec.add_child_rss(maxrss_mb(rss))
+
+
+def process_peak_rss_mb() -> Optional[float]:
+    """
+    High-water mark of this process's RSS since it started, in MB. In a
+    long-running app or service this only ever grows, so it is not a
+    per-build figure.
+    """
+    if resource is None:
+        return None
+    return maxrss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def append_metrics(record: Dict[str, Any], path: Path = METRICS_PATH, max_bytes: int = METRICS_MAX_BYTES) -> None:
+    """
+    Appends one JSON line to the metrics file. Once the file grows past
+    max_bytes the older half is dropped.
+    """
+    path = Path(path)
+    line = json.dumps(dict(record, ts=time.time()), sort_keys=True) + "\n"
+    with _append_lock:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a", encoding="utf-8") as f:
+                f.write(line)
+            if path.stat().st_size > max_bytes:
+                lines = path.read_text(encoding="utf-8").splitlines(keepends=True)
+                tmp = path.with_suffix(".tmp")
+                tmp.write_text("".join(lines[len(lines) // 2:]), encoding="utf-8")
+                os.replace(tmp, path)
+        except OSError:
+            pass
@@ -0,0 +1,480 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.catalog import NATIVE_MODELS, list_templates, load_template
+from src.core.deps import default_values, normalize_params
+from src.core.emblem import flatten_cubic, flatten_quad
+from src.core.font_metrics import load_metrics
+from src.core.metrics import span
+from src.core.params import prepare_params
+from src.core.runner import DEFAULT_EXPORT_FORMAT, render_args, run_openscad
+from src.core.stl_io import read_stl, write_binary_stl
+
+try:
+    import manifold3d
+except ImportError:
+    manifold3d = None
+
+try:
+    from fontTools.pens.basePen import BasePen
+    from fontTools.ttLib import TTFont
+except ImportError:
+    BasePen = object
+    TTFont = None
+
+ENABLED = os.environ.get("PROMPTTOSTL_NATIVE", "1") != "0"
+NATIVE_VERSION = "1"
+# OpenSCAD's default text() font; it ships with OpenSCAD on macOS/Windows.
+FONT_FILE_NAME = "LiberationSans-Regular.ttf"
+FONT_SEARCH_DIRS = (
+    "/usr/share/fonts/truetype/liberation",
+    "/usr/share/fonts/truetype/liberation2",
+    "/usr/share/fonts/liberation-sans",
+    "/usr/share/fonts/liberation",
+    "/usr/local/share/fonts",
+    "/Applications/OpenSCAD.app/Contents/Resources/fonts",
+    "C:/Program Files/OpenSCAD/fonts",
+)
+# Glyph curves are flattened to within this fraction of the em.
+GLYPH_TOLERANCE = 0.001
+# OpenSCAD's $fa/$fs defaults
+DEFAULT_FA = 12.0
+DEFAULT_FS = 2.0
+DEFAULT_COMPARE_TOLERANCE = 0.02
+
+_SPECIAL_RE = re.compile(r"^(\$f[nas])\s*=\s*(-?\d+(?:\.\d*)?)\s*;", re.MULTILINE)
+
+
+class NativeUnsupported(RuntimeError):
+    pass
+
+
+@lru_cache(maxsize=1)
+def font_path() -> Optional[Path]:
+    """
+    The TrueType file text is drawn with: PROMPTTOSTL_FONT_FILE, else
+    Liberation Sans from the usual system and OpenSCAD install locations.
+    """
+    env = os.environ.get("PROMPTTOSTL_FONT_FILE")
+    if env:
+        return Path(env) if Path(env).is_file() else None
+    for d in FONT_SEARCH_DIRS:
+        candidate = Path(d) / FONT_FILE_NAME
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def native_available() -> bool:
+    """
+    The native backend needs the optional manifold3d and fontTools packages
+    and a font file (see font_path); PROMPTTOSTL_NATIVE=0 turns it off.
+    """
+    return ENABLED and manifold3d is not None and TTFont is not None and font_path() is not None
+
+
+@lru_cache(maxsize=1)
+def native_key() -> Dict[str, str]:
+    """
+    What native output depends on besides params, for build cache keys.
+    """
+    path = font_path()
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()[:16] if path is not None else ""
+    return {"native": NATIVE_VERSION, "font": digest}
+
+
+def fragments(r: float, fn: float = 0.0, fa: float = DEFAULT_FA, fs: float = DEFAULT_FS) -> int:
+    """
+    Segments OpenSCAD uses for a full circle of radius r.
+    """
+    if r < 1e-6:
+        return 3
+    if fn > 0:
+        return int(max(fn, 3))
+    return int(math.ceil(max(min(360.0 / fa, r * 2 * math.pi / fs), 5)))
+
+
+def circle_points(r: float, n: int) -> np.ndarray:
+    phi = np.arange(n) * (2 * math.pi / n)
+    return np.column_stack([r * np.cos(phi), r * np.sin(phi)])
+
+
+def rounded_rect_points(w: float, h: float, r: float, n: int) -> np.ndarray:
+    """
+    Outline of minkowski(square([w - 2r, h - 2r], center), circle(r)) with
+    an n-gon circle: the hull of the circle placed at the four corners.
+    """
+    corners = np.array([[1, 1], [-1, 1], [-1, -1], [1, -1]]) * [w / 2 - r, h / 2 - r]
+    pts = (corners[:, None, :] + circle_points(r, n)[None, :, :]).reshape(-1, 2)
+    return np.asarray(manifold3d.CrossSection.hull_points(pts).to_polygons()[0])
+
+
+class _FlattenPen(BasePen):
+    def __init__(self, glyph_set, tolerance: float):
+        super().__init__(glyph_set)
+        self.tolerance = tolerance
+        self.rings: List[np.ndarray] = []
+        self._points: List[np.ndarray] = []
+
+    def _moveTo(self, pt):
+        self._points = [np.asarray([pt], dtype=np.float64)]
+
+    def _lineTo(self, pt):
+        self._points.append(np.asarray([pt], dtype=np.float64))
+
+    def _curveToOne(self, pt1, pt2, pt3):
+        p0 = np.asarray(self._getCurrentPoint(), dtype=np.float64)
+        self._points.append(flatten_cubic(p0, np.asarray(pt1), np.asarray(pt2), np.asarray(pt3), self.tolerance))
+
+    def _qCurveToOne(self, pt1, pt2):
+        p0 = np.asarray(self._getCurrentPoint(), dtype=np.float64)
+        self._points.append(flatten_quad(p0, np.asarray(pt1), np.asarray(pt2), self.tolerance))
+
+    def _closePath(self):
+        if self._points:
+            ring = np.concatenate(self._points)
+            if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+                ring = ring[:-1]
+            if len(ring) >= 3:
+                self.rings.append(ring)
+        self._points = []
+
+    _endPath = _closePath
+
+
+class GlyphTable:
+    """
+    Flattened outlines and advances of one font, in font units, per
+    character. A glyph is converted the first time it is used and kept for
+    the life of the process. Kerning is not applied.
+    """
+
+    def __init__(self, path: Path, tolerance: float = GLYPH_TOLERANCE):
+        self.font = TTFont(str(path), lazy=True)
+        self.units_per_em = int(self.font["head"].unitsPerEm)
+        self.cmap = self.font.getBestCmap()
+        self.glyph_set = self.font.getGlyphSet()
+        self.hmtx = self.font["hmtx"]
+        self.tolerance = tolerance * self.units_per_em
+        self._glyphs: Dict[str, Tuple[List[np.ndarray], float]] = {}
+        self._lock = threading.Lock()
+
+    def glyph(self, ch: str) -> Tuple[List[np.ndarray], float]:
+        with self._lock:
+            entry = self._glyphs.get(ch)
+            if entry is None:
+                name = self.cmap.get(ord(ch), ".notdef")
+                pen = _FlattenPen(self.glyph_set, self.tolerance)
+                self.glyph_set[name].draw(pen)
+                entry = (pen.rings, float(self.hmtx[name][0]))
+                self._glyphs[ch] = entry
+            return entry
+
+    def line(self, s: str) -> Tuple[List[np.ndarray], float]:
+        """
+        Outlines of s set on the baseline from x=0, and its advance width.
+        """
+        rings, x = [], 0.0
+        for ch in s:
+            glyph_rings, advance = self.glyph(ch)
+            rings.extend(r + (x, 0.0) for r in glyph_rings)
+            x += advance
+        return rings, x
+
+
+@lru_cache(maxsize=4)
+def glyph_table(path: Optional[Path] = None) -> GlyphTable:
+    path = path or font_path()
+    if path is None:
+        raise NativeUnsupported("no font file found (set PROMPTTOSTL_FONT_FILE)")
+    return GlyphTable(path)
+
+
+def text_2d(s: str, size: float, halign: str = "center"):
+    """
+    CrossSection of text(s, size, halign, valign="center"): the em is
+    size / 0.72 as in OpenSCAD, halign uses the advance width and valign
+    centers the ink's bounding box.
+    """
+    if not s:
+        return manifold3d.CrossSection()
+    table = glyph_table()
+    rings, advance = table.line(s)
+    if not rings:
+        return manifold3d.CrossSection()
+    k = size * load_metrics().size_to_em / table.units_per_em
+    pts = np.concatenate(rings)
+    x = {"left": 0.0, "right": -advance}.get(halign, -advance / 2) * k
+    y = -(pts[:, 1].min() + pts[:, 1].max()) / 2 * k
+    return manifold3d.CrossSection([r * k + (x, y) for r in rings], manifold3d.FillRule.NonZero)
+
+
+def _extrude(section, height: float, z: float = 0.0):
+    return section.extrude(height).translate((0.0, 0.0, z))
+
+
+def _check_emblem(v: Dict[str, Any]) -> None:
+    if int(v.get("emblem_enabled", 0)) == 1 and v.get("emblem_path"):
+        raise NativeUnsupported("emblems are imported by OpenSCAD")
+
+
+def _union(a, b):
+    return a if b is None or b.is_empty() else a + b
+
+
+def _difference(a, b):
+    return a if b is None or b.is_empty() else a - b
+
+
+def _fitted_line(v: Dict[str, Any], s: str, size: float):
+    # the coaster and keychain scad's fit_scale(line_units(s))
+    units = float(v["line1_units"] if s == v["line1"] else v["line2_units"] if s == v["line2"] else -1)
+    fit_w = float(v["text_fit_w"])
+    scale = min(1.0, fit_w / (size * units)) if fit_w > 0 and units > 0 else 1.0
+    text = text_2d(s, size)
+    return text if scale == 1.0 else text.scale((scale, scale))
+
+
+def _two_lines(v: Dict[str, Any], size: float, gap: float):
+    if v["line2"] == "":
+        return _fitted_line(v, v["line1"], size)
+    return (_fitted_line(v, v["line1"], size).translate((0.0, gap / 2))
+            + _fitted_line(v, v["line2"], size).translate((0.0, -gap / 2)))
+
+
+def build_coaster_round(v: Dict[str, Any]):
+    _check_emblem(v)
+    n = fragments(float(v["diameter"]) / 2, float(v["circle_fn"]))
+    disc = manifold3d.CrossSection([circle_points(float(v["diameter"]) / 2, n)])
+    body = _extrude(disc, float(v["th"]))
+    if int(v["rim"]) == 1:
+        inner = manifold3d.CrossSection([circle_points(float(v["diameter"]) / 2 - float(v["rim_w"]), n)])
+        body = _union(body, _extrude(disc - inner, float(v["rim_h"]), float(v["th"])))
+
+    text = _two_lines(v, float(v["text_size"]), float(v["line_gap"]))
+    text = _extrude(text.translate((float(v["offset_x"]), float(v["offset_y"]))), float(v["text_height"]), float(v["th"]))
+    return _union(body, text) if int(v["emboss"]) == 1 else _difference(body, text)
+
+
+def build_keychain_roundrect(v: Dict[str, Any]):
+    _check_emblem(v)
+    fn = float(v.get("$fn", 0))
+    w, h, th = float(v["w"]), float(v["h"]), float(v["th"])
+    plate = _extrude(manifold3d.CrossSection([rounded_rect_points(w, h, 5.0, fragments(5.0, fn))]), th)
+    r = float(v["hole_d"]) / 2
+    hole = manifold3d.CrossSection([circle_points(r, fragments(r, fn))]).translate((-(w / 2) + float(v["hole_offset_x"]), 0.0))
+    body = _difference(plate, _extrude(hole, th + 2, -1.0))
+
+    text_height = float(v["text_height"])
+    text = _two_lines(v, float(v["text_size"]), float(v["line_gap"]))
+    text = text.translate((float(v["offset_x"]), float(v["offset_y"])))
+    if int(v["emboss"]) == 1:
+        return _union(body, _extrude(text, text_height, th))
+    return _difference(body, _extrude(text, text_height, th - text_height))
+
+
+def _nameplate_text(v: Dict[str, Any]):
+    lines = [v["line1"], v["line2"], v["line3"]]
+    count = sum(1 for s in lines if s != "")
+    size = float(v["text_size"])
+    w, h = float(v["w"]), float(v["h"])
+    margin_x, margin_y = float(v["text_margin_x"]), float(v["text_margin_y"])
+    gap = max(float(v["line_gap"]), size * 1.15)
+    if v["text_anchor_y"] == "top":
+        center_y = (h / 2 - margin_y) - ((count - 1) * float(v["line_gap"])) / 2
+    elif v["text_anchor_y"] == "bottom":
+        center_y = (-(h / 2) + margin_y) + ((count - 1) * float(v["line_gap"])) / 2
+    else:
+        center_y = 0.0
+    center_y += float(v["text_block_center_y"])
+    halign = v["text_align"] if v["text_align"] in ("left", "right") else "center"
+    x_anchor = {"left": -(w / 2) + margin_x, "right": w / 2 - margin_x}.get(halign, 0.0)
+    box_w = float(v["text_box_w"])
+    safe_w = (box_w if box_w > 0 else w - 2 * margin_x) * 0.85
+
+    def factor(s: str) -> float:
+        # first line whose text matches, as the scad's estimate_factor()
+        for i, line in enumerate(lines, start=1):
+            units = float(v[f"line{i}_units"])
+            if s == line and units >= 0:
+                return units
+        return len(s) * 0.70
+
+    offsets = {1: [0.0], 2: [gap / 2, -gap / 2], 3: [gap, 0.0, -gap]}.get(count, [])
+    text = manifold3d.CrossSection()
+    for s, y in zip([s for s in lines if s != ""], offsets):
+        scale = min(1.0, safe_w / max(1.0, size * factor(s)))
+        text += text_2d(s, size, halign).scale((scale, scale)).translate(
+            (x_anchor + float(v["offset_x"]), float(v["offset_y"]) + center_y + y))
+    return _extrude(text, float(v["text_height"]), float(v["th"]))
+
+
+def build_nameplate(v: Dict[str, Any]):
+    _check_emblem(v)
+    w, h, th = float(v["w"]), float(v["h"]), float(v["th"])
+    rc = min(float(v["corner_r"]), min(w, h) / 2)
+    if rc <= 0:
+        outline = np.array([[w / 2, h / 2], [-w / 2, h / 2], [-w / 2, -h / 2], [w / 2, -h / 2]])
+    else:
+        n = fragments(rc, float(v.get("$fn", 0)), float(v.get("$fa", DEFAULT_FA)), float(v.get("$fs", DEFAULT_FS)))
+        outline = rounded_rect_points(w, h, rc, n)
+    plate = _extrude(manifold3d.CrossSection([outline]), th)
+
+    holes = None
+    if int(v["holes"]) == 1:
+        r = float(v["hole_d"]) / 2
+        ring = circle_points(r, fragments(r, float(v["hole_fn"])))
+        x = w / 2 - float(v["hole_offset"])
+        holes = _extrude(manifold3d.CrossSection([ring + (-x, 0.0), ring + (x, 0.0)]), th + 0.2)
+
+    text = _nameplate_text(v)
+    if int(v["emboss"]) == 1:
+        return _difference(_union(plate, text), holes)
+    return _difference(_difference(plate, holes), text)
+
+
+BUILDERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "coaster_round": build_coaster_round,
+    "keychain_roundrect": build_keychain_roundrect,
+    "nameplate": build_nameplate,
+}
+assert set(BUILDERS) == set(NATIVE_MODELS)
+
+
+@lru_cache(maxsize=32)
+def _special_defaults(scad_path: str, mtime_ns: int) -> Dict[str, float]:
+    return {name: float(value) for name, value in _SPECIAL_RE.findall(Path(scad_path).read_text())}
+
+
+def model_values(scad_path: Path, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Every variable a builder reads: params over the scad's literal defaults,
+    including top-level $fn/$fa/$fs.
+    """
+    scad_path = Path(scad_path).resolve()
+    values = default_values(scad_path)
+    values.update(_special_defaults(str(scad_path), scad_path.stat().st_mtime_ns))
+    values.update(params)
+    return values
+
+
+def build_native(model: str, scad_path: Path, params: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (vertices, faces) of a template built in-process. Raises
+    NativeUnsupported for inputs only OpenSCAD can build (emblems).
+    """
+    if manifold3d is None:
+        raise NativeUnsupported("manifold3d is not installed")
+    solid = BUILDERS[model](model_values(scad_path, params))
+    if solid.status() != manifold3d.Error.NoError:
+        raise NativeUnsupported(f"result is not a closed manifold ({solid.status().name})")
+    mesh = solid.to_mesh()
+    return np.array(mesh.vert_properties)[:, :3].copy(), np.array(mesh.tri_verts, dtype=np.int64)
+
+
+def native_render(
+    openscad_exe: str,
+    scad_path: Path,
+    out_stl: Path,
+    params: Dict[str, Any],
+    export_format: Optional[str] = DEFAULT_EXPORT_FORMAT,
+    *,
+    native: dict,
+    render: Callable[..., str] = run_openscad,
+) -> str:
+    """
+    Drop-in for run_openscad that builds the template named by
+    native["model"] in-process: numpy outlines, cached glyph outlines for
+    text, and manifold3d extrusion and booleans. The result is always
+    written as binary STL. Falls back to render (OpenSCAD, or a composed
+    render) for what the native builders do not cover.
+    """
+    t0 = time.perf_counter()
+    try:
+        with span("native.build"):
+            vertices, faces = build_native(native["model"], scad_path, params)
+    except NativeUnsupported as e:
+        return f"[native] {e}; rendering with OpenSCAD instead\n" + render(
+            openscad_exe, scad_path, out_stl, params, export_format=export_format)
+    with span("native.write"):
+        write_binary_stl(out_stl, vertices, faces, header=f"PromptToSTL native {native['model']}")
+    return f"[native] {native['model']}: {len(faces)} faces in {(time.perf_counter() - t0) * 1000:.1f} ms\n"
+
+
+def _solid(vertices: np.ndarray, faces: np.ndarray):
+    return manifold3d.Manifold(manifold3d.Mesh(vert_properties=np.ascontiguousarray(vertices, dtype=np.float32),
+                                               tri_verts=np.ascontiguousarray(faces, dtype=np.uint32)))
+
+
+def compare_template(template_id: str, openscad_exe: str, work_dir: Path) -> Dict[str, Any]:
+    """
+    Builds a template's shipped defaults natively and with OpenSCAD and
+    reports both timings, volumes, bounding boxes and the volume of their
+    symmetric difference relative to the OpenSCAD volume.
+    """
+    schema, scad_path = load_template(template_id)
+    params, _ = prepare_params(template_id, schema, {})
+    params = normalize_params(params, scad_path, schema.get("dependencies"))
+
+    t0 = time.perf_counter()
+    nv, nf = build_native(schema["native"]["model"], scad_path, params)
+    native_s = time.perf_counter() - t0
+    out = work_dir / f"{template_id}.stl"
+    t0 = time.perf_counter()
+    run_openscad(openscad_exe, scad_path, out, params, extra_args=render_args(openscad_exe, schema.get("render")))
+    openscad_s = time.perf_counter() - t0
+    ov, of = read_stl(out)
+
+    a, b = _solid(nv, nf), _solid(ov, of)
+    xor = (a - b).volume() + (b - a).volume()
+    return {
+        "template_id": template_id,
+        "native_ms": native_s * 1000.0,
+        "openscad_ms": openscad_s * 1000.0,
+        "native_volume_mm3": a.volume(),
+        "openscad_volume_mm3": b.volume(),
+        "native_bounds": np.concatenate([nv.min(axis=0), nv.max(axis=0)]).round(3).tolist(),
+        "openscad_bounds": np.concatenate([ov.min(axis=0), ov.max(axis=0)]).round(3).tolist(),
+        "xor_ratio": xor / b.volume() if b.volume() > 0 else float("inf"),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Check native builds against OpenSCAD on each template's shipped defaults.")
+    parser.add_argument("templates", nargs="*", help="Template ids (default: all with a native block)")
+    parser.add_argument("--openscad", default="openscad")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_COMPARE_TOLERANCE,
+                        help="Max symmetric-difference volume as a fraction of the OpenSCAD volume")
+    args = parser.parse_args(argv)
+    if not native_available():
+        print("native backend unavailable: needs manifold3d, fontTools and a font file", file=sys.stderr)
+        return 2
+    template_ids = args.templates or [t for t in list_templates() if load_template(t)[0].get("native")]
+    failed = 0
+    with tempfile.TemporaryDirectory(prefix="native_compare_") as tmp:
+        for template_id in template_ids:
+            result = compare_template(template_id, args.openscad, Path(tmp))
+            result["ok"] = result["xor_ratio"] <= args.tolerance
+            failed += not result["ok"]
+            print(json.dumps(result), flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.expr import CompiledExpr, columns_from_rows, compile_expr, evaluate
+from src.core.layout import layout_text, units
+from src.core.metrics import span
+
+TEXT_MARGIN = 0.9
+# Base defines for draft renders: coarse curves everywhere, text included.
+DRAFT_DEFINES = {"$fn": 8}
+
+
+def coerce_value(value: Any, spec: Dict[str, Any]) -> Any:
+    default = spec.get("default")
+    vtype = spec.get("type", "string")
+    if value is None:
+        return default
+    if vtype in {"int", "integer"}:
+        try:
+            val = int(float(value))
+        except Exception:
+            return default
+        min_v = spec.get("min")
+        max_v = spec.get("max")
+        if min_v is not None:
+            val = max(int(min_v), val)
+        if max_v is not None:
+            val = min(int(max_v), val)
+        return val
+    if vtype == "number":
+        try:
+            val = float(value)
+        except Exception:
+            return default
+        min_v = spec.get("min")
+        max_v = spec.get("max")
+        if min_v is not None:
+            val = max(float(min_v), val)
+        if max_v is not None:
+            val = min(float(max_v), val)
+        return val
+    return str(value)
+
+
+def sanitize_params(schema: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    with span("params.coerce"):
+        for key, spec in schema.get("params", {}).items():
+            if key in params:
+                out[key] = coerce_value(params.get(key), spec)
+            else:
+                out[key] = spec.get("default")
+    return out
+
+
+def eval_expr(value, params):
+    """
+    Value of a schema expression (number or string such as "w - 2*pad_x")
+    for params; anything that cannot be evaluated gives 0.0.
+    """
+    return evaluate(value, params)
+
+
+def eval_text_boxes(schema: Dict[str, Any], rows: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Text box dims for many param rows in one vectorized pass. Returns
+    arrays box_w, box_h, offset_x, offset_y with one entry per row.
+    """
+    text_box = schema.get("text_box") or {}
+    exprs = {}
+    for key in ("box_w", "box_h", "offset_x", "offset_y"):
+        value = text_box.get(key, 0)
+        try:
+            exprs[key] = compile_expr(value) if isinstance(value, str) else float(value)
+        except (SyntaxError, TypeError, ValueError):
+            exprs[key] = 0.0
+    names = set()
+    for e in exprs.values():
+        if isinstance(e, CompiledExpr):
+            names |= e.variables
+    columns = columns_from_rows(rows, sorted(names))
+    n = len(rows)
+    return {
+        key: e.evaluate(columns, n) if isinstance(e, CompiledExpr) else np.full(n, e, dtype=np.float64)
+        for key, e in exprs.items()
+    }
+
+
+def apply_text_layout(
+    template_id: str,
+    schema: Dict[str, Any],
+    params: Dict[str, Any],
+    margin: float = TEXT_MARGIN,
+    box: Optional[Dict[str, float]] = None,
+) -> Tuple[Optional[dict], Dict[str, float]]:
+    """
+    Fits the text lines into the template's text_box and writes the resulting
+    text_size, line_gap, lines and offsets back into params (in place).
+    box is the text box already evaluated for params (see eval_text_boxes);
+    without it the text_box expressions are evaluated here.
+    Returns (layout, text box dims) where layout is None for templates
+    without a text_box.
+    """
+    text_box = schema.get("text_box") or {}
+    if not text_box or "text_size" not in params:
+        return None, {}
+
+    max_text_size = float(params.get("text_size", 0))
+    min_text_size = float(schema["params"].get("text_size", {}).get("min", max_text_size))
+    max_lines = int(schema.get("max_lines", 1))
+    if box is None:
+        with span("params.eval_expr"):
+            box = {
+                "box_w": eval_expr(text_box.get("box_w", 0), params),
+                "box_h": eval_expr(text_box.get("box_h", 0), params),
+                "offset_x": eval_expr(text_box.get("offset_x", 0), params),
+                "offset_y": eval_expr(text_box.get("offset_y", 0), params),
+            }
+
+    params["offset_x"] = box["offset_x"]
+    params["offset_y"] = box["offset_y"]
+
+    if template_id == "nameplate":
+        # The nameplate scales each line itself in OpenSCAD; hand it the
+        # measured advance widths instead of its length-based guess.
+        for key in ("line1", "line2", "line3"):
+            if key in params:
+                params[f"{key}_units"] = round(units(str(params.get(key, ""))), 4)
+        layout = {
+            "lines": [params.get("line1", ""), params.get("line2", ""), params.get("line3", "")],
+            "text_size": params.get("text_size"),
+            "offsets_y": [],
+            "warning": "",
+            "truncated": False,
+        }
+        return layout, box
+
+    raw_lines = []
+    for key in ("line1", "line2", "line3"):
+        if key in params:
+            raw_lines.append(str(params.get(key, "")))
+    if not raw_lines and "text" in params:
+        raw_lines = [str(params.get("text", ""))]
+
+    line_gap = float(params.get("line_gap", 0))
+    layout = layout_text(
+        raw_lines,
+        max_lines=max_lines,
+        box_w_mm=box["box_w"],
+        box_h_mm=box["box_h"],
+        max_text_size=max_text_size,
+        min_text_size=min_text_size,
+        margin=margin,
+        line_gap_mm=line_gap,
+    )
+
+    params["text_size"] = layout["text_size"]
+    if "line_gap" in params and "line_gap_mm" in layout:
+        params["line_gap"] = layout["line_gap_mm"]
+
+    lines = layout["lines"] + ["", "", ""]
+    for i, key in enumerate(("line1", "line2", "line3")):
+        if key in params:
+            params[key] = lines[i]
+            # measured widths for the template's own fit check (see fit_scale)
+            params[f"{key}_units"] = round(units(lines[i]), 4)
+    params["text_fit_w"] = round(box["box_w"] * margin, 4)
+    return layout, box
+
+
+def _snap_pos(kind: str, box_w: float, box_h: float, margin: float) -> Tuple[float, float]:
+    if kind == "center":
+        return 0.0, 0.0
+    if kind == "left":
+        return -box_w / 2 + margin, 0.0
+    if kind == "right":
+        return box_w / 2 - margin, 0.0
+    if kind == "above_text":
+        return 0.0, box_h / 2 - margin
+    if kind == "below_text":
+        return 0.0, -box_h / 2 + margin
+    if kind == "top_left":
+        return -box_w / 2 + margin, box_h / 2 - margin
+    if kind == "top_right":
+        return box_w / 2 - margin, box_h / 2 - margin
+    if kind == "bottom_left":
+        return -box_w / 2 + margin, -box_h / 2 + margin
+    if kind == "bottom_right":
+        return box_w / 2 - margin, -box_h / 2 + margin
+    return 0.0, 0.0
+
+
+def apply_emblem_snap(params: Dict[str, Any]) -> None:
+    emblem_snap = params.get("emblem_snap") if isinstance(params.get("emblem_snap"), str) else None
+    if not emblem_snap or emblem_snap == "custom":
+        return
+    box_w = float(params.get("text_box_w", 0.0))
+    box_h = float(params.get("text_box_h", 0.0))
+    box_off_x = float(params.get("text_box_offset_x", 0.0))
+    box_off_y = float(params.get("text_box_offset_y", 0.0))
+    margin = min(box_w, box_h) * 0.1 if min(box_w, box_h) > 0 else 0.0
+
+    snap_x, snap_y = _snap_pos(emblem_snap, box_w, box_h, margin)
+    autocenter = int(params.get("emblem_autocenter", 1)) == 1
+    if emblem_snap == "center" and autocenter:
+        snap_x, snap_y = 0.0, 0.0
+    params["emblem_x"] = snap_x + box_off_x
+    params["emblem_y"] = snap_y + box_off_y
+
+
+def draft_params(params: Dict[str, Any], draft: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Render params for a low-poly draft: params plus DRAFT_DEFINES and the
+    template's "draft" overrides (e.g. {"circle_fn": 32}).
+    """
+    out = dict(params)
+    out.update(DRAFT_DEFINES)
+    out.update(draft or {})
+    return out
+
+
+def prepare_params(template_id: str, schema: Dict[str, Any], params: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[dict]]:
+    """
+    Full param pipeline used before a render: schema coercion, text layout
+    and emblem snapping. Returns (render params, layout).
+    """
+    params = sanitize_params(schema, params)
+    layout, _ = apply_text_layout(template_id, schema, params)
+    apply_emblem_snap(params)
+    return params, layout
+
+
+def prepare_params_many(
+    template_id: str, schema: Dict[str, Any], rows: List[Dict[str, Any]]
+) -> List[Tuple[Dict[str, Any], Optional[dict]]]:
+    """
+    prepare_params for many rows of one template, with the text boxes of
+    all rows computed in one vectorized pass (see eval_text_boxes).
+    """
+    sanitized = [sanitize_params(schema, row) for row in rows]
+    boxes = None
+    if schema.get("text_box") and sanitized:
+        with span("params.eval_text_boxes"):
+            boxes = eval_text_boxes(schema, sanitized)
+    out = []
+    for i, params in enumerate(sanitized):
+        box = {key: float(values[i]) for key, values in boxes.items()} if boxes is not None else None
+        layout, _ = apply_text_layout(template_id, schema, params, box=box)
+        apply_emblem_snap(params)
+        out.append((params, layout))
+    return out
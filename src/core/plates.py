@@ -0,0 +1,384 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.catalog import load_template
+from src.core.jobindex import job_stl
+from src.core.stl_io import read_stl, read_triangles, write_binary_stl
+
+OUT_DIR = Path(__file__).resolve().parents[2] / "out"
+PLATES_DIR = Path(__file__).resolve().parents[2] / "plates"
+DEFAULT_BED_MM = (220.0, 220.0)
+DEFAULT_SPACING_MM = 5.0
+DEFAULT_MARGIN_MM = 5.0
+EPS = 1e-6
+HEX_ROW = math.sqrt(3.0) / 2
+
+
+def _read_json(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _footprint_kind(template_id: Optional[str]) -> str:
+    if not template_id:
+        return "rect"
+    try:
+        schema, _ = load_template(template_id)
+    except (OSError, ValueError, KeyError):
+        return "rect"
+    return (schema.get("plate") or {}).get("footprint", "rect")
+
+
+def make_part(stl_path: Path, report: Dict[str, Any], template_id: Optional[str] = None,
+              job: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Packing record for one STL, from the bounds in its report.json (read
+    from the mesh only when the report predates them).
+    """
+    stl_path = Path(stl_path)
+    if "bounds_min" in report and "bounds_max" in report:
+        lo, hi = np.asarray(report["bounds_min"], dtype=float), np.asarray(report["bounds_max"], dtype=float)
+    else:
+        tris = read_triangles(stl_path).reshape(-1, 3)
+        lo, hi = tris.min(axis=0).astype(float), tris.max(axis=0).astype(float)
+    size = hi - lo
+    return {
+        "job": job or stl_path.parent.name,
+        "stl_path": str(stl_path),
+        "kind": _footprint_kind(template_id),
+        "w": float(size[0]),
+        "h": float(size[1]),
+        "lo": lo.tolist(),
+        "hi": hi.tolist(),
+    }
+
+
+def _job_dirs(path: Path) -> Iterable[Path]:
+    path = Path(path)
+    if (path / "report.json").exists():
+        yield path
+        return
+    for entry in sorted(path.iterdir()):
+        if entry.is_dir() and not entry.name.startswith(".") and (entry / "report.json").exists():
+            yield entry
+
+
+def load_parts(paths: Iterable[Path], results: Optional[Path] = None, copies: int = 1,
+               include_failed: bool = False) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Parts to pack from job dirs (or dirs of job dirs, such as out/) and/or
+    a batch results JSONL, each repeated copies times. Jobs whose report is
+    not ok are skipped unless include_failed. Returns (parts, skipped).
+    """
+    found: List[Tuple[Path, Dict[str, Any], Optional[str], str]] = []
+    skipped: List[str] = []
+    for path in paths:
+        for job_dir in _job_dirs(path):
+            stl = job_stl(job_dir)
+            if stl is None:
+                skipped.append(f"{job_dir.name}: no STL")
+                continue
+            if stl.stem.endswith("_draft"):
+                skipped.append(f"{job_dir.name}: only a draft render so far")
+                continue
+            template_id = _read_json(job_dir / "spec.json").get("template_id")
+            found.append((stl, _read_json(job_dir / "report.json"), template_id, job_dir.name))
+    if results is not None:
+        with Path(results).open(encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                row = json.loads(line)
+                if not row.get("stl_path"):
+                    skipped.append(f"{row.get('job_name')}: {row.get('error', 'no STL')}")
+                    continue
+                found.append((Path(row["stl_path"]), row.get("report") or {}, row.get("template_id"),
+                              row.get("job_name") or Path(row["stl_path"]).parent.name))
+
+    parts = []
+    for stl, report, template_id, job in found:
+        if not include_failed and not report.get("ok"):
+            skipped.append(f"{job}: validation failed")
+            continue
+        if not stl.exists():
+            skipped.append(f"{job}: {stl.name} is missing")
+            continue
+        part = make_part(stl, report, template_id, job)
+        parts.extend(dict(part) for _ in range(max(1, int(copies))))
+    return parts, skipped
+
+
+class Skyline:
+    """
+    Bottom-left skyline packer for axis-aligned rectangles in a width x
+    height area: the free space is kept as the upper envelope of what has
+    been placed, as (x, y, width) segments, starting flat at floor.
+    """
+
+    def __init__(self, width: float, height: float, floor: float = 0.0):
+        self.width = float(width)
+        self.height = float(height)
+        self.segments: List[List[float]] = [[0.0, float(floor), float(width)]]
+
+    def _fit(self, i: int, w: float, h: float) -> Optional[float]:
+        x = self.segments[i][0]
+        if x + w > self.width + EPS:
+            return None
+        y, remaining, j = 0.0, w, i
+        while remaining > EPS:
+            if j >= len(self.segments):
+                return None
+            y = max(y, self.segments[j][1])
+            remaining -= self.segments[j][2]
+            j += 1
+        return y if y + h <= self.height + EPS else None
+
+    def find(self, w: float, h: float) -> Optional[Tuple[float, float, int]]:
+        """
+        (top, x, segment index) of the lowest, then leftmost, position for a
+        w x h rectangle, or None when it does not fit.
+        """
+        best = None
+        for i in range(len(self.segments)):
+            y = self._fit(i, w, h)
+            if y is not None and (best is None or (y + h, self.segments[i][0]) < best[:2]):
+                best = (y + h, self.segments[i][0], i)
+        return best
+
+    def place(self, i: int, w: float, h: float) -> Tuple[float, float]:
+        """
+        Places a w x h rectangle at segment i (as found by find()) and
+        returns its lower-left corner.
+        """
+        x = self.segments[i][0]
+        y = self._fit(i, w, h)
+        self.segments.insert(i, [x, y + h, w])
+        end = x + w
+        j = i + 1
+        while j < len(self.segments) and self.segments[j][0] < end - EPS:
+            sx, sy, sw = self.segments[j]
+            if sx + sw <= end + EPS:
+                del self.segments[j]
+                continue
+            self.segments[j] = [end, sy, sx + sw - end]
+            break
+        merged = [self.segments[0]]
+        for seg in self.segments[1:]:
+            if abs(seg[1] - merged[-1][1]) < EPS:
+                merged[-1][2] += seg[2]
+            else:
+                merged.append(seg)
+        self.segments = merged
+        return x, y
+
+
+def circle_band(d: float, count: int, width: float, height: float, floor: float,
+                stagger: bool = True) -> Tuple[List[Tuple[float, float]], float]:
+    """
+    Centers for up to count circles of diameter d filling rows from floor
+    up, and the top of the rows used: a hexagonal lattice (every other row
+    shifted by d/2 and nested into the one below), or with stagger=False a
+    square grid, which holds more when the shifted rows lose a column.
+    """
+    per_row = (int((width + EPS) // d), int((width - d / 2 + EPS) // d) if stagger else int((width + EPS) // d))
+    pitch = d * HEX_ROW if stagger else d
+    centers: List[Tuple[float, float]] = []
+    top = floor
+    row = 0
+    while len(centers) < count and per_row[0] > 0:
+        cy = floor + d / 2 + row * pitch
+        if cy + d / 2 > height + EPS:
+            break
+        x0 = d if stagger and row % 2 else d / 2
+        for k in range(min(per_row[row % 2], count - len(centers))):
+            centers.append((x0 + k * d, cy))
+        top = cy + d / 2
+        row += 1
+    return centers, top
+
+
+def pack(parts: List[Dict[str, Any]], bed: Tuple[float, float] = DEFAULT_BED_MM,
+         spacing: float = DEFAULT_SPACING_MM, margin: float = DEFAULT_MARGIN_MM,
+         rotate: bool = True) -> Tuple[List[List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    Assigns parts to as few bed-sized plates as the heuristics manage.
+    Circular footprints (templates with "plate": {"footprint": "circle"})
+    go first, in bands per diameter across the full plate width (see
+    circle_band); rectangles then fill the space above them, largest
+    first, with a bottom-left skyline on each open plate in turn (first
+    fit), turned 90 degrees when that sits lower. Every footprint keeps spacing to its
+    neighbours and margin to the bed edge.
+
+    Returns (plates, unplaced); each placement is the part plus "rotated"
+    and "translate", the offset that moves the (rotated) mesh onto the
+    plate with its base at z=0.
+    """
+    # footprints grow by spacing, and the area by spacing less twice the margin
+    width = bed[0] - 2 * margin + spacing
+    height = bed[1] - 2 * margin + spacing
+    plates: List[Dict[str, Any]] = []
+    unplaced: List[Dict[str, Any]] = []
+
+    def new_plate() -> Dict[str, Any]:
+        plates.append({"placements": [], "floor": 0.0, "skyline": None})
+        return plates[-1]
+
+    circles: Dict[float, List[Dict[str, Any]]] = {}
+    rects = []
+    for part in parts:
+        if part["kind"] == "circle":
+            circles.setdefault(round(max(part["w"], part["h"]), 3), []).append(part)
+        else:
+            rects.append(part)
+
+    for d in sorted(circles, reverse=True):
+        pending = circles[d]
+        cell = d + spacing
+        while pending:
+            plate = plates[-1] if plates else new_plate()
+            centers, top = max(
+                (circle_band(cell, len(pending), width, height, plate["floor"], stagger) for stagger in (True, False)),
+                key=lambda band: (len(band[0]), -band[1]))
+            if not centers:
+                if not plate["placements"]:
+                    unplaced.extend(pending)
+                    break
+                new_plate()
+                continue
+            for (cx, cy), part in zip(centers, pending):
+                mid = (np.asarray(part["lo"]) + np.asarray(part["hi"])) / 2
+                plate["placements"].append(dict(part, rotated=False, translate=[
+                    margin + cx - spacing / 2 - mid[0], margin + cy - spacing / 2 - mid[1], -part["lo"][2]]))
+            pending = pending[len(centers):]
+            plate["floor"] = top
+
+    rects.sort(key=lambda p: (max(p["w"], p["h"]), p["w"] * p["h"]), reverse=True)
+    for part in rects:
+        w, h = part["w"] + spacing, part["h"] + spacing
+        placed = False
+        for plate in plates + [None]:
+            if plate is None:
+                plate = new_plate()
+            if plate["skyline"] is None:
+                plate["skyline"] = Skyline(width, height, plate["floor"])
+            sky = plate["skyline"]
+            options = [(sky.find(w, h), False)]
+            if rotate and abs(w - h) > EPS:
+                options.append((sky.find(h, w), True))
+            options = [(spot, turned) for spot, turned in options if spot is not None]
+            if not options:
+                if not plate["placements"]:
+                    plates.pop()
+                    break
+                continue
+            spot, turned = min(options, key=lambda o: o[0][:2])
+            x, y = sky.place(spot[2], *((h, w) if turned else (w, h)))
+            lo, hi = part["lo"], part["hi"]
+            # a quarter turn maps (x, y) to (-y, x), so the new minimum corner is (-hi_y, lo_x)
+            min_x, min_y = (-hi[1], lo[0]) if turned else (lo[0], lo[1])
+            plate["placements"].append(dict(part, rotated=turned, translate=[
+                margin + x - min_x, margin + y - min_y, -lo[2]]))
+            placed = True
+            break
+        if not placed:
+            unplaced.append(part)
+    return [p["placements"] for p in plates if p["placements"]], unplaced
+
+
+def merge_plate(placements: List[Dict[str, Any]], out_path: Path) -> Dict[str, int]:
+    """
+    Writes every placed part into one binary STL by concatenating vertex
+    and face arrays (faces shifted by the vertices before them). Each
+    distinct STL is read once per plate, so memory stays at one plate.
+    """
+    meshes: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    vertices, faces = [], []
+    offset = 0
+    for p in placements:
+        mesh = meshes.get(p["stl_path"])
+        if mesh is None:
+            mesh = meshes[p["stl_path"]] = read_stl(Path(p["stl_path"]))
+        v, f = mesh
+        if p["rotated"]:
+            v = np.column_stack([-v[:, 1], v[:, 0], v[:, 2]])
+        vertices.append((v + np.asarray(p["translate"], dtype=np.float32)).astype(np.float32))
+        faces.append(f + offset)
+        offset += len(v)
+    v = np.concatenate(vertices) if vertices else np.zeros((0, 3), dtype=np.float32)
+    f = np.concatenate(faces) if faces else np.zeros((0, 3), dtype=np.int64)
+    write_binary_stl(out_path, v, f, header=f"PromptToSTL plate {len(placements)} parts")
+    return {"parts": len(placements), "faces": int(len(f))}
+
+
+def write_plates(plates: List[List[Dict[str, Any]]], out_dir: Path, unplaced: Optional[List[Dict[str, Any]]] = None,
+                 bed: Tuple[float, float] = DEFAULT_BED_MM) -> Path:
+    """
+    Writes plate_NNN.stl per plate and a plates.json manifest of where
+    every part went. Returns the manifest path.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {"bed_mm": list(bed), "plates": [], "unplaced": [p["stl_path"] for p in unplaced or []]}
+    for i, placements in enumerate(plates, start=1):
+        path = out_dir / f"plate_{i:03d}.stl"
+        stats = merge_plate(placements, path)
+        manifest["plates"].append(dict(stats, stl_path=str(path), placements=[
+            {"job": p["job"], "stl_path": p["stl_path"], "rotated": p["rotated"],
+             "translate": [round(float(t), 4) for t in p["translate"]]}
+            for p in placements
+        ]))
+    manifest_path = out_dir / "plates.json"
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return manifest_path
+
+
+def _bed(text: str) -> Tuple[float, float]:
+    w, _, h = text.lower().partition("x")
+    return float(w), float(h or w)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pack built parts onto bed-sized plates, one STL per plate.")
+    parser.add_argument("jobs", nargs="*", type=Path,
+                        help="Job dirs, or dirs of job dirs (default: out/ unless --results is given)")
+    parser.add_argument("--results", type=Path, default=None, help="Batch results JSONL to take parts from")
+    parser.add_argument("--bed", type=_bed, default=DEFAULT_BED_MM, help="Bed size in mm, WxH (default 220x220)")
+    parser.add_argument("--spacing", type=float, default=DEFAULT_SPACING_MM, help="Gap between parts in mm")
+    parser.add_argument("--margin", type=float, default=DEFAULT_MARGIN_MM, help="Gap to the bed edge in mm")
+    parser.add_argument("--copies", type=int, default=1, help="Copies of each part")
+    parser.add_argument("--no-rotate", action="store_true", help="Never turn parts by 90 degrees")
+    parser.add_argument("--include-failed", action="store_true", help="Also pack parts whose validation failed")
+    parser.add_argument("--out", type=Path, default=PLATES_DIR, help="Output directory for plate STLs")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    paths = args.jobs or ([] if args.results else [OUT_DIR])
+    parts, skipped = load_parts(paths, args.results, args.copies, args.include_failed)
+    for reason in skipped:
+        print(f"skipped {reason}", file=sys.stderr)
+    t1 = time.perf_counter()
+    plates, unplaced = pack(parts, args.bed, args.spacing, args.margin, rotate=not args.no_rotate)
+    t2 = time.perf_counter()
+    manifest = write_plates(plates, args.out, unplaced, args.bed)
+    t3 = time.perf_counter()
+    for part in unplaced:
+        print(f"does not fit the bed: {part['stl_path']} ({part['w']:.1f} x {part['h']:.1f} mm)", file=sys.stderr)
+    print(f"{len(parts) - len(unplaced)}/{len(parts)} parts on {len(plates)} plates -> {manifest} "
+          f"(load {t1 - t0:.2f}s, pack {t2 - t1:.2f}s, merge {t3 - t2:.2f}s)", file=sys.stderr)
+    return 1 if unplaced else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
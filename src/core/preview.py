@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+from src.core.metrics import span
+from src.core.stl_io import read_stl, stl_info, write_binary_stl
+
+DEFAULT_FACE_BUDGET = int(os.environ.get("PROMPTTOSTL_PREVIEW_FACES", "5000"))
+QUANTIZE_BITS = 16
+PREVIEW_DIR = "preview"
+MIN_CELLS = 4
+MAX_CELLS = 4096
+
+
+def quantize(vertices: np.ndarray, bits: int = QUANTIZE_BITS) -> np.ndarray:
+    """
+    Snaps vertices to a 2**bits grid over their bounding box, so repeated
+    coordinates are bit-identical and the file deflates well.
+    """
+    if len(vertices) == 0:
+        return vertices
+    lo = vertices.min(axis=0)
+    size = np.maximum(vertices.max(axis=0) - lo, 1e-12)
+    levels = float((1 << bits) - 1)
+    q = np.round((vertices - lo) / size * levels)
+    return (lo + q / levels * size).astype(np.float32)
+
+
+def _cluster(vertices: np.ndarray, faces: np.ndarray, lo: np.ndarray, cell: float) -> Tuple[np.ndarray, np.ndarray]:
+    keys = np.floor((vertices - lo) / cell).astype(np.int64)
+    dims = keys.max(axis=0) + 1
+    flat = (keys[:, 0] * dims[1] + keys[:, 1]) * dims[2] + keys[:, 2]
+    _, inverse = np.unique(flat, return_inverse=True)
+    inverse = inverse.ravel()
+    f = inverse[faces]
+    f = f[(f[:, 0] != f[:, 1]) & (f[:, 1] != f[:, 2]) & (f[:, 0] != f[:, 2])]
+    # two triangles collapsing onto the same corners are drawn once
+    s = np.sort(f, axis=1)
+    n = int(inverse.max()) + 1
+    if n ** 3 < (1 << 62):
+        _, first = np.unique((s[:, 0] * n + s[:, 1]) * n + s[:, 2], return_index=True)
+    else:
+        _, first = np.unique(s, axis=0, return_index=True)
+    f = f[np.sort(first)]
+
+    counts = np.bincount(inverse).astype(np.float64)
+    out = np.column_stack([np.bincount(inverse, weights=vertices[:, i]) / counts for i in range(3)])
+    return out, f
+
+
+def decimate(vertices: np.ndarray, faces: np.ndarray, face_budget: int = DEFAULT_FACE_BUDGET) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vertex-clustering decimation: merges all vertices inside each cell of a
+    uniform grid into their mean and drops collapsed triangles. The grid is
+    the finest (by bisection on cells per longest side) that meets
+    face_budget. Meshes already under budget are returned unchanged.
+    """
+    if len(faces) <= face_budget or len(vertices) == 0:
+        return vertices, faces
+    vertices = vertices.astype(np.float64)
+    lo = vertices.min(axis=0)
+    extent = float((vertices.max(axis=0) - lo).max()) or 1.0
+    low, high = MIN_CELLS, MAX_CELLS
+    best = _cluster(vertices, faces, lo, extent / low)
+    while high - low > 1:
+        mid = (low + high) // 2
+        trial = _cluster(vertices, faces, lo, extent / mid)
+        if len(trial[1]) <= face_budget:
+            low, best = mid, trial
+        else:
+            high = mid
+    return best
+
+
+def preview_path(stl_path: Path) -> Path:
+    stl_path = Path(stl_path)
+    return stl_path.parent / PREVIEW_DIR / stl_path.name
+
+
+def write_preview(stl_path: Path, face_budget: int = DEFAULT_FACE_BUDGET) -> Path:
+    """
+    Writes the decimated, quantized binary STL the viewer loads by default
+    to <job>/preview/<name>.stl (outside the job dir's top level, so it is
+    never mistaken for a build output) and returns its path.
+    """
+    out = preview_path(stl_path)
+    with span("preview.decimate"):
+        vertices, faces = read_stl(stl_path)
+        vertices, faces = decimate(vertices, faces, face_budget)
+        vertices = quantize(np.asarray(vertices, dtype=np.float64))
+    with span("preview.write"):
+        write_binary_stl(out, vertices, faces, header=f"PromptToSTL preview {len(faces)} faces")
+    return out
+
+
+def ensure_preview(stl_path: Path, face_budget: int = DEFAULT_FACE_BUDGET) -> Path:
+    """
+    Path the viewer should load for stl_path: an up-to-date preview, built
+    now if missing (e.g. jobs from before previews existed), or the STL
+    itself when it is already a small binary file.
+    """
+    stl_path = Path(stl_path)
+    info = stl_info(stl_path)
+    if info["format"] == "binary" and info["triangles"] <= face_budget:
+        return stl_path
+    out = preview_path(stl_path)
+    try:
+        if out.stat().st_mtime_ns >= stl_path.stat().st_mtime_ns:
+            return out
+    except FileNotFoundError:
+        pass
+    return write_preview(stl_path, face_budget)
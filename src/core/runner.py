@@ -1,15 +1,66 @@
+import asyncio
+import os
+import re
 import subprocess
+import tempfile
+import threading
+import weakref
+from functools import lru_cache
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
-def run_openscad(openscad_exe: str, scad_path: Path, out_stl: Path, params: dict) -> str:
+from src.core.metrics import record_child_rss, span
+
+MAX_CONCURRENT_RENDERS = os.cpu_count() or 1
+DEFAULT_EXPORT_FORMAT = "binstl"
+
+_RENDER_TIME_RE = re.compile(r"Total rendering time:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+_render_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+@lru_cache(maxsize=16)
+def _help_text(openscad_exe: str) -> str:
+    try:
+        p = subprocess.run([openscad_exe, "--help"], capture_output=True, text=True, timeout=30)
+    except Exception:
+        return ""
+    return (p.stdout or "") + (p.stderr or "")
+
+
+def backend_args(openscad_exe: str, backend: Optional[str]) -> List[str]:
     """
-    Runs OpenSCAD with -D defines. Returns combined stdout/stderr text.
+    CLI flags selecting the geometry backend ("cgal" or "manifold") on this
+    OpenSCAD build: --backend on current builds, --enable=manifold on the
+    snapshots that had it as an experiment, and nothing (i.e. CGAL) on
+    releases that predate Manifold.
     """
-    scad_path = scad_path.resolve()
-    out_stl = out_stl.resolve()
-    out_stl.parent.mkdir(parents=True, exist_ok=True)
+    if not backend:
+        return []
+    help_text = _help_text(openscad_exe)
+    if "--backend" in help_text:
+        return [f"--backend={backend}"]
+    if backend == "manifold" and "manifold" in help_text:
+        return ["--enable=manifold"]
+    return []
+
+
+def render_args(openscad_exe: str, render_config: Optional[dict]) -> List[str]:
+    """
+    Extra CLI args for a template's "render" block:
+    {"backend": "manifold", "args": ["--enable=fast-csg"]}.
+    """
+    render_config = render_config or {}
+    return backend_args(openscad_exe, render_config.get("backend")) + [str(a) for a in render_config.get("args", [])]
 
+
+def build_command(openscad_exe: str, scad_path: Path, out_stl: Path, params: dict,
+                  export_format: Optional[str] = DEFAULT_EXPORT_FORMAT,
+                  extra_args: Optional[Sequence[str]] = None) -> List[str]:
     cmd = [openscad_exe, "-o", str(out_stl)]
+    if export_format:
+        cmd += ["--export-format", export_format]
+    cmd += list(extra_args or [])
     for k, v in params.items():
         if isinstance(v, str):
             cmd += ["-D", f'{k}="{v}"']
@@ -18,9 +69,195 @@ def run_openscad(openscad_exe: str, scad_path: Path, out_stl: Path, params: dict
         else:
             cmd += ["-D", f"{k}={v}"]
     cmd.append(str(scad_path))
+    return cmd
+
+
+def _prepare_output(out_stl: Path) -> None:
+    # OpenSCAD truncates an existing output in place; unlinking it first
+    # leaves a build cache entry hardlinked to that file untouched.
+    out_stl.parent.mkdir(parents=True, exist_ok=True)
+    if out_stl.exists():
+        out_stl.unlink()
+
+
+def run_openscad(openscad_exe: str, scad_path: Path, out_stl: Path, params: dict, timeout: Optional[float] = None,
+                 export_format: Optional[str] = DEFAULT_EXPORT_FORMAT,
+                 extra_args: Optional[Sequence[str]] = None, env: Optional[Dict[str, str]] = None) -> str:
+    """
+    Runs OpenSCAD with -D defines. Returns combined stdout/stderr text.
+    export_format is passed as --export-format (binary STL by default; None
+    leaves OpenSCAD's ASCII default). extra_args go in front of the scad
+    path (see render_args). env replaces the child's environment.
+    """
+    scad_path = scad_path.resolve()
+    out_stl = out_stl.resolve()
+    _prepare_output(out_stl)
+
+    cmd = build_command(openscad_exe, scad_path, out_stl, params, export_format, extra_args)
+
+    try:
+        with span("openscad.subprocess"):
+            returncode, stdout, stderr = _run(cmd, timeout, env)
+    except subprocess.TimeoutExpired as e:
+        logs = _decode(e.stdout) + ("\n" + _decode(e.stderr) if e.stderr else "")
+        raise RuntimeError(f"OpenSCAD timed out after {timeout}s.\n{logs}")
+    logs = stdout + ("\n" + stderr if stderr else "")
+    if returncode != 0:
+        raise RuntimeError(f"OpenSCAD failed (code {returncode}).\n{logs}")
+    return logs
+
+
+def _run(cmd: List[str], timeout: Optional[float], env: Optional[Dict[str, str]] = None) -> Tuple[int, str, str]:
+    """
+    subprocess.run(cmd, capture_output=True, timeout=timeout), except that
+    the child is reaped with os.wait4 where available so its own peak RSS
+    can be recorded for the current build (see record_child_rss).
+    """
+    if not hasattr(os, "wait4"):
+        p = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, env=env)
+        return p.returncode, p.stdout or "", p.stderr or ""
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, stdout=out, stderr=err, env=env)
+        expired = threading.Event()
+
+        def expire() -> None:
+            expired.set()
+            proc.kill()
+
+        timer = threading.Timer(timeout, expire) if timeout else None
+        if timer is not None:
+            timer.daemon = True
+            timer.start()
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        out.seek(0)
+        err.seek(0)
+        stdout, stderr = _decode(out.read()), _decode(err.read())
+    if expired.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout, output=stdout, stderr=stderr)
+    record_child_rss(usage.ru_maxrss)
+    return proc.returncode, stdout, stderr
+
+
+def parse_render_time(logs: str) -> Optional[float]:
+    """
+    Seconds from OpenSCAD's "Total rendering time: h:mm:ss.ms" line, if any.
+    """
+    m = _RENDER_TIME_RE.search(logs or "")
+    if not m:
+        return None
+    return int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3))
+
+
+def _decode(data) -> str:
+    if data is None:
+        return ""
+    if isinstance(data, bytes):
+        return data.decode("utf-8", errors="replace")
+    return data
+
+
+def set_render_concurrency(limit: int) -> None:
+    """
+    Caps concurrent async renders. Applies to semaphores created afterwards.
+    """
+    global MAX_CONCURRENT_RENDERS
+    MAX_CONCURRENT_RENDERS = max(1, int(limit))
+    _render_semaphores.clear()
+
+
+def render_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sem = _render_semaphores.get(loop)
+    if sem is None:
+        sem = asyncio.Semaphore(MAX_CONCURRENT_RENDERS)
+        _render_semaphores[loop] = sem
+    return sem
+
+
+async def _pump(stream: asyncio.StreamReader, name: str, sink: List[str], on_line) -> None:
+    while True:
+        raw = await stream.readline()
+        if not raw:
+            return
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        sink.append(line)
+        if on_line is not None:
+            res = on_line(name, line)
+            if asyncio.iscoroutine(res):
+                await res
+
+
+async def run_openscad_async(
+    openscad_exe: str,
+    scad_path: Path,
+    out_stl: Path,
+    params: dict,
+    timeout: Optional[float] = None,
+    on_line: Optional[Callable[[str, str], object]] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    export_format: Optional[str] = DEFAULT_EXPORT_FORMAT,
+    extra_args: Optional[Sequence[str]] = None,
+) -> str:
+    """
+    Async run_openscad. Waits for a slot on the global render semaphore,
+    streams each stdout/stderr line to on_line(stream, line) as it arrives,
+    and kills OpenSCAD on timeout or cancellation. Returns the same combined
+    log text as run_openscad.
+    """
+    scad_path = Path(scad_path).resolve()
+    out_stl = Path(out_stl).resolve()
+    _prepare_output(out_stl)
+    cmd = build_command(openscad_exe, scad_path, out_stl, params, export_format, extra_args)
+
+    async with (semaphore or render_semaphore()):
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        out_lines: List[str] = []
+        err_lines: List[str] = []
+
+        async def communicate():
+            await asyncio.gather(
+                _pump(proc.stdout, "stdout", out_lines, on_line),
+                _pump(proc.stderr, "stderr", err_lines, on_line),
+            )
+            return await proc.wait()
+
+        def collected() -> str:
+            stdout = "\n".join(out_lines) + ("\n" if out_lines else "")
+            stderr = "\n".join(err_lines) + ("\n" if err_lines else "")
+            return stdout + ("\n" + stderr if stderr else "")
+
+        try:
+            returncode = await asyncio.wait_for(communicate(), timeout)
+        except asyncio.TimeoutError:
+            await _kill(proc)
+            raise RuntimeError(f"OpenSCAD timed out after {timeout}s.\n{collected()}")
+        except BaseException:
+            await _kill(proc)
+            raise
+
+    logs = collected()
+    if returncode != 0:
+        raise RuntimeError(f"OpenSCAD failed (code {returncode}).\n{logs}")
+    return logs
+
 
-    p = subprocess.run(cmd, capture_output=True, text=True)
-    logs = (p.stdout or "") + ("\n" + p.stderr if p.stderr else "")
-    if p.returncode != 0:
-        raise RuntimeError(f"OpenSCAD failed (code {p.returncode}).\n{logs}")
-    return logs
\ No newline at end of file
+async def _kill(proc: asyncio.subprocess.Process) -> None:
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+    await asyncio.shield(proc.wait())
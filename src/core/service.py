@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from src.core.batch import OUT_DIR
+from src.core.build import build_job
+from src.core.cache import geometry_key
+from src.core.catalog import list_templates, load_template
+from src.core.deps import normalize_params
+from src.core.jobindex import job_index
+from src.core.params import prepare_params
+from src.core.thumbnails import THUMB_SIZES, find_thumbnail
+
+DEFAULT_PORT = 8765
+DEFAULT_QUEUE_SIZE = 64
+JOB_PREFIX = "job_"
+
+
+class QueueFull(Exception):
+    pass
+
+
+class BuildService:
+    """
+    In-process build queue shared by HTTP clients. Job ids are derived from
+    the template and the normalized render params (plus the emblem bytes),
+    so resubmitting the same spec returns the existing job instead of
+    rendering again. Finished jobs are found on disk after a restart.
+    """
+
+    def __init__(self, openscad_exe: str = "openscad", out_dir: Path = OUT_DIR, workers: Optional[int] = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, use_cache: bool = True):
+        self.openscad_exe = openscad_exe
+        self.out_dir = Path(out_dir)
+        self.use_cache = use_cache
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=queue_size)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._specs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"build-service-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.out_dir / f"{JOB_PREFIX}{job_id}"
+
+    def _job_id(self, template_id: str, params: Dict[str, Any], emblem_svg: Optional[bytes]) -> Tuple[str, Dict[str, Any]]:
+        schema, scad_path = load_template(template_id)
+        params, _ = prepare_params(template_id, schema, params)
+        key_params = dict(params)
+        digests = {}
+        if emblem_svg is not None:
+            # build_job writes the upload into the job dir; key it by content
+            key_params["emblem_enabled"] = 1
+            key_params["emblem_path"] = "emblem.svg"
+            digests["emblem_path"] = hashlib.sha256(emblem_svg).hexdigest()
+        render_params = normalize_params(key_params, scad_path, schema.get("dependencies"))
+        h = hashlib.sha256()
+        h.update(template_id.encode("utf-8") + b"\0" + geometry_key(scad_path, render_params, digests).encode("ascii"))
+        return h.hexdigest()[:20], params
+
+    def submit(self, template_id: str, params: Dict[str, Any], emblem_svg: Optional[bytes] = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Queues a build. Returns (status, created); raises QueueFull when the
+        queue is at capacity and KeyError/ValueError for a bad template or
+        params that are not a dict.
+        """
+        if not isinstance(params, dict):
+            raise ValueError("params must be a JSON object")
+        if template_id not in list_templates():
+            raise KeyError(f"Unknown template: {template_id}")
+        job_id, prepared = self._job_id(template_id, params, emblem_svg)
+        with self._lock:
+            existing = self._status_locked(job_id)
+            if existing is not None and existing["status"] != "failed":
+                return existing, False
+            status = {"job_id": job_id, "template_id": template_id, "status": "queued",
+                      "submitted": time.time(), "started": None, "finished": None, "error": None}
+            try:
+                self._queue.put_nowait(job_id)
+            except queue.Full:
+                raise QueueFull()
+            self._jobs[job_id] = status
+            self._specs[job_id] = {"template_id": template_id, "params": prepared, "emblem_svg": emblem_svg}
+            return dict(status), True
+
+    def _status_locked(self, job_id: str) -> Optional[Dict[str, Any]]:
+        status = self._jobs.get(job_id)
+        if status is not None:
+            return dict(status)
+        report_path = self.job_dir(job_id) / "report.json"
+        if report_path.exists():
+            try:
+                template_id = json.loads((self.job_dir(job_id) / "spec.json").read_text()).get("template_id")
+                report = json.loads(report_path.read_text())
+            except (OSError, ValueError):
+                return None
+            ok = bool(report.get("ok"))
+            status = {"job_id": job_id, "template_id": template_id, "status": "done" if ok else "failed",
+                      "submitted": None, "started": None, "finished": report_path.stat().st_mtime,
+                      "error": None if ok else report.get("error", "validation failed")}
+            self._jobs[job_id] = status
+            return dict(status)
+        return None
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._status_locked(job_id)
+
+    def artifact(self, job_id: str, kind: str, size: int = 256) -> Optional[Path]:
+        """
+        Path of a finished job's "stl", "report" or "logs" file, or of its
+        size px "thumbnail" once that has been rendered.
+        """
+        job_dir = self.job_dir(job_id)
+        if kind == "report":
+            path = job_dir / "report.json"
+        elif kind == "logs":
+            path = job_dir / "logs.txt"
+        elif kind in {"stl", "thumbnail"}:
+            stls = sorted(job_dir.glob("*.stl")) if job_dir.exists() else []
+            path = stls[-1] if stls else None
+            if kind == "thumbnail" and path is not None:
+                path = find_thumbnail(path, size)
+        else:
+            return None
+        return path if path is not None and path.exists() else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for s in self._jobs.values():
+                counts[s["status"]] = counts.get(s["status"], 0) + 1
+        return {"workers": self.workers, "queued": self._queue.qsize(), "capacity": self._queue.maxsize, "jobs": counts}
+
+    def _loop(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            with self._lock:
+                spec = self._specs.pop(job_id, None)
+                self._jobs[job_id].update(status="running", started=time.time())
+            try:
+                schema, scad_path = load_template(spec["template_id"])
+                built = build_job(self.openscad_exe, spec["template_id"], scad_path, spec["params"],
+                                  self.job_dir(job_id), emblem_svg=spec["emblem_svg"], use_cache=self.use_cache,
+                                  validation=schema.get("validation"), dependencies=schema.get("dependencies"),
+                                  render_config=schema.get("render"), native=schema.get("native"))
+                ok = bool(built["report"].get("ok"))
+                update = {"status": "done" if ok else "failed",
+                          "error": None if ok else built["report"].get("error", "validation failed"),
+                          "cache_hit": built["cache_hit"]}
+            except Exception as e:
+                update = {"status": "failed", "error": str(e)}
+            with self._lock:
+                self._jobs[job_id].update(update, finished=time.time())
+
+    def shutdown(self) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+
+
+def _query_int(query: Dict[str, list], name: str, default: int) -> int:
+    """
+    Non-negative integer query param; raises ValueError with a message for
+    the client otherwise.
+    """
+    raw = (query.get(name) or [str(default)])[0]
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {raw!r}")
+    if value < 0:
+        raise ValueError(f"{name} must not be negative")
+    return value
+
+
+def _job_request(body: Any) -> Tuple[str, Dict[str, Any], Optional[bytes]]:
+    """
+    (template_id, params, emblem_svg) from a POST /jobs body; raises
+    ValueError with a message for the client when it is not shaped like
+    {"template_id": ..., "params": {...}, "emblem_svg": "<svg>"}.
+    """
+    if not isinstance(body, dict):
+        raise ValueError("request body must be a JSON object")
+    params = body.get("params", {})
+    if params is None:
+        params = {}
+    if not isinstance(params, dict):
+        raise ValueError(f"params must be a JSON object, got {type(params).__name__}")
+    emblem = body.get("emblem_svg")
+    if emblem is not None and not isinstance(emblem, str):
+        raise ValueError("emblem_svg must be a string")
+    return str(body.get("template_id", "")), params, emblem.encode("utf-8") if emblem else None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "PromptToSTL"
+
+    @property
+    def service(self) -> BuildService:
+        return self.server.service
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def _send_json(self, code: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_file(self, path: Path, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(path.stat().st_size))
+        self.send_header("Content-Disposition", f'attachment; filename="{path.name}"')
+        self.end_headers()
+        with path.open("rb") as f:
+            while True:
+                chunk = f.read(1 << 16)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        if parts == ["health"]:
+            return self._send_json(200, dict(self.service.stats(), ok=True))
+        if parts == ["templates"]:
+            return self._send_json(200, {"templates": list_templates()})
+        if parts == ["jobs"]:
+            return self._list_jobs(parse_qs(url.query))
+        if len(parts) == 2 and parts[0] == "jobs":
+            status = self.service.status(parts[1])
+            if status is None:
+                return self._send_json(404, {"error": "unknown job"})
+            return self._send_json(200, status)
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] in {"stl", "report", "logs", "thumbnail"}:
+            size = 256
+            if parts[2] == "thumbnail":
+                try:
+                    size = _query_int(parse_qs(url.query), "size", size)
+                except ValueError as e:
+                    return self._send_json(400, {"error": str(e)})
+                if size not in THUMB_SIZES:
+                    return self._send_json(400, {"error": f"size must be one of {list(THUMB_SIZES)}"})
+            path = self.service.artifact(parts[1], parts[2], size)
+            if path is None:
+                status = self.service.status(parts[1])
+                code = 404 if status is None else 409
+                return self._send_json(code, {"error": "not available", "status": (status or {}).get("status")})
+            content_type = {"stl": "model/stl", "report": "application/json", "logs": "text/plain",
+                            "thumbnail": "image/png"}[parts[2]]
+            return self._send_file(path, content_type)
+        return self._send_json(404, {"error": "not found"})
+
+    def _list_jobs(self, query: Dict[str, list]) -> None:
+        try:
+            limit = min(500, _query_int(query, "limit", 50))
+            offset = _query_int(query, "offset", 0)
+        except ValueError as e:
+            return self._send_json(400, {"error": str(e)})
+        index = job_index(self.service.out_dir)
+        index.sync()
+        template_id = (query.get("template_id") or [None])[0]
+        rows = index.query(template_id=template_id, limit=limit, offset=offset)
+        for row in rows:
+            if row["job"].startswith(JOB_PREFIX):
+                row["job_id"] = row["job"][len(JOB_PREFIX):]
+        self._send_json(200, {"total": index.count(template_id=template_id), "jobs": rows})
+
+    def do_POST(self):
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        if parts != ["jobs"]:
+            return self._send_json(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            template_id, params, emblem_svg = _job_request(json.loads(self.rfile.read(length) or b"{}"))
+        except ValueError as e:
+            return self._send_json(400, {"error": f"bad request: {e}"})
+        try:
+            status, created = self.service.submit(template_id, params, emblem_svg)
+        except QueueFull:
+            return self._send_json(429, {"error": "queue full"}, {"Retry-After": "5"})
+        except (KeyError, ValueError, FileNotFoundError) as e:
+            return self._send_json(400, {"error": str(e.args[0]) if e.args else str(e)})
+        self._send_json(202 if created else 200, status, {"Location": f"/jobs/{status['job_id']}"})
+
+
+def make_server(service: BuildService, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                verbose: bool = False) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Local HTTP build service (submit, poll, fetch, list jobs).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--openscad", default="openscad", help="OpenSCAD executable")
+    parser.add_argument("--out", type=Path, default=OUT_DIR, help="Output directory for job dirs")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent renders (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="Queued jobs before 429")
+    parser.add_argument("--no-cache", action="store_true", help="Always render, bypassing the build cache")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+
+    service = BuildService(args.openscad, args.out, args.workers, args.queue_size, not args.no_cache)
+    server = make_server(service, args.host, args.port, args.verbose)
+    print(f"Serving on http://{args.host}:{args.port} ({service.workers} workers)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+
+BINARY_HEADER_BYTES = 80
+BINARY_FACET_DTYPE = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attr", "<u2"),
+])
+ASCII_CHUNK_BYTES = 4 * 1024 * 1024
+
+_VERTEX_RE = re.compile(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)")
+
+
+def _binary_facet_count(path: Path) -> int:
+    """
+    Facet count if the file is a well-formed binary STL, else -1. Some binary
+    exporters start the header with "solid", so the size check decides.
+    """
+    size = path.stat().st_size
+    if size < BINARY_HEADER_BYTES + 4:
+        return -1
+    with path.open("rb") as f:
+        f.seek(BINARY_HEADER_BYTES)
+        count = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+    if size == BINARY_HEADER_BYTES + 4 + count * BINARY_FACET_DTYPE.itemsize:
+        return count
+    return -1
+
+
+def is_binary_stl(path: Path) -> bool:
+    return _binary_facet_count(Path(path)) >= 0
+
+
+def stl_info(path: Path) -> Dict[str, object]:
+    """
+    Cheap header-only summary: format, triangle count (binary only) and name.
+    """
+    path = Path(path)
+    count = _binary_facet_count(path)
+    if count >= 0:
+        with path.open("rb") as f:
+            header = f.read(BINARY_HEADER_BYTES).split(b"\0", 1)[0]
+        return {"format": "binary", "triangles": count, "header": header.decode("ascii", errors="replace").strip()}
+    with path.open("rb") as f:
+        first = f.readline(256)
+    return {"format": "ascii", "triangles": None, "header": first.decode("utf-8", errors="replace").strip()}
+
+
+def _iter_ascii_vertices(path: Path, chunk_bytes: int = ASCII_CHUNK_BYTES) -> Iterator[np.ndarray]:
+    remainder = b""
+    with path.open("rb") as f:
+        while True:
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                break
+            data = remainder + chunk
+            cut = data.rfind(b"\n")
+            if cut < 0:
+                remainder = data
+                continue
+            remainder = data[cut + 1:]
+            found = _VERTEX_RE.findall(data[:cut + 1])
+            if found:
+                yield np.array(found, dtype=np.float64).astype(np.float32)
+    found = _VERTEX_RE.findall(remainder)
+    if found:
+        yield np.array(found, dtype=np.float64).astype(np.float32)
+
+
+def read_triangles(path: Path) -> np.ndarray:
+    """
+    Triangle soup as an (F, 3, 3) float32 array. Binary files are
+    memory-mapped; ASCII files are parsed in fixed-size chunks.
+    """
+    path = Path(path)
+    count = _binary_facet_count(path)
+    if count >= 0:
+        if count == 0:
+            return np.zeros((0, 3, 3), dtype=np.float32)
+        facets = np.memmap(path, dtype=BINARY_FACET_DTYPE, mode="r",
+                           offset=BINARY_HEADER_BYTES + 4, shape=(count,))
+        return np.asarray(facets["vertices"], dtype=np.float32)
+
+    parts = list(_iter_ascii_vertices(path))
+    if not parts:
+        return np.zeros((0, 3, 3), dtype=np.float32)
+    verts = np.concatenate(parts)
+    usable = (len(verts) // 3) * 3
+    return verts[:usable].reshape(-1, 3, 3)
+
+
+def index_triangles(triangles: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merges identical corner positions into a shared vertex array.
+    Returns (vertices (V, 3) float32, faces (F, 3) int64).
+    """
+    # + 0.0 folds -0.0 into 0.0 so both hash to the same vertex
+    corners = np.ascontiguousarray(triangles.reshape(-1, 3), dtype=np.float32) + np.float32(0.0)
+    if len(corners) == 0:
+        return np.zeros((0, 3), dtype=np.float32), np.zeros((0, 3), dtype=np.int64)
+    keys = corners.view(np.dtype((np.void, corners.dtype.itemsize * 3))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    vertices = corners[first]
+    faces = inverse.reshape(-1, 3).astype(np.int64)
+    return vertices, faces
+
+
+def read_stl(path: Path) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Loads an STL (binary or ASCII) into (vertices, faces) arrays without
+    building a trimesh object.
+    """
+    return index_triangles(read_triangles(path))
+
+
+def write_binary_stl(path: Path, vertices: np.ndarray, faces: np.ndarray, header: str = "PromptToSTL") -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tris = np.asarray(vertices, dtype=np.float32)[np.asarray(faces, dtype=np.int64)]
+    normals = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+    facets = np.zeros(len(tris), dtype=BINARY_FACET_DTYPE)
+    facets["normal"] = normals
+    facets["vertices"] = tris
+    # written beside path and swapped in, so a hardlinked cache entry at path keeps its content
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+    try:
+        with tmp.open("wb") as f:
+            f.write(header.encode("ascii", errors="replace")[:BINARY_HEADER_BYTES].ljust(BINARY_HEADER_BYTES, b"\0"))
+            f.write(np.uint32(len(facets)).tobytes())
+            f.write(facets.tobytes())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
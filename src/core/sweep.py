@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.core.batch import OUT_DIR, run_batch
+from src.core.cache import geometry_key
+from src.core.catalog import load_template
+from src.core.deps import normalize_params
+from src.core.params import coerce_value, prepare_params_many
+
+RESULT_COLUMNS = [
+    "point", "job_name", "duplicate_of", "ok", "size_x_mm", "size_y_mm", "size_z_mm",
+    "faces", "watertight", "volume_mm3", "build_s", "cache_hit", "text_size", "warning", "error",
+]
+
+
+def _frange(start: float, stop: float, step: float) -> List[float]:
+    if step <= 0:
+        raise ValueError("step must be positive")
+    count = int(np.floor((stop - start) / step + 1e-9)) + 1
+    return [round(start + i * step, 10) for i in range(max(0, count))]
+
+
+def parse_axis(text: str) -> Tuple[str, List[Any]]:
+    """
+    "w=80:220:10" (inclusive range) or "line1=ACME,EDGE" (explicit values).
+    """
+    name, _, values = text.partition("=")
+    if not name or not values:
+        raise ValueError(f"Bad axis '{text}', expected name=start:stop:step or name=a,b,c")
+    if ":" in values:
+        parts = [float(v) for v in values.split(":")]
+        if len(parts) != 3:
+            raise ValueError(f"Bad range '{values}', expected start:stop:step")
+        return name.strip(), _frange(*parts)
+    return name.strip(), [v.strip() for v in values.split(",")]
+
+
+def parse_range(text: str, schema: Dict[str, Any]) -> Tuple[str, Tuple[float, float]]:
+    """
+    "w=80:220" or just "w" to use the schema's min/max.
+    """
+    name, _, bounds = text.partition("=")
+    name = name.strip()
+    if bounds:
+        lo, hi = (float(v) for v in bounds.split(":"))
+        return name, (lo, hi)
+    spec = schema.get("params", {}).get(name)
+    if not spec or spec.get("min") is None or spec.get("max") is None:
+        raise ValueError(f"Param '{name}' has no schema min/max; give name=lo:hi")
+    return name, (float(spec["min"]), float(spec["max"]))
+
+
+def grid_points(axes: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    names = list(axes)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(axes[n] for n in names))]
+
+
+def random_points(ranges: Dict[str, Tuple[float, float]], n: int, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    names = list(ranges)
+    u = rng.random((n, len(names)))
+    return _scale(u, names, ranges)
+
+
+def latin_hypercube_points(ranges: Dict[str, Tuple[float, float]], n: int, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    n points where each param's range is cut into n equal strata and every
+    stratum is used exactly once.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(ranges)
+    u = np.empty((n, len(names)))
+    for j in range(len(names)):
+        u[:, j] = (rng.permutation(n) + rng.random(n)) / n
+    return _scale(u, names, ranges)
+
+
+def _scale(u: np.ndarray, names: List[str], ranges: Dict[str, Tuple[float, float]]) -> List[Dict[str, Any]]:
+    lo = np.array([ranges[n][0] for n in names])
+    hi = np.array([ranges[n][1] for n in names])
+    values = lo + u * (hi - lo)
+    return [{n: float(round(v, 4)) for n, v in zip(names, row)} for row in values]
+
+
+def plan_sweep(
+    template_id: str,
+    points: Iterable[Dict[str, Any]],
+    base: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Runs every point through the normal param pipeline (coercion, layout,
+    emblem snap, dead-param normalization), with all text boxes evaluated
+    in one vectorized pass, and marks points whose render params match an
+    earlier point. Returns one plan entry per point; "prepared" holds the
+    (params, layout) run_sweep hands to the batch builder.
+    """
+    schema, scad_path = load_template(template_id)
+    specs = schema.get("params", {})
+    points = list(points)
+    raws = [dict(base or {}, **point) for point in points]
+    prepared = prepare_params_many(template_id, schema, raws)
+    seen: Dict[str, int] = {}
+    plan = []
+    for i, (point, raw, (params, layout)) in enumerate(zip(points, raws, prepared)):
+        render_params = normalize_params(params, scad_path, schema.get("dependencies"))
+        key = geometry_key(scad_path, render_params)
+        plan.append({
+            "point": i,
+            "values": {k: coerce_value(v, specs[k]) if k in specs else v for k, v in point.items()},
+            "raw": raw,
+            "prepared": (params, layout),
+            "key": key,
+            "duplicate_of": seen.get(key),
+            "text_size": params.get("text_size"),
+            "warning": (layout or {}).get("warning", ""),
+        })
+        seen.setdefault(key, i)
+    return plan
+
+
+def run_sweep(
+    template_id: str,
+    points: Iterable[Dict[str, Any]],
+    base: Optional[Dict[str, Any]] = None,
+    openscad_exe: str = "openscad",
+    out_dir: Path = OUT_DIR,
+    workers: Optional[int] = None,
+    use_cache: bool = True,
+    name: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Builds each distinct geometry once on the batch process pool and returns
+    one result row per point, in point order.
+    """
+    name = name or f"sweep_{template_id}_{uuid.uuid4().hex[:8]}"
+    plan = plan_sweep(template_id, points, base)
+    rows = [
+        {"template_id": template_id, "params": entry["raw"], "prepared": entry["prepared"],
+         "job_name": f"{name}_{entry['point']:05d}"}
+        for entry in plan if entry["duplicate_of"] is None
+    ]
+    built = {}
+    for result in run_batch(rows, openscad_exe, out_dir, workers, use_cache):
+        built[result["job_name"]] = result
+
+    table = []
+    for entry in plan:
+        owner = entry["point"] if entry["duplicate_of"] is None else entry["duplicate_of"]
+        result = built.get(f"{name}_{owner:05d}", {})
+        report = result.get("report") or {}
+        size = report.get("size_xyz_mm") or [None, None, None]
+        row = dict(entry["values"])
+        row.update({
+            "point": entry["point"],
+            "job_name": result.get("job_name"),
+            "duplicate_of": entry["duplicate_of"],
+            "ok": bool(result.get("ok")),
+            "size_x_mm": size[0],
+            "size_y_mm": size[1],
+            "size_z_mm": size[2],
+            "faces": report.get("faces"),
+            "watertight": report.get("watertight"),
+            "volume_mm3": report.get("volume_mm3"),
+            "build_s": (result.get("timings") or {}).get("build_s"),
+            "cache_hit": result.get("cache_hit"),
+            "text_size": entry["text_size"],
+            "warning": entry["warning"],
+            "error": result.get("error", ""),
+        })
+        table.append(row)
+    return table
+
+
+def write_results(table: List[Dict[str, Any]], path: Path) -> None:
+    """
+    Writes the results table as CSV, or as Parquet for a .parquet path
+    (needs pandas with pyarrow or fastparquet).
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    axis_cols = [k for k in (table[0] if table else {}) if k not in RESULT_COLUMNS]
+    columns = axis_cols + RESULT_COLUMNS
+    if path.suffix.lower() == ".parquet":
+        try:
+            import pandas as pd
+        except ImportError:
+            raise RuntimeError("Parquet output needs pandas (and pyarrow); write .csv instead.")
+        pd.DataFrame(table, columns=columns).to_parquet(path, index=False)
+        return
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for row in table:
+            writer.writerow(row)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build a template over a grid or sample of param values.")
+    parser.add_argument("template_id")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=SPEC",
+                        help="Grid axis: name=start:stop:step or name=a,b,c (repeatable)")
+    parser.add_argument("--range", action="append", default=[], metavar="NAME[=LO:HI]",
+                        help="Sampled param range; defaults to the schema min/max (repeatable)")
+    parser.add_argument("--random", type=int, default=0, metavar="N", help="N uniform random points over --range")
+    parser.add_argument("--lhs", type=int, default=0, metavar="N", help="N Latin-hypercube points over --range")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE", help="Fixed param (repeatable)")
+    parser.add_argument("--openscad", default="openscad", help="OpenSCAD executable")
+    parser.add_argument("--out", type=Path, default=OUT_DIR, help="Output directory for job dirs")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--results", type=Path, default=None, help="Results table (.csv or .parquet)")
+    parser.add_argument("--no-cache", action="store_true", help="Always render, bypassing the build cache")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the plan (points and duplicates)")
+    args = parser.parse_args(argv)
+
+    schema, _ = load_template(args.template_id)
+    base = dict(item.split("=", 1) for item in args.set)
+    if args.random or args.lhs:
+        ranges = dict(parse_range(r, schema) for r in args.range)
+        if not ranges:
+            parser.error("--random/--lhs need at least one --range")
+        sampler = latin_hypercube_points if args.lhs else random_points
+        sampled = sampler(ranges, args.lhs or args.random, args.seed)
+    else:
+        sampled = [{}]
+    grid = grid_points(dict(parse_axis(a) for a in args.grid)) if args.grid else [{}]
+    points = [dict(g, **s) for g in grid for s in sampled]
+
+    if args.dry_run:
+        plan = plan_sweep(args.template_id, points, base)
+        for entry in plan:
+            print(json.dumps({k: entry[k] for k in ("point", "values", "duplicate_of", "text_size", "warning")}))
+        unique = sum(1 for e in plan if e["duplicate_of"] is None)
+        print(f"{len(plan)} points, {unique} distinct geometries", file=sys.stderr)
+        return 0
+
+    name = f"sweep_{args.template_id}_{uuid.uuid4().hex[:8]}"
+    t0 = time.perf_counter()
+    table = run_sweep(args.template_id, points, base, args.openscad, args.out, args.workers,
+                      not args.no_cache, name=name)
+    results = args.results or (Path(args.out) / f"{name}.csv")
+    write_results(table, results)
+    failed = sum(1 for row in table if not row["ok"])
+    unique = sum(1 for row in table if row["duplicate_of"] is None)
+    print(f"{len(table) - failed}/{len(table)} points ok ({unique} rendered) in "
+          f"{time.perf_counter() - t0:.1f}s -> {results}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.core.metrics import span
+from src.core.preview import ensure_preview
+from src.core.stl_io import read_stl
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+THUMB_DIR = "thumbs"
+THUMB_SIZES = (128, 256, 512)
+SUPERSAMPLE = 2
+MARGIN = 0.06
+BASE_COLOR = (208, 208, 208)
+AMBIENT = 0.35
+# front-right isometric camera (text on the XY plane reads left to right),
+# lit from slightly above and left of it
+VIEW_DIR = np.array([1.0, -1.0, 1.0]) / np.sqrt(3.0)
+LIGHT_DIR = np.array([0.3, -0.6, 1.0]) / np.linalg.norm([0.3, -0.6, 1.0])
+MAX_DIGESTS = 1024
+
+_digests: Dict[Tuple[str, int, int], str] = {}
+_digests_lock = threading.Lock()
+
+
+def thumbnails_enabled() -> bool:
+    return Image is not None and os.environ.get("PROMPTTOSTL_THUMBNAILS", "1") != "0"
+
+
+def stl_digest(stl_path: Path) -> str:
+    """
+    Short sha256 of the STL's bytes, remembered per (path, mtime, size) so
+    listing a gallery page does not rehash unchanged files.
+    """
+    stl_path = Path(stl_path).resolve()
+    st = stl_path.stat()
+    key = (str(stl_path), st.st_mtime_ns, st.st_size)
+    with _digests_lock:
+        digest = _digests.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with stl_path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()[:16]
+        with _digests_lock:
+            if len(_digests) >= MAX_DIGESTS:
+                _digests.clear()
+            _digests[key] = digest
+    return digest
+
+
+def thumbnail_path(stl_path: Path, size: int = 256, digest: Optional[str] = None) -> Path:
+    stl_path = Path(stl_path)
+    return stl_path.parent / THUMB_DIR / f"{digest or stl_digest(stl_path)}_{int(size)}.png"
+
+
+def find_thumbnail(stl_path: Path, size: int = 256) -> Optional[Path]:
+    """
+    The stored thumbnail of stl_path's current contents, or None if it has
+    not been rendered (yet). Never renders.
+    """
+    try:
+        path = thumbnail_path(stl_path, size)
+    except OSError:
+        return None
+    return path if path.exists() else None
+
+
+def _rasterize(xy: np.ndarray, depth: np.ndarray, faces: np.ndarray, colors: np.ndarray, px: int) -> np.ndarray:
+    zbuf = np.full((px, px), -np.inf)
+    rgba = np.zeros((px, px, 4), dtype=np.uint8)
+    tri_xy = xy[faces]
+    tri_z = depth[faces]
+    lo = np.clip(np.floor(tri_xy.min(axis=1)).astype(np.int64), 0, px - 1)
+    hi = np.clip(np.ceil(tri_xy.max(axis=1)).astype(np.int64), 0, px - 1)
+    for i in range(len(faces)):
+        (x0, y0), (x1, y1) = lo[i], hi[i]
+        (ax, ay), (bx, by), (cx, cy) = tri_xy[i]
+        area = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+        if abs(area) < 1e-12:
+            continue
+        gx, gy = np.meshgrid(np.arange(x0, x1 + 1) + 0.5, np.arange(y0, y1 + 1) + 0.5)
+        w0 = ((bx - gx) * (cy - gy) - (by - gy) * (cx - gx)) / area
+        w1 = ((cx - gx) * (ay - gy) - (cy - gy) * (ax - gx)) / area
+        w2 = 1.0 - w0 - w1
+        inside = (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+        if not inside.any():
+            continue
+        z = w0 * tri_z[i, 0] + w1 * tri_z[i, 1] + w2 * tri_z[i, 2]
+        window = zbuf[y0:y1 + 1, x0:x1 + 1]
+        closer = inside & (z > window)
+        window[closer] = z[closer]
+        rgba[y0:y1 + 1, x0:x1 + 1][closer] = colors[i]
+    return rgba
+
+
+def render_image(vertices: np.ndarray, faces: np.ndarray, size: int):
+    """
+    Flat-shaded isometric view of a mesh as a size x size RGBA image with a
+    transparent background: a z-buffer rasterizer at SUPERSAMPLE times the
+    size, downsampled for anti-aliasing. No GL context is needed, so it runs
+    in any worker thread or process.
+    """
+    px = int(size) * SUPERSAMPLE
+    v = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    if len(faces) == 0:
+        return Image.new("RGBA", (int(size), int(size)), (0, 0, 0, 0))
+
+    right = np.cross([0.0, 0.0, 1.0], VIEW_DIR)
+    right /= np.linalg.norm(right)
+    up = np.cross(VIEW_DIR, right)
+    screen = np.column_stack([v @ right, v @ up])
+    lo = screen.min(axis=0)
+    span_xy = screen.max(axis=0) - lo
+    scale = px * (1.0 - 2 * MARGIN) / (float(span_xy.max()) or 1.0)
+    xy = (screen - lo) * scale + (px - span_xy * scale) / 2.0
+    xy[:, 1] = px - xy[:, 1]
+
+    tri = v[faces]
+    normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    normals /= np.where(lengths > 0, lengths, 1.0)[:, None]
+    shade = AMBIENT + (1.0 - AMBIENT) * np.abs(normals @ LIGHT_DIR)
+    colors = np.empty((len(faces), 4), dtype=np.uint8)
+    colors[:, :3] = np.clip(np.outer(shade, BASE_COLOR), 0, 255)
+    colors[:, 3] = 255
+
+    rgba = _rasterize(xy, v @ VIEW_DIR, faces, colors, px)
+    return Image.fromarray(rgba, "RGBA").resize((int(size), int(size)), Image.LANCZOS)
+
+
+def render_thumbnails(stl_path: Path, sizes: Sequence[int] = THUMB_SIZES) -> Dict[int, Path]:
+    """
+    Writes <job>/thumbs/<stl sha>_<size>.png for each size that is missing
+    and returns all their paths. The view is drawn once, from the decimated
+    preview mesh, at the largest size and downsampled for the rest.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required for thumbnails")
+    stl_path = Path(stl_path)
+    digest = stl_digest(stl_path)
+    paths = {int(s): thumbnail_path(stl_path, s, digest) for s in sizes}
+    missing = [s for s, p in paths.items() if not p.exists()]
+    if not missing:
+        return paths
+    with span("thumbnail.render"):
+        vertices, faces = read_stl(ensure_preview(stl_path))
+        image = render_image(vertices, faces, max(missing))
+    with span("thumbnail.write"):
+        for s in missing:
+            out = paths[s]
+            out.parent.mkdir(parents=True, exist_ok=True)
+            tmp = out.with_name(f".{out.name}.{os.getpid()}.{threading.get_ident()}")
+            (image if s == image.width else image.resize((s, s), Image.LANCZOS)).save(tmp, format="PNG", optimize=True)
+            os.replace(tmp, out)
+    return paths
+
+
+_background: Optional[ThreadPoolExecutor] = None
+_inflight: Dict[str, Future] = {}
+_background_lock = threading.Lock()
+
+
+def submit_thumbnails(stl_path: Path, sizes: Sequence[int] = THUMB_SIZES) -> Optional[Future]:
+    """
+    Queues render_thumbnails on a small background thread pool and returns
+    its future; a file already queued is not queued twice. Returns None when
+    thumbnails are disabled (no Pillow, or PROMPTTOSTL_THUMBNAILS=0).
+    """
+    global _background
+    if not thumbnails_enabled():
+        return None
+    key = str(Path(stl_path).resolve())
+    with _background_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future
+        if _background is None:
+            _background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbnail")
+        future = _background.submit(render_thumbnails, stl_path, tuple(sizes))
+        _inflight[key] = future
+
+    def _done(_f: Future) -> None:
+        with _background_lock:
+            _inflight.pop(key, None)
+
+    future.add_done_callback(_done)
+    return future
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Render the isometric PNG thumbnails of STL files.")
+    parser.add_argument("stl", nargs="+", type=Path)
+    parser.add_argument("--size", type=int, action="append",
+                        help=f"Thumbnail size in px, repeatable (default {THUMB_SIZES})")
+    args = parser.parse_args(argv)
+    for stl in args.stl:
+        for size, path in sorted(render_thumbnails(stl, args.size or THUMB_SIZES).items()):
+            print(f"{size}\t{path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,218 @@
+import time
+from functools import cached_property
 from pathlib import Path
-import trimesh
+from typing import Callable, Dict, Optional
 
+import numpy as np
 
-def validate_stl(stl_path: Path) -> dict:
+from src.core.metrics import span
+from src.core.stl_io import read_stl
+
+PLA_DENSITY_G_CM3 = 1.24
+DEFAULT_MIN_WALL_MM = 0.8
+DEGENERATE_AREA_MM2 = 1e-9
+DEFAULT_WALL_SAMPLES = 64
+RAY_EPS_MM = 1e-5
+RAY_BLOCK = 1 << 22  # ray x triangle pairs screened per step
+
+
+class MeshArrays:
+    """
+    Vertex/face arrays plus lazily computed per-face and per-edge data that
+    several checks share.
+    """
+
+    def __init__(self, vertices: np.ndarray, faces: np.ndarray):
+        self.vertices = vertices.astype(np.float64)
+        self.faces = faces
+
+    @cached_property
+    def triangles(self) -> np.ndarray:
+        return self.vertices[self.faces]
+
+    @cached_property
+    def cross(self) -> np.ndarray:
+        t = self.triangles
+        return np.cross(t[:, 1] - t[:, 0], t[:, 2] - t[:, 0])
+
+    @cached_property
+    def areas(self) -> np.ndarray:
+        return 0.5 * np.linalg.norm(self.cross, axis=1)
+
+    @cached_property
+    def signed_volume(self) -> float:
+        t = self.triangles
+        return float(np.einsum("ij,ij->", t[:, 0], np.cross(t[:, 1], t[:, 2])) / 6.0)
+
+    @cached_property
+    def edge_counts(self) -> np.ndarray:
+        return edge_face_counts(self.faces, len(self.vertices))
+
+
+def edge_face_counts(faces: np.ndarray, n_vertices: Optional[int] = None) -> np.ndarray:
+    """
+    Number of faces sharing each unique undirected edge.
+    """
+    edges = np.sort(faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    n = int(n_vertices if n_vertices is not None else faces.max() + 1)
+    keys = edges[:, 0].astype(np.int64) * n + edges[:, 1]
+    _, counts = np.unique(keys, return_counts=True)
+    return counts
+
+
+def _check_bounds(mesh: MeshArrays, config: dict) -> dict:
+    used = mesh.vertices[np.unique(mesh.faces)]
+    bounds = np.array([used.min(axis=0), used.max(axis=0)])  # [[minx,miny,minz],[maxx,maxy,maxz]]
+    bounds = np.round(bounds, 4)  # float32 STL coordinates; 0.1 um is plenty
+    return {
+        "bounds_min": bounds[0].tolist(),
+        "bounds_max": bounds[1].tolist(),
+        "size_xyz_mm": (bounds[1] - bounds[0]).tolist(),
+    }
+
+
+def _check_watertight(mesh: MeshArrays, config: dict) -> dict:
+    return {"watertight": bool(np.all(mesh.edge_counts == 2))}
+
+
+def _check_manifold(mesh: MeshArrays, config: dict) -> dict:
+    counts = mesh.edge_counts
+    return {
+        "non_manifold_edges": int(np.count_nonzero(counts > 2)),
+        "boundary_edges": int(np.count_nonzero(counts == 1)),
+    }
+
+
+def _check_volume(mesh: MeshArrays, config: dict) -> dict:
+    volume = mesh.signed_volume
+    return {
+        "volume_mm3": abs(volume),
+        "surface_area_mm2": float(mesh.areas.sum()),
+        "inverted": volume < 0,
+    }
+
+
+def _check_degenerate(mesh: MeshArrays, config: dict) -> dict:
+    f = mesh.faces
+    repeated = (f[:, 0] == f[:, 1]) | (f[:, 1] == f[:, 2]) | (f[:, 2] == f[:, 0])
+    return {"degenerate_faces": int(np.count_nonzero(repeated | (mesh.areas <= DEGENERATE_AREA_MM2)))}
+
+
+def wall_thickness_samples(mesh: MeshArrays, samples: int = DEFAULT_WALL_SAMPLES, seed: int = 0) -> np.ndarray:
+    """
+    Wall thickness at up to `samples` faces, picked by area: the distance
+    from each face's centroid along its inward normal to the nearest other
+    face. inf where the ray leaves the mesh without a hit (open meshes).
+    """
+    areas = mesh.areas
+    candidates = np.flatnonzero(areas > DEGENERATE_AREA_MM2)
+    if not len(candidates):
+        return np.empty(0)
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(candidates, size=min(samples, len(candidates)), replace=False,
+                        p=areas[candidates] / areas[candidates].sum())
+    tris = mesh.triangles
+    origins = tris[picked].mean(axis=1)
+    inward = -mesh.cross[picked] / (2.0 * areas[picked])[:, None]
+    if mesh.signed_volume < 0:
+        inward = -inward  # faces wound inside out
+
+    # Each ray is tested only against triangles whose bounding sphere it
+    # passes through (found with matrix products), then Moller-Trumbore on
+    # those pairs. Triangles go in blocks of RAY_BLOCK ray x triangle pairs.
+    centers = tris.mean(axis=1)
+    radii = np.linalg.norm(tris - centers[:, None, :], axis=2).max(axis=1) + RAY_EPS_MM
+    ray_dot_origin = np.einsum("rk,rk->r", origins, inward)
+    origin_sq = np.einsum("rk,rk->r", origins, origins)
+    nearest = np.full(len(picked), np.inf)
+    step = max(1, RAY_BLOCK // len(picked))
+    for start in range(0, len(tris), step):
+        c, r = centers[start:start + step], radii[start:start + step, None]
+        along = c @ inward.T
+        along -= ray_dot_origin
+        # squared distance from each center to each ray's line, in place
+        perp_sq = c @ origins.T
+        perp_sq *= -2.0
+        perp_sq += np.einsum("tk,tk->t", c, c)[:, None]
+        perp_sq += origin_sq
+        perp_sq -= np.square(along)
+        near = perp_sq <= np.square(r)
+        near &= along >= -r
+        tri, ray = np.nonzero(near)
+        if not len(tri):
+            continue
+        tri += start
+        d, o = inward[ray], origins[ray]
+        v0 = tris[tri, 0]
+        e1 = tris[tri, 1] - v0
+        e2 = tris[tri, 2] - v0
+        pvec = np.cross(d, e2)
+        det = np.einsum("ik,ik->i", e1, pvec)
+        ok = np.abs(det) > 1e-12
+        inv = np.divide(1.0, det, out=np.zeros_like(det), where=ok)
+        tvec = o - v0
+        u = np.einsum("ik,ik->i", tvec, pvec) * inv
+        qvec = np.cross(tvec, e1)
+        v = np.einsum("ik,ik->i", d, qvec) * inv
+        t = np.einsum("ik,ik->i", e2, qvec) * inv
+        hit = ok & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > RAY_EPS_MM)
+        np.minimum.at(nearest, ray[hit], t[hit])
+    return nearest
+
+
+def _check_thin_wall(mesh: MeshArrays, config: dict) -> dict:
+    # min_wall_mm is the thinnest of the sampled inward ray casts, so it can
+    # miss a feature no sample lands on; 2V/A is the average thickness (exact
+    # for a thin slab) and covers the whole mesh.
+    volume = abs(mesh.signed_volume)
+    area = float(mesh.areas.sum())
+    mean_wall = 2.0 * volume / area if area > 0 else 0.0
+    depths = wall_thickness_samples(mesh, int(config.get("wall_samples", DEFAULT_WALL_SAMPLES)))
+    depths = depths[np.isfinite(depths)]
+    min_wall = float(depths.min()) if len(depths) else None
+    limit = float(config.get("min_wall_mm", DEFAULT_MIN_WALL_MM))
+    return {
+        "mean_wall_mm_est": mean_wall,
+        "min_wall_mm": min_wall,
+        "wall_samples": int(len(depths)),
+        "thin_wall_warning": (min_wall if min_wall is not None else mean_wall) < limit,
+    }
+
+
+def _check_filament(mesh: MeshArrays, config: dict) -> dict:
+    volume = abs(mesh.signed_volume)
+    density = float(config.get("density_g_cm3", PLA_DENSITY_G_CM3))
+    return {"filament_g_est": volume / 1000.0 * density}
+
+
+# Checks run in this order; "bounds" and "watertight" make up the original
+# report and cannot be disabled.
+CHECKS: Dict[str, Callable[[MeshArrays, dict], dict]] = {
+    "bounds": _check_bounds,
+    "watertight": _check_watertight,
+    "manifold": _check_manifold,
+    "volume": _check_volume,
+    "degenerate": _check_degenerate,
+    "thin_wall": _check_thin_wall,
+    "filament": _check_filament,
+}
+REQUIRED_CHECKS = {"bounds", "watertight"}
+
+
+def enabled_checks(config: Optional[dict]) -> list:
+    """
+    Check names selected by a template's "validation" block: an explicit
+    "checks" list, minus anything in "disable".
+    """
+    config = config or {}
+    names = config.get("checks") or list(CHECKS)
+    disabled = set(config.get("disable", []))
+    return [n for n in CHECKS if (n in names and n not in disabled) or n in REQUIRED_CHECKS]
+
+
+def validate_stl(stl_path: Path, config: Optional[dict] = None) -> dict:
     stl_path = Path(stl_path).resolve()
+    config = config or {}
 
     if not stl_path.exists():
         return {"ok": False, "error": "STL missing"}
@@ -11,19 +220,22 @@ def validate_stl(stl_path: Path) -> dict:
     if stl_path.stat().st_size < 1000:
         return {"ok": False, "error": "STL too small / likely empty"}
 
-    mesh = trimesh.load_mesh(stl_path, force="mesh")
-    if mesh.is_empty:
+    t0 = time.perf_counter()
+    with span("validate.load"):
+        vertices, faces = read_stl(stl_path)
+    load_ms = (time.perf_counter() - t0) * 1000.0
+    if len(faces) == 0:
         return {"ok": False, "error": "Mesh is empty"}
 
-    bounds = mesh.bounds  # [[minx,miny,minz],[maxx,maxy,maxz]]
-    size = (bounds[1] - bounds[0]).tolist()
-
-    return {
-        "ok": True,
-        "bounds_min": bounds[0].tolist(),
-        "bounds_max": bounds[1].tolist(),
-        "size_xyz_mm": size,
-        "watertight": bool(mesh.is_watertight),
-        "faces": int(len(mesh.faces)),
-        "verts": int(len(mesh.vertices)),
-    }
\ No newline at end of file
+    mesh = MeshArrays(vertices, faces)
+    report = {"ok": True}
+    timings = {"load": load_ms}
+    with span("validate.checks"):
+        for name in enabled_checks(config):
+            t0 = time.perf_counter()
+            report.update(CHECKS[name](mesh, config))
+            timings[name] = (time.perf_counter() - t0) * 1000.0
+    report["faces"] = int(len(faces))
+    report["verts"] = int(len(vertices))
+    report["check_timings_ms"] = timings
+    return report
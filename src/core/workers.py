@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import contextvars
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+from src.core.cache import openscad_version
+from src.core.runner import DEFAULT_EXPORT_FORMAT, parse_render_time, run_openscad
+
+WORKERS_DIR = Path(__file__).resolve().parents[2] / ".render_workers"
+WARMUP_SCAD = 'linear_extrude(height=1) text("Warm", size=5);\n'
+
+
+class RenderThreadPool:
+    """
+    Warm render workers fed from a local job queue, so renders from many
+    callers are capped at `workers` concurrent OpenSCAD processes.
+
+    OpenSCAD has no resident mode, so every job is still a fresh process.
+    What a worker keeps between jobs is its own cache directory under
+    WORKERS_DIR, passed to OpenSCAD as XDG_CACHE_HOME so fontconfig builds
+    its font cache there once and reuses it, and a throwaway text() render
+    per executable that pays for that (and the version lookup) before the
+    worker takes real jobs: at pool start when openscad_exe is given,
+    otherwise ahead of the worker's first job for that executable.
+
+    Per-job timings are the measured wall time, OpenSCAD's own "Total
+    rendering time" and the difference between the two as startup_s; the
+    last two are left out when OpenSCAD doesn't print its rendering time.
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_size: int = 0, openscad_exe: Optional[str] = None,
+                 root: Path = WORKERS_DIR):
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        self.root = Path(root)
+        self._jobs: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self._stats = {"jobs": 0, "failed": 0, "wall_s": 0.0, "startup_s": 0.0, "openscad_render_s": 0.0,
+                       "timed": 0, "warmups": 0, "warmup_s": 0.0}
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, args=(i, openscad_exe), name=f"render-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, openscad_exe: str, scad_path: Path, out_stl: Path, params: dict, timeout: Optional[float] = None,
+               export_format: Optional[str] = DEFAULT_EXPORT_FORMAT, extra_args: Optional[Sequence[str]] = None) -> Future:
+        """
+        Queues a render. The future resolves to {"logs", "timings"}.
+        """
+        fut: Future = Future()
+        # carry the caller's context so metrics spans land in its recorder
+        ctx = contextvars.copy_context()
+        self._jobs.put((fut, ctx, openscad_exe, Path(scad_path), Path(out_stl), dict(params), timeout, export_format,
+                        list(extra_args or [])))
+        return fut
+
+    def run_openscad(self, openscad_exe: str, scad_path: Path, out_stl: Path, params: dict,
+                     timeout: Optional[float] = None, export_format: Optional[str] = DEFAULT_EXPORT_FORMAT,
+                     timings: Optional[dict] = None, extra_args: Optional[Sequence[str]] = None) -> str:
+        """
+        Drop-in for runner.run_openscad that renders on the pool. Per-job
+        timings are written into the timings dict when one is passed.
+        """
+        result = self.submit(openscad_exe, scad_path, out_stl, params, timeout, export_format, extra_args).result()
+        if timings is not None:
+            timings.update(result["timings"])
+        return result["logs"]
+
+    def _loop(self, index: int, openscad_exe: Optional[str]) -> None:
+        home = self.root / f"worker-{index}"
+        (home / "cache").mkdir(parents=True, exist_ok=True)
+        env = dict(os.environ, XDG_CACHE_HOME=str(home / "cache"))
+        warmed: set = set()
+        if openscad_exe:
+            self._warm(openscad_exe, home, env, warmed)
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            fut, ctx, openscad_exe, scad_path, out_stl, params, timeout, export_format, extra_args = job
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                self._warm(openscad_exe, home, env, warmed)
+                fut.set_result(ctx.run(self._render, openscad_exe, scad_path, out_stl, params, timeout,
+                                      export_format, extra_args, env))
+            except BaseException as e:
+                with self._stats_lock:
+                    self._stats["failed"] += 1
+                fut.set_exception(e)
+
+    def _warm(self, openscad_exe: str, home: Path, env: Dict[str, str], warmed: set) -> None:
+        if openscad_exe in warmed:
+            return
+        warmed.add(openscad_exe)
+        t0 = time.perf_counter()
+        openscad_version(openscad_exe)
+        scad = home / "warm.scad"
+        scad.write_text(WARMUP_SCAD)
+        try:
+            run_openscad(openscad_exe, scad, home / "warm.stl", {}, timeout=120, env=env)
+        except (OSError, RuntimeError):
+            pass  # a broken executable fails the real job with its own error
+        with self._stats_lock:
+            self._stats["warmups"] += 1
+            self._stats["warmup_s"] += time.perf_counter() - t0
+
+    def _render(self, openscad_exe, scad_path, out_stl, params, timeout, export_format, extra_args,
+                env) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        logs = run_openscad(openscad_exe, scad_path, out_stl, params, timeout=timeout, export_format=export_format,
+                            extra_args=extra_args, env=env)
+        timings = {"wall_s": time.perf_counter() - t0}
+        openscad_s = parse_render_time(logs)
+        if openscad_s is not None:
+            timings["openscad_render_s"] = min(openscad_s, timings["wall_s"])
+            timings["startup_s"] = timings["wall_s"] - timings["openscad_render_s"]
+        with self._stats_lock:
+            self._stats["jobs"] += 1
+            self._stats["wall_s"] += timings["wall_s"]
+            if "startup_s" in timings:
+                self._stats["timed"] += 1
+                self._stats["startup_s"] += timings["startup_s"]
+                self._stats["openscad_render_s"] += timings["openscad_render_s"]
+        return {"logs": logs, "timings": timings}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            s = dict(self._stats)
+        s["mean_wall_s"] = s["wall_s"] / (s["jobs"] or 1)
+        # over the jobs where OpenSCAD reported its rendering time
+        s["mean_startup_s"] = s["startup_s"] / (s["timed"] or 1)
+        s["mean_openscad_render_s"] = s["openscad_render_s"] / (s["timed"] or 1)
+        s["queued"] = self._jobs.qsize()
+        s["workers"] = self.workers
+        return s
+
+    def shutdown(self, wait: bool = True) -> None:
+        for _ in self._threads:
+            self._jobs.put(None)
+        if wait:
+            for t in self._threads:
+                t.join()
+
+
+_default_pool: Optional[RenderThreadPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def default_pool(openscad_exe: Optional[str] = None) -> RenderThreadPool:
+    """
+    The process-wide pool, created (and warmed for openscad_exe, if given)
+    on first use.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = RenderThreadPool(openscad_exe=openscad_exe)
+        return _default_pool
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+_QUOTED_RE = re.compile(r"[\"“”']([^\"“”']+)[\"“”']")
+_SAYING_RE = re.compile(r"\b(?:saying|reads?|reading|with(?: the)? (?:name|text)|named|for)\s+(.+)$", re.IGNORECASE)
+_NUMBER_UNIT_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(?:mm|millimeters?)\b", re.IGNORECASE)
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+class OpenAIBackend:
+    """
+    Chat model behind LangChain's ChatOpenAI. The client is created on first
+    use and shared by every call (and thread) after that.
+    """
+
+    def __init__(self, model: str = DEFAULT_MODEL, temperature: float = 0.0):
+        self.model = model
+        self.temperature = temperature
+        self.name = f"openai:{model}"
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                from langchain_openai import ChatOpenAI
+
+                self._client = ChatOpenAI(model=self.model, temperature=self.temperature)
+            return self._client
+
+    def complete(self, messages: List[Dict[str, str]]) -> str:
+        response = self._get_client().invoke(messages)
+        return response.content or ""
+
+
+class FakeBackend:
+    """
+    Offline stand-in for a chat model: picks the template whose id or label
+    shares the most words with the description, takes quoted text (or the
+    words after "saying"/"named"/...) as the text lines and the first
+    "<n> mm" as the main size. Deterministic, so it suits tests and demos.
+    """
+
+    name = "fake"
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def complete(self, messages: List[Dict[str, str]]) -> str:
+        with self._lock:
+            self.calls += 1
+        request = json.loads(messages[-1]["content"])
+        description = request["description"]
+        templates = request["templates"]
+        words = set(_WORD_RE.findall(description.lower()))
+
+        def score(t: Dict[str, Any]) -> int:
+            names = set(_WORD_RE.findall(f"{t['id']} {t.get('label', '')}".lower()))
+            return len(words & names)
+
+        best = max(templates, key=score)
+        params: Dict[str, Any] = {}
+        lines = _QUOTED_RE.findall(description)
+        if not lines:
+            m = _SAYING_RE.search(description)
+            lines = [m.group(1).strip(" .")] if m else []
+        for i, line in enumerate(lines[: int(best.get("max_lines", 1))]):
+            params[f"line{i + 1}"] = line
+        size = _NUMBER_UNIT_RE.search(description)
+        if size:
+            key = "diameter" if "diameter:" in best["params"] else "w"
+            params[key] = float(size.group(1))
+        return json.dumps({"template_id": best["id"], "params": params, "notes": "fake backend"})
+
+
+_default_backend = None
+_default_lock = threading.Lock()
+
+
+def default_backend():
+    """
+    Shared backend for the app: the OpenAI chat model, or the offline fake
+    when PROMPTTOSTL_INTENT_BACKEND=fake.
+    """
+    global _default_backend
+    with _default_lock:
+        if _default_backend is None:
+            choice = os.environ.get("PROMPTTOSTL_INTENT_BACKEND", "openai")
+            _default_backend = FakeBackend() if choice == "fake" else OpenAIBackend(
+                os.environ.get("PROMPTTOSTL_INTENT_MODEL", DEFAULT_MODEL)
+            )
+        return _default_backend
+
+
+def set_default_backend(backend: Optional[Any]) -> None:
+    global _default_backend
+    with _default_lock:
+        _default_backend = backend
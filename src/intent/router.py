@@ -1,52 +1,42 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import os
 import re
-from typing import Any, Dict
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
 
-from langchain_openai import ChatOpenAI
+from src.core.params import sanitize_params as _sanitize_params
+from src.intent.backends import default_backend
 
+INTENT_CACHE_DIR = Path(__file__).resolve().parents[2] / ".intent_cache"
+DEFAULT_TTL_S = 7 * 24 * 3600
+DEFAULT_MEMORY_ENTRIES = 256
+DEFAULT_BATCH_WORKERS = 4
 
-def _coerce_value(value: Any, spec: Dict[str, Any]) -> Any:
-    default = spec.get("default")
-    vtype = spec.get("type", "string")
-    if value is None:
-        return default
-    if vtype in {"int", "integer"}:
-        try:
-            val = int(float(value))
-        except Exception:
-            return default
-        min_v = spec.get("min")
-        max_v = spec.get("max")
-        if min_v is not None:
-            val = max(int(min_v), val)
-        if max_v is not None:
-            val = min(int(max_v), val)
-        return val
-    if vtype == "number":
-        try:
-            val = float(value)
-        except Exception:
-            return default
-        min_v = spec.get("min")
-        max_v = spec.get("max")
-        if min_v is not None:
-            val = max(float(min_v), val)
-        if max_v is not None:
-            val = min(float(max_v), val)
-        return val
-    return str(value)
-
-
-def _sanitize_params(schema: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
-    out = {}
-    for key, spec in schema.get("params", {}).items():
-        if key in params:
-            out[key] = _coerce_value(params.get(key), spec)
-        else:
-            out[key] = spec.get("default")
-    return out
+# Params a description cannot sensibly set: layout internals and emblem
+# placement (the emblem file comes from an upload, not from text).
+DIGEST_SKIP_PREFIXES = ("text_box_", "emblem_")
+DIGEST_SKIP = {"debug"}
+_TYPE_CODES = {"string": "str", "int": "int", "integer": "int", "number": "num"}
+
+SYSTEM_PROMPT = (
+    "You map user descriptions to a single template and parameters. "
+    "Output ONLY valid JSON with keys: template_id, params, notes. "
+    "Do not invent personal data. Use only user-provided text. "
+    "Only include params that exist in the chosen template schema. "
+    "Each template lists its params as name:type[min..max]=default. "
+    "Use defaults when missing. Keep numbers within min/max."
+)
+
+_WS_RE = re.compile(r"\s+")
 
 
 def _parse_json(text: str) -> Dict[str, Any]:
@@ -62,50 +52,202 @@ def _parse_json(text: str) -> Dict[str, Any]:
     return {}
 
 
-def route_intent(description: str, templates: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
-    description = (description or "").strip()
-    if not description:
-        first_template = next(iter(templates.keys()))
-        schema = templates[first_template]
-        return {
-            "template_id": first_template,
-            "params": _sanitize_params(schema, {}),
-            "notes": "Add a description to generate a proposal.",
-        }
+def normalize_description(description: str) -> str:
+    """
+    Unicode-normalized, whitespace-collapsed description. Case is kept since
+    it ends up in the text lines.
+    """
+    return _WS_RE.sub(" ", unicodedata.normalize("NFKC", description or "")).strip()
+
+
+def _fmt_number(value: Any) -> str:
+    return f"{float(value):g}" if isinstance(value, (int, float)) else str(value)
 
-    template_list = []
+
+def schema_digest(templates: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    What the model needs to know about each template, in a fraction of the
+    tokens of the full schemas: one "name:type[min..max]=default" entry per
+    user-facing param.
+    """
+    digest = []
     for template_id, schema in templates.items():
-        template_list.append({
-            "template_id": template_id,
+        params = []
+        for name, spec in schema.get("params", {}).items():
+            if name in DIGEST_SKIP or name.startswith(DIGEST_SKIP_PREFIXES):
+                continue
+            entry = f"{name}:{_TYPE_CODES.get(spec.get('type', 'string'), 'str')}"
+            if spec.get("min") is not None and spec.get("max") is not None:
+                entry += f"[{_fmt_number(spec['min'])}..{_fmt_number(spec['max'])}]"
+            default = spec.get("default")
+            if default not in (None, ""):
+                entry += f"={_fmt_number(default)}"
+            params.append(entry)
+        digest.append({
+            "id": template_id,
             "label": schema.get("label", template_id),
-            "params": schema.get("params", {}),
+            "max_lines": schema.get("max_lines", 1),
+            "params": "; ".join(params),
         })
+    return digest
+
+
+class ResponseCache:
+    """
+    Parsed model responses keyed by description, template digest and
+    backend. A bounded in-memory LRU sits in front of JSON files on disk
+    that expire after ttl_s; root=None keeps it in memory only.
+    """
 
-    system_prompt = (
-        "You map user descriptions to a single template and parameters. "
-        "Output ONLY valid JSON with keys: template_id, params, notes. "
-        "Do not invent personal data. Use only user-provided text. "
-        "Only include params that exist in the chosen template schema. "
-        "Use defaults when missing. Keep numbers within min/max."
-    )
-    user_prompt = {
-        "description": description,
-        "templates": template_list,
-    }
-
-    model = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    response = model.invoke(
-        [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": json.dumps(user_prompt)},
-        ]
-    )
-    data = _parse_json(response.content or "")
+    def __init__(self, root: Optional[Path] = INTENT_CACHE_DIR, ttl_s: float = DEFAULT_TTL_S,
+                 max_entries: int = DEFAULT_MEMORY_ENTRIES):
+        self.root = Path(root) if root is not None else None
+        self.ttl_s = float(ttl_s)
+        self.max_entries = int(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
 
+    @staticmethod
+    def key(description: str, digest: List[Dict[str, Any]], backend_name: str) -> str:
+        payload = json.dumps({"d": description, "t": digest, "b": backend_name}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, created: float, data: Dict[str, Any]) -> None:
+        self._memory[key] = (created, data)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl_s:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        if self.root is not None:
+            path = self.root / key[:2] / f"{key}.json"
+            try:
+                stored = json.loads(path.read_text())
+                if now - float(stored["created"]) <= self.ttl_s:
+                    with self._lock:
+                        self._remember(key, float(stored["created"]), stored["data"])
+                        self.hits += 1
+                    return stored["data"]
+                path.unlink()
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: Dict[str, Any]) -> None:
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, data)
+        if self.root is None:
+            return
+        path = self.root / key[:2] / f"{key}.json"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".intent_", dir=path.parent)
+            with os.fdopen(fd, "w") as f:
+                json.dump({"created": created, "data": data}, f)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.root is not None:
+            for path in self.root.glob("*/*.json"):
+                path.unlink(missing_ok=True)
+
+
+_default_cache: Optional[ResponseCache] = None
+
+
+def default_response_cache() -> ResponseCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
+
+
+def _proposal(data: Dict[str, Any], templates: Dict[str, Dict[str, Any]], cached: bool) -> Dict[str, Any]:
     template_id = data.get("template_id")
     if template_id not in templates:
         template_id = next(iter(templates.keys()))
     schema = templates[template_id]
-    params = _sanitize_params(schema, data.get("params", {}))
+    params = _sanitize_params(schema, data.get("params") or {})
     notes = str(data.get("notes", "")).strip()
-    return {"template_id": template_id, "params": params, "notes": notes}
+    return {"template_id": template_id, "params": params, "notes": notes, "cached": cached}
+
+
+def route_intent(
+    description: str,
+    templates: Dict[str, Dict[str, Any]],
+    backend=None,
+    cache: Optional[ResponseCache] = None,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    Proposes a template and params for a free-text description. backend is
+    anything with a name and complete(messages) -> str (default_backend()
+    unless given). Answers are cached per normalized description and
+    template digest, so repeating a description costs no model call.
+    """
+    description = normalize_description(description)
+    if not description:
+        first_template = next(iter(templates.keys()))
+        schema = templates[first_template]
+        return {
+            "template_id": first_template,
+            "params": _sanitize_params(schema, {}),
+            "notes": "Add a description to generate a proposal.",
+        }
+
+    backend = backend or default_backend()
+    digest = schema_digest(templates)
+    cache = cache or default_response_cache()
+    key = ResponseCache.key(description, digest, getattr(backend, "name", type(backend).__name__))
+    if use_cache:
+        data = cache.get(key)
+        if data is not None:
+            return _proposal(data, templates, cached=True)
+
+    user_prompt = {"description": description, "templates": digest}
+    text = backend.complete([
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": json.dumps(user_prompt, separators=(",", ":"))},
+    ])
+    data = _parse_json(text)
+    if data.get("template_id") in templates:
+        cache.put(key, data)
+    return _proposal(data, templates, cached=False)
+
+
+def route_intents(
+    descriptions: List[str],
+    templates: Dict[str, Dict[str, Any]],
+    backend=None,
+    cache: Optional[ResponseCache] = None,
+    use_cache: bool = True,
+    max_workers: int = DEFAULT_BATCH_WORKERS,
+) -> List[Dict[str, Any]]:
+    """
+    route_intent for many descriptions, at most max_workers model calls in
+    flight. Descriptions that normalize alike are routed once. Results are
+    in input order.
+    """
+    backend = backend or default_backend()
+    unique = list(dict.fromkeys(normalize_description(d) for d in descriptions))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique) or 1))) as executor:
+        routed = dict(zip(unique, executor.map(
+            lambda d: route_intent(d, templates, backend=backend, cache=cache, use_cache=use_cache), unique
+        )))
+    return [dict(routed[n], params=dict(routed[n]["params"])) for n in map(normalize_description, descriptions)]
@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+# Read at import time; keeps test builds from appending to out/metrics.jsonl
+# and from rendering thumbnails nobody looks at.
+os.environ.setdefault("PROMPTTOSTL_METRICS", "0")
+os.environ.setdefault("PROMPTTOSTL_THUMBNAILS", "0")
+
+import src.core.cache as cache_module  # noqa: E402
+from src.core.compose import clear_solid_cache  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def build_cache(tmp_path, monkeypatch):
+    """
+    A fresh default build cache (and empty compose part memory) per test,
+    instead of the repo's .build_cache.
+    """
+    cache = cache_module.BuildCache(tmp_path / "build_cache")
+    monkeypatch.setattr(cache_module, "_default_cache", cache)
+    clear_solid_cache()
+    return cache
@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import src.core.batch as batch
+from src.core.batch import check_job_name, read_rows, run_batch
+
+STUB = str(Path(__file__).resolve().parents[1] / "benchmarks" / "stub_openscad.py")
+
+
+def test_run_batch_reports_every_row_by_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "PREPARE_CHUNK", 2)
+    rows = [
+        {"template_id": "nameplate", "params": {"line1": "A"}, "job_name": "a"},
+        {"template_id": "no_such_template", "params": {}, "job_name": "missing"},
+        {"template_id": "nameplate", "params": {"line1": "B"}, "job_name": "../escape"},
+        {"template_id": "coaster_round", "params": {"line1": "C"}, "job_name": "c"},
+        {"template_id": "nameplate", "params": {"line1": "D"}},
+    ]
+    results = list(run_batch(rows, STUB, tmp_path / "out", workers=2, use_cache=False))
+    by_index = {r["index"]: r for r in results}
+    assert sorted(by_index) == [0, 1, 2, 3, 4]
+
+    assert by_index[0]["ok"] and Path(by_index[0]["stl_path"]).parent == tmp_path / "out" / "a"
+    assert by_index[3]["ok"] and by_index[3]["template_id"] == "coaster_round"
+    assert by_index[4]["ok"] and by_index[4]["job_name"].startswith("nameplate_")
+    assert not by_index[1]["ok"] and by_index[1]["error"]
+    assert not by_index[2]["ok"] and "Invalid job_name" in by_index[2]["error"]
+    assert not (tmp_path / "escape").exists()
+    assert set(by_index[0]["timings"]) == {"load_s", "params_s", "build_s", "total_s"}
+
+
+@pytest.mark.parametrize("name", ["", " ", ".", "..", "a/b", "a\\b", "C:x"])
+def test_check_job_name_rejects_paths(name):
+    with pytest.raises(ValueError):
+        check_job_name(name)
+
+
+def test_read_rows_from_csv_and_jsonl(tmp_path):
+    csv_path = tmp_path / "rows.csv"
+    csv_path.write_text('template_id,job_name,line1,params\nnameplate,a,Ann,"{""w"": 90}"\ncoaster_round,,Bo,\n')
+    assert read_rows(csv_path) == [
+        {"template_id": "nameplate", "params": {"w": 90, "line1": "Ann"}, "job_name": "a"},
+        {"template_id": "coaster_round", "params": {"line1": "Bo"}},
+    ]
+    jsonl_path = tmp_path / "rows.jsonl"
+    jsonl_path.write_text(json.dumps({"template_id": "nameplate", "params": {"line1": "A"}}) + "\n\n")
+    assert read_rows(jsonl_path) == [{"template_id": "nameplate", "params": {"line1": "A"}}]
@@ -0,0 +1,78 @@
+import os
+import stat
+from pathlib import Path
+
+import numpy as np
+
+from src.core.cache import STL_NAME, BuildCache
+from src.core.runner import run_openscad
+from src.core.stl_io import read_stl, write_binary_stl
+
+STUB = str(Path(__file__).resolve().parents[1] / "benchmarks" / "stub_openscad.py")
+TETRA_V = np.array([[0, 0, 0], [10, 0, 0], [0, 10, 0], [0, 0, 10]], dtype=float)
+TETRA_F = np.array([[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]])
+
+
+def _stl(path: Path, scale: float = 1.0) -> Path:
+    write_binary_stl(path, TETRA_V * scale, TETRA_F)
+    return path
+
+
+def _key(i: int) -> str:
+    return f"{i:02x}" * 32
+
+
+def test_fetch_misses_then_hits_after_store(tmp_path):
+    cache = BuildCache(tmp_path / "cache")
+    out = tmp_path / "out" / "model.stl"
+    assert cache.fetch(_key(1), out) is None
+    cache.store(_key(1), _stl(tmp_path / "a.stl"), "logs", {"ok": True})
+    hit = cache.fetch(_key(1), out)
+    assert hit == {"logs": "logs", "report": {"ok": True}}
+    assert out.read_bytes() == (tmp_path / "a.stl").read_bytes()
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["bytes"] > 0
+
+
+def test_evicts_least_recently_used_entry(tmp_path):
+    cache = BuildCache(tmp_path / "cache", max_entries=2)
+    for i in range(2):
+        cache.store(_key(i), _stl(tmp_path / f"{i}.stl"), "", {"ok": True})
+    os.utime(cache._entry_dir(_key(0)), (1000, 1000))
+    os.utime(cache._entry_dir(_key(1)), (2000, 2000))
+    # a hit refreshes entry 0, leaving entry 1 as the oldest
+    assert cache.fetch(_key(0), tmp_path / "hit.stl") is not None
+    cache.store(_key(2), _stl(tmp_path / "2.stl"), "", {"ok": True})
+    assert cache.contains(_key(0)) and cache.contains(_key(2))
+    assert not cache.contains(_key(1))
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"]) == (2, 1)
+
+
+def test_evicts_past_max_bytes(tmp_path):
+    size = _stl(tmp_path / "probe.stl").stat().st_size
+    cache = BuildCache(tmp_path / "cache", max_bytes=size * 3)
+    for i in range(4):
+        cache.store(_key(i), _stl(tmp_path / f"{i}.stl"), "", {"ok": True})
+    assert cache.stats()["bytes"] <= size * 3
+    assert not cache.contains(_key(0))
+
+
+def test_rewriting_a_fetched_output_leaves_the_entry_intact(tmp_path):
+    cache = BuildCache(tmp_path / "cache")
+    cache.store(_key(1), _stl(tmp_path / "a.stl"), "", {"ok": True})
+    entry = cache._entry_dir(_key(1)) / STL_NAME
+    original = entry.read_bytes()
+    assert not entry.stat().st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+
+    out = tmp_path / "job" / "model.stl"
+    cache.fetch(_key(1), out)
+    _stl(out, scale=2.0)
+    assert entry.read_bytes() == original
+
+    cache.fetch(_key(1), out)
+    run_openscad(STUB, tmp_path / "a.scad", out, {"w": 30, "h": 20, "th": 4})
+    assert entry.read_bytes() == original
+    vertices, _ = read_stl(out)
+    assert np.isclose(vertices[:, 0].max() - vertices[:, 0].min(), 30)
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import pytest
+
+from src.core.build import build_job
+from src.core.catalog import load_template
+from src.core.compose import clear_solid_cache
+from src.core.params import prepare_params
+
+pytest.importorskip("manifold3d")
+
+STUB = str(Path(__file__).resolve().parents[1] / "benchmarks" / "stub_openscad.py")
+
+
+def _build(tmp_path, name, compose=True):
+    schema, scad_path = load_template("coaster_round")
+    params, _ = prepare_params("coaster_round", schema, {"line1": name, "emboss": 1})
+    return build_job(STUB, "coaster_round", scad_path, params, tmp_path / f"{name}_{compose}",
+                     validation=schema.get("validation"), dependencies=schema.get("dependencies"),
+                     compose=schema["compose"] if compose else None, thumbnails=False)
+
+
+def test_parts_are_rendered_once_across_processes(tmp_path, build_cache):
+    logs = []
+    for name in ("A", "B", "C"):
+        clear_solid_cache()  # nothing in memory, as in a fresh batch worker
+        logs.append(_build(tmp_path, name)["logs"])
+    assert "rendering the whole model" in logs[0]
+    assert "[compose] body: rendered" in logs[1]
+    assert "[compose] body: cached" in logs[2] and "[compose] text: rendered" in logs[2]
+    assert not build_cache.mark(next((build_cache.root / ".marks").iterdir()).name)
+
+
+def test_composed_and_whole_renders_are_cached_apart(tmp_path):
+    for name in ("A", "B"):
+        _build(tmp_path, name)
+    assert "[compose]" in _build(tmp_path, "B")["logs"]
+
+    whole = _build(tmp_path, "B", compose=False)
+    assert not whole["cache_hit"]
+    assert "[compose]" not in whole["logs"]
+    assert _build(tmp_path, "B", compose=False)["cache_hit"]
@@ -0,0 +1,70 @@
+import pytest
+
+from src.core.catalog import load_template
+from src.core.deps import conditions_match, default_values, normalize_params, referenced_variables, scad_defaults
+
+SCAD = """
+w = 80;        // plate width
+h = 30.0;
+label = "Hi; there";
+debug = 0;
+unused = 5;
+holes = 1;
+hole_d = 4;
+/* old = 1; */
+module plate() { cube([w, h, 2]); if (debug) echo(label); }
+plate();
+if (holes) translate([5, 5, 0]) cylinder(d = hole_d, h = 3);
+"""
+DEPS = {"non_geometry": ["debug"], "dead_when": [{"when": {"holes": 0}, "drop": ["hole_d"]}]}
+
+
+@pytest.fixture
+def scad_path(tmp_path):
+    path = tmp_path / "model.scad"
+    path.write_text(SCAD)
+    return path
+
+
+def test_scad_source_is_read_for_live_names_and_defaults():
+    assert referenced_variables(SCAD) == {"w", "h", "label", "debug", "holes", "hole_d"}
+    assert scad_defaults(SCAD) == {"w": 80, "h": 30.0, "label": "Hi; there", "debug": 0, "unused": 5,
+                                   "holes": 1, "hole_d": 4}
+
+
+def test_unread_and_non_geometry_params_are_dropped(scad_path):
+    params = {"w": 90, "unused": 7, "debug": 1, "not_in_scad": "x", "holes": 1, "hole_d": 5}
+    assert normalize_params(params, scad_path, DEPS) == {"w": 90, "holes": 1, "hole_d": 5}
+    assert normalize_params(params, scad_path)["debug"] == 1
+
+
+def test_dead_when_drops_params_that_the_switch_turns_off(scad_path):
+    off = normalize_params({"w": 90, "holes": 0, "hole_d": 5}, scad_path, DEPS)
+    assert off == {"w": 90, "holes": 0}
+    # numbers match numerically, so 0.0 turns holes off too
+    assert normalize_params({"holes": 0.0, "hole_d": 5}, scad_path, DEPS) == {"holes": 0.0}
+    assert normalize_params({"holes": "0", "hole_d": 5}, scad_path, DEPS) == {"holes": "0"}
+    assert default_values(scad_path)["hole_d"] == 4
+
+
+def test_conditions_need_every_key():
+    assert conditions_match({"a": 0, "b": ""}, {"a": 0.0, "b": ""})
+    assert not conditions_match({"a": 0}, {"a": 0, "b": ""})
+    assert not conditions_match({"a": 0}, {})
+    assert not conditions_match({"a": "x"}, {"a": 0})
+
+
+def test_nameplate_variants_that_render_alike_normalize_alike():
+    schema, scad_path = load_template("nameplate")
+    base = {"line1": "A", "line2": "", "line3": "", "holes": 0, "emblem_enabled": 0}
+    variants = [
+        dict(base),
+        dict(base, debug=1),
+        dict(base, hole_d=6, hole_offset=9),
+        dict(base, line_gap=3),
+        dict(base, emblem_scale=2, emblem_path="/tmp/x.svg"),
+    ]
+    normalized = [normalize_params(v, scad_path, schema.get("dependencies")) for v in variants]
+    assert all(n == normalized[0] for n in normalized)
+    assert "emblem_enabled" not in normalized[0] and "line1" in normalized[0]
+    assert normalize_params(dict(base, holes=1, hole_d=6), scad_path, schema.get("dependencies"))["hole_d"] == 6
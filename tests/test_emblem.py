@@ -0,0 +1,105 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.core.emblem import (flatten_cubic, flatten_path, prepare_emblem, simplify_polyline, simplify_ring,
+                             simplify_svg)
+
+
+def _ring_error(original: np.ndarray, kept: np.ndarray) -> float:
+    """
+    Largest distance from an original point to the closed polygon kept.
+    """
+    a, b = kept, np.roll(kept, -1, axis=0)
+    seg = b - a
+    t = np.clip(np.einsum("pkd,kd->pk", original[:, None] - a, seg) / np.einsum("kd,kd->k", seg, seg), 0, 1)
+    nearest = a + t[..., None] * seg
+    return float(np.min(np.linalg.norm(original[:, None] - nearest, axis=2), axis=1).max())
+
+
+def test_ring_keeps_only_the_corners_of_a_sampled_square():
+    side = np.linspace(0, 10, 11)[:-1]
+    square = np.vstack([
+        np.column_stack([side, np.zeros(10)]), np.column_stack([np.full(10, 10.0), side]),
+        np.column_stack([10 - side, np.full(10, 10.0)]), np.column_stack([np.zeros(10), 10 - side]),
+        [[0.0, 0.0]],  # explicitly closed
+    ])
+    kept = simplify_ring(square, 0.01)
+    assert sorted(map(tuple, kept)) == [(0, 0), (0, 10), (10, 0), (10, 10)]
+
+
+@pytest.mark.parametrize("tol", [0.5, 0.05, 0.001])
+def test_ring_stays_within_tolerance_of_a_circle(tol):
+    t = np.linspace(0, 2 * math.pi, 720, endpoint=False)
+    circle = 20 * np.column_stack([np.cos(t), np.sin(t)])
+    kept = simplify_ring(circle, tol)
+    assert 3 < len(kept) < len(circle)
+    assert _ring_error(circle, kept) <= tol + 1e-9
+
+
+def test_polyline_keeps_its_endpoints():
+    pts = np.array([[0, 0], [1, 0.001], [2, 0], [3, 5], [4, 0]], dtype=float)
+    kept = simplify_polyline(pts, 0.01)
+    assert kept.tolist() == [[0, 0], [2, 0], [3, 5], [4, 0]]
+    assert simplify_polyline(pts, 0).tolist() == pts.tolist()
+
+
+@pytest.mark.parametrize("d, sweep_y", [
+    ("M 10 0 A 10 10 0 0 1 -10 0", 1),
+    ("M 10 0 A 10 10 0 0 0 -10 0", -1),
+    ("M 10 0 a 10 10 0 0 1 -20 0", 1),
+    ("M 10 0 A 1 1 0 0 1 -10 0", 1),  # radii too small are scaled up to fit
+])
+def test_arc_flattens_onto_the_circle_within_tolerance(d, sweep_y):
+    tol = 0.01
+    ((pts, closed),) = flatten_path(d, tol)
+    assert not closed
+    assert pts[0].tolist() == [10, 0] and pts[-1].tolist() == [-10, 0]
+    assert np.allclose(np.hypot(*pts.T), 10.0)
+    assert np.all(np.sign(pts[1:-1, 1]) == sweep_y)
+    mids = (pts[1:] + pts[:-1]) / 2
+    assert 10.0 - np.hypot(*mids.T).min() <= tol
+
+
+def test_large_arc_takes_the_long_way_round():
+    # same endpoints and sweep as the quarter circle about the origin, so the
+    # large arc runs three quarters of the way round (10, 10)
+    ((pts, _),) = flatten_path("M 10 0 A 10 10 0 1 1 0 10", 0.01)
+    rel = pts - [10, 10]
+    assert np.allclose(np.hypot(*rel.T), 10.0)
+    angles = np.unwrap(np.arctan2(rel[:, 1], rel[:, 0]))
+    assert angles[-1] - angles[0] == pytest.approx(1.5 * math.pi)
+
+
+def test_cubic_chords_stay_within_tolerance():
+    p = [np.array(x, dtype=float) for x in ([0, 0], [0, 30], [40, 30], [40, 0])]
+    tol = 0.01
+    chords = np.vstack([p[0], flatten_cubic(*p, tol)])
+    t = np.linspace(0, 1, 5001)[:, None]
+    curve = (1 - t) ** 3 * p[0] + 3 * (1 - t) ** 2 * t * p[1] + 3 * (1 - t) * t ** 2 * p[2] + t ** 3 * p[3]
+    seg = chords[1:] - chords[:-1]
+    rel = curve[:, None] - chords[:-1]
+    u = np.clip(np.einsum("pkd,kd->pk", rel, seg) / np.einsum("kd,kd->k", seg, seg), 0, 1)
+    err = np.linalg.norm(rel - u[..., None] * seg, axis=2).min(axis=1).max()
+    assert err <= tol
+
+
+def test_svg_is_simplified_in_each_elements_own_units(tmp_path):
+    t = np.linspace(0, 2 * math.pi, 400, endpoint=False)
+    ring = " ".join(f"{x:.6f},{y:.6f}" for x, y in 40 * np.column_stack([np.cos(t), np.sin(t)]))
+    svg = (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100">'
+           f'<polygon points="{ring}"/><g transform="scale(10)"><polygon points="{ring}"/></g></svg>').encode()
+    out, stats = simplify_svg(svg, tolerance=0.001)
+    assert stats["elements"] == 2 and stats["points_in"] == 800
+    assert stats["points_out"] < stats["points_in"]
+    assert b'viewBox="0 0 100 100"' in out and b'transform="scale(10)"' in out
+    # the scaled copy gets a tenth of the tolerance, so keeps more points
+    first, second = out.split(b"<ns0:polygon" if b"<ns0:" in out else b"<polygon")[1:]
+    assert second.count(b",") > first.count(b",")
+
+    with pytest.raises(ValueError):
+        simplify_svg(b"<html/>")
+    assert prepare_emblem(out, 0.001, cache_dir=tmp_path) == prepare_emblem(out, 0.001, cache_dir=tmp_path)
+    assert len(list(tmp_path.glob("*.svg"))) == 1
+    assert prepare_emblem(b"not svg", 0.001, cache_dir=tmp_path) == b"not svg"
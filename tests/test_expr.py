@@ -0,0 +1,106 @@
+import ast
+import math
+import random
+
+import numpy as np
+
+from src.core.expr import compile_expr, evaluate
+
+NAMES = ["w", "h", "pad_x", "hole_d", "missing"]
+UNSUPPORTED = ["w ** 2", "max(w, 1)", "w if h else 1", "'text'", "w[0]", "w % 3", "w +", "", "1 +* 2"]
+
+
+def _reference_eval(value, params):
+    """
+    The ast-walking eval_expr that compile_expr replaced.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return 0.0
+
+    def _eval(node):
+        if isinstance(node, ast.Expression):
+            return _eval(node.body)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub, ast.Mult, ast.Div)):
+            left = _eval(node.left)
+            right = _eval(node.right)
+            if isinstance(node.op, ast.Add):
+                return left + right
+            if isinstance(node.op, ast.Sub):
+                return left - right
+            if isinstance(node.op, ast.Mult):
+                return left * right
+            if isinstance(node.op, ast.Div):
+                return left / right if right != 0 else 0.0
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+            val = _eval(node.operand)
+            return val if isinstance(node.op, ast.UAdd) else -val
+        if isinstance(node, ast.Name):
+            return float(params.get(node.id, 0.0))
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return float(node.value)
+        return 0.0
+
+    try:
+        return float(_eval(ast.parse(value, mode="eval")))
+    except Exception:
+        return 0.0
+
+
+def _random_expr(rng: random.Random, depth: int = 0) -> str:
+    roll = rng.random()
+    if depth > 3 or roll < 0.3:
+        return rng.choice(NAMES + ["0", "2", "5.5", "8", "0.25", "-3"])
+    if roll < 0.4:
+        return rng.choice(["-", "+"]) + _random_expr(rng, depth + 1)
+    if roll < 0.45:
+        return rng.choice(UNSUPPORTED[:6])
+    op = rng.choice(["+", "-", "*", "/"])
+    expr = f"{_random_expr(rng, depth + 1)} {op} {_random_expr(rng, depth + 1)}"
+    return f"({expr})" if rng.random() < 0.5 else expr
+
+
+def _random_params(rng: random.Random) -> dict:
+    params = {name: rng.choice([0, 0.0, rng.uniform(-50, 200), rng.randint(1, 100)]) for name in NAMES[:4]}
+    if rng.random() < 0.05:
+        params[rng.choice(NAMES[:4])] = "not a number"
+    return params
+
+
+def _same(a: float, b: float) -> bool:
+    return (math.isnan(a) and math.isnan(b)) or a == b
+
+
+def test_compiled_expressions_match_ast_walker():
+    rng = random.Random(1013)
+    for _ in range(5000):
+        source = _random_expr(rng)
+        params = _random_params(rng)
+        assert _same(evaluate(source, params), _reference_eval(source, params)), (source, params)
+    for source in UNSUPPORTED + [12, 3.5, None, ["w"]]:
+        params = _random_params(rng)
+        assert _same(evaluate(source, params), _reference_eval(source, params)), source
+
+
+def test_vectorized_evaluation_matches_per_row():
+    rng = random.Random(2013)
+    for _ in range(300):
+        source = _random_expr(rng)
+        try:
+            compiled = compile_expr(source)
+        except SyntaxError:
+            continue
+        rows = [{name: rng.uniform(-50, 200) if rng.random() < 0.9 else 0.0 for name in NAMES[:4]} for _ in range(40)]
+        columns = {name: np.array([row[name] for row in rows]) for name in NAMES[:4]}
+        expected = np.array([_reference_eval(source, row) for row in rows])
+        with np.errstate(all="ignore"):
+            got = compiled.evaluate(columns, len(rows))
+        np.testing.assert_array_equal(got, expected, err_msg=source)
+
+
+def test_constant_subtrees_are_folded():
+    compiled = compile_expr("w - 2*pad_x - 2*(8 + 5.5/2)")
+    assert compiled.variables == frozenset({"w", "pad_x"})
+    assert compile_expr("2*(8 + 5.5/2)").constant == 21.5
+    assert compiled({"w": 100, "pad_x": 4}) == 100 - 8 - 21.5
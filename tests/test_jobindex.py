@@ -0,0 +1,76 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+from src.core.jobindex import JobIndex, job_stl, params_hash
+from src.core.stl_io import write_binary_stl
+
+VERTICES = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]], dtype=float)
+FACES = np.array([[0, 2, 1], [0, 1, 3], [1, 2, 3], [2, 0, 3]])
+
+
+def _job(out_dir, name, template_id, ok, stamps, mtime):
+    job_dir = out_dir / name
+    job_dir.mkdir(parents=True)
+    (job_dir / "spec.json").write_text(json.dumps({"template_id": template_id, "render_params": {"line1": name}}))
+    (job_dir / "report.json").write_text(json.dumps({"ok": ok, "watertight": ok, "faces": 4}))
+    for i, stamp in enumerate(stamps):
+        stl = job_dir / f"model_{stamp}.stl"
+        write_binary_stl(stl, VERTICES, FACES)
+        os.utime(stl, (mtime + i, mtime + i))
+    return job_dir
+
+
+def _jobs(rows):
+    return [(r["job"], os.path.basename(r["stl_path"])) for r in rows]
+
+
+def test_sync_and_query_filters(tmp_path):
+    out = tmp_path / "out"
+    _job(out, "alice", "nameplate", True, [100], 1000)
+    _job(out, "bob", "coaster_round", False, [200], 2000)
+    _job(out, "carol", "nameplate", True, [300, "301_draft"], 3000)
+    index = JobIndex(out)
+    assert index.sync(force=True) == 3
+    assert index.sync() == 0
+
+    assert _jobs(index.query()) == [("carol", "model_301_draft.stl"), ("carol", "model_300.stl"),
+                                    ("bob", "model_200.stl"), ("alice", "model_100.stl")]
+    assert index.count() == 4
+    assert _jobs(index.query(template_id="nameplate", limit=2, offset=1)) == [("carol", "model_300.stl"),
+                                                                               ("alice", "model_100.stl")]
+    assert _jobs(index.query(search="bo")) == [("bob", "model_200.stl")]
+    assert _jobs(index.query(ok=False)) == [("bob", "model_200.stl")]
+    # report.json describes the newest render only; the older one is unvalidated
+    assert index.count(template_id="nameplate", ok=True) == 2
+    assert [r["ok"] for r in index.query(search="carol")] == [1, None]
+    assert index.query(search="alice")[0]["params_hash"] == params_hash({"line1": "alice"})
+
+
+def test_sync_picks_up_changed_and_deleted_dirs(tmp_path):
+    out = tmp_path / "out"
+    _job(out, "alice", "nameplate", True, [100], 1000)
+    bob = _job(out, "bob", "nameplate", True, [200], 2000)
+    index = JobIndex(out, rescan_interval=0)
+    index.sync(force=True)
+
+    shutil.rmtree(out / "alice")
+    write_binary_stl(bob / "model_250.stl", VERTICES, FACES)
+    os.utime(bob / "model_250.stl", (2500, 2500))
+    assert index.sync() == 2
+    assert _jobs(index.query()) == [("bob", "model_250.stl"), ("bob", "model_200.stl")]
+    assert job_stl(bob).name == "model_250.stl"
+
+
+def test_record_upserts_a_build(tmp_path):
+    out = tmp_path / "out"
+    job_dir = _job(out, "dave", "keychain_roundrect", False, [100], 1000)
+    index = JobIndex(out)
+    index.sync(force=True)
+    index.record(job_dir, job_dir / "model_100.stl", "keychain_roundrect", {"line1": "Dave"},
+                 {"ok": True, "watertight": True, "faces": 4, "volume_mm3": 0.5})
+    (row,) = index.query()
+    assert (row["ok"], row["watertight"], row["faces"], row["volume_mm3"]) == (1, 1, 4, 0.5)
+    assert row["params_hash"] == params_hash({"line1": "Dave"})
@@ -0,0 +1,140 @@
+import random
+from typing import List
+
+from src.core.layout import char_units, clear_layout_cache, layout_text, truncate_line, units
+
+
+def _reference_layout(raw_text: str, max_lines: int, box_w_mm: float, box_h_mm: float,
+                      max_text_size: float, min_text_size: float, margin: float, line_gap_mm: float) -> dict:
+    """
+    The exhaustive layout_text this module replaced: a linear sweep over the
+    0.5 mm sizes and every 2- and 3-way split, scored on the same integer
+    advance widths.
+    """
+    def score(s: str) -> int:
+        return sum(char_units(ch) for ch in s)
+
+    def split_no_spaces(value: str, count: int) -> List[str]:
+        n = len(value)
+        if n <= count:
+            return [value] + [""] * (count - 1)
+        best = None
+        if count == 2:
+            for i in range(1, n):
+                pieces = [value[:i], value[i:]]
+                s = max(map(score, pieces))
+                if best is None or s < best[0]:
+                    best = (s, pieces)
+            return best[1]
+        for i in range(1, n - 1):
+            for j in range(i + 1, n):
+                pieces = [value[:i], value[i:j], value[j:]]
+                s = max(map(score, pieces))
+                if best is None or s < best[0]:
+                    best = (s, pieces)
+        return best[1]
+
+    def split_words(value: str, count: int) -> List[str]:
+        words = value.split()
+        if len(words) < count:
+            return split_no_spaces(value, count)
+        best = None
+        if count == 2:
+            for i in range(1, len(words)):
+                pieces = [" ".join(words[:i]), " ".join(words[i:])]
+                s = max(map(score, pieces))
+                if best is None or s < best[0]:
+                    best = (s, pieces)
+            return best[1]
+        for i in range(1, len(words) - 1):
+            for j in range(i + 1, len(words)):
+                pieces = [" ".join(words[:i]), " ".join(words[i:j]), " ".join(words[j:])]
+                s = max(map(score, pieces))
+                if best is None or s < best[0]:
+                    best = (s, pieces)
+        return best[1]
+
+    def wrap(value: str, count: int) -> List[str]:
+        if count <= 1:
+            return [value]
+        return split_words(value, count) if " " in value else split_no_spaces(value, count)
+
+    def offsets(count: int, gap: float) -> List[float]:
+        if count <= 1:
+            return [0.0]
+        mid = (count - 1) / 2.0
+        return [((mid - i) * gap) for i in range(count)]
+
+    def gap_for_height(text_size: float, count: int) -> float:
+        if count <= 1:
+            return 0.0
+        max_gap = (box_h_eff - text_size) / (count - 1)
+        return -1.0 if max_gap < 0 else min(line_gap_mm, max_gap)
+
+    box_w_eff = box_w_mm * margin
+    box_h_eff = box_h_mm * margin
+    if raw_text == "":
+        return {"lines": [""], "text_size": max_text_size, "offsets_y": [0.0], "scale": 1.0,
+                "truncated": False, "warning": "", "line_widths": [0.0]}
+
+    steps = int(round((max_text_size - min_text_size) / 0.5))
+    sizes = [max_text_size - i * 0.5 for i in range(steps + 1)]
+    if sizes[-1] > min_text_size:
+        sizes.append(min_text_size)
+    for text_size in sizes:
+        for count in range(1, max_lines + 1):
+            if count == 1 and text_size > box_h_eff:
+                continue
+            lines = wrap(raw_text, count)
+            widths = [text_size * units(line) for line in lines]
+            if widths and max(widths) > box_w_eff:
+                continue
+            gap = gap_for_height(text_size, count)
+            if gap < 0:
+                continue
+            return {"lines": lines, "text_size": text_size, "offsets_y": offsets(count, gap), "scale": 1.0,
+                    "truncated": False,
+                    "warning": "Line gap reduced to fit the text box." if count > 1 and gap < line_gap_mm else "",
+                    "line_widths": widths, "line_gap_mm": gap}
+
+    final_size = min(min_text_size, box_h_eff) if box_h_eff > 0 else min_text_size
+    lines = wrap(raw_text, max_lines)
+    gap = max(gap_for_height(final_size, len(lines)), 0.0)
+    widths = [final_size * units(line) for line in lines]
+    lines[-1] = truncate_line(lines[-1], final_size, box_w_eff)
+    widths[-1] = final_size * units(lines[-1])
+    warning = "Text truncated to fit the text box."
+    if len(lines) > 1 and gap < line_gap_mm:
+        warning = "Text truncated; line gap reduced to fit the text box."
+    return {"lines": lines, "text_size": final_size, "offsets_y": offsets(len(lines), gap), "scale": 1.0,
+            "truncated": True, "warning": warning, "line_widths": widths, "line_gap_mm": gap}
+
+
+def _random_text(rng: random.Random) -> str:
+    alphabet = "AEIMWVYXKlI1|iortn.-&ß" + "abcdefgh" * 2
+    words = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 9))) for _ in range(rng.randint(1, 5))]
+    return (" " if rng.random() < 0.7 else "").join(words)
+
+
+def test_layout_matches_exhaustive_reference():
+    rng = random.Random(20241018)
+    clear_layout_cache()
+    for _ in range(1500):
+        text = _random_text(rng)
+        args = (
+            rng.randint(1, 3),
+            rng.choice([20.0, 35.0, 50.0, 80.0, rng.uniform(5.0, 120.0)]),
+            rng.choice([8.0, 14.0, 25.0, rng.uniform(2.0, 40.0)]),
+            rng.choice([6.0, 10.0, 14.0]),
+            rng.choice([2.0, 3.0, 4.5]),
+            rng.choice([0.8, 0.9, 1.0]),
+            rng.choice([0.0, 1.5, 4.0]),
+        )
+        assert layout_text(text, *args) == _reference_layout(text, *args), (text, args)
+
+
+def test_layout_is_memoized_per_input():
+    clear_layout_cache()
+    first = layout_text("HELLO WORLD AGAIN", 3, 40.0, 20.0, 10.0, 3.0, 0.9, 1.5)
+    first["lines"].append("mutated")
+    assert layout_text("HELLO WORLD AGAIN", 3, 40.0, 20.0, 10.0, 3.0, 0.9, 1.5)["lines"][-1] != "mutated"
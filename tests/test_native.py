@@ -0,0 +1,39 @@
+import shutil
+
+import pytest
+
+from src.core.catalog import list_templates, load_template
+from src.core.deps import normalize_params
+from src.core.native import DEFAULT_COMPARE_TOLERANCE, _solid, build_native, compare_template, native_available
+from src.core.params import prepare_params
+
+NATIVE_TEMPLATES = [t for t in list_templates() if load_template(t)[0].get("native")]
+OPENSCAD = shutil.which("openscad")
+
+needs_native = pytest.mark.skipif(not native_available(), reason="needs manifold3d, fontTools and Liberation Sans")
+
+
+@needs_native
+@pytest.mark.parametrize("template_id", NATIVE_TEMPLATES)
+def test_native_build_is_a_closed_solid_of_the_template_size(template_id):
+    schema, scad_path = load_template(template_id)
+    params, _ = prepare_params(template_id, schema, {})
+    params = normalize_params(params, scad_path, schema.get("dependencies"))
+    vertices, faces = build_native(schema["native"]["model"], scad_path, params)
+
+    solid = _solid(vertices, faces)
+    assert solid.status().name == "NoError" and solid.volume() > 0
+    w, h = (params["diameter"],) * 2 if "diameter" in params else (params["w"], params["h"])
+    assert vertices.min(axis=0) == pytest.approx([-w / 2, -h / 2, 0], abs=1e-3)
+    assert vertices.max(axis=0)[:2] == pytest.approx([w / 2, h / 2], abs=1e-3)
+    assert vertices.max(axis=0)[2] > params["th"]  # embossed text stands on the plate
+
+
+@needs_native
+@pytest.mark.skipif(OPENSCAD is None, reason="needs the openscad executable")
+@pytest.mark.parametrize("template_id", NATIVE_TEMPLATES)
+def test_native_build_matches_openscad(template_id, tmp_path, record_property):
+    result = compare_template(template_id, OPENSCAD, tmp_path)
+    record_property("xor_ratio", result["xor_ratio"])
+    assert result["native_bounds"] == pytest.approx(result["openscad_bounds"], abs=0.05)
+    assert result["xor_ratio"] < DEFAULT_COMPARE_TOLERANCE
@@ -0,0 +1,121 @@
+import itertools
+import json
+import math
+
+import numpy as np
+import pytest
+
+from src.core.plates import Skyline, load_parts, pack, write_plates
+from src.core.stl_io import read_stl, write_binary_stl
+
+BED = (220.0, 220.0)
+SPACING = 5.0
+MARGIN = 5.0
+TOL = 1e-6
+
+
+def _part(kind, w, h, z=4.0, lo=(-10.0, 3.0, -1.0), job="p"):
+    lo = np.asarray(lo)
+    hi = lo + [w, h, z]
+    return {"job": job, "stl_path": f"{job}.stl", "kind": kind, "w": w, "h": h, "lo": lo.tolist(), "hi": hi.tolist()}
+
+
+def _footprint(p):
+    """
+    ("rect", x0, y0, x1, y1) or ("circle", cx, cy, r) on the plate.
+    """
+    lo, hi, (tx, ty, _) = p["lo"], p["hi"], p["translate"]
+    if p["kind"] == "circle":
+        return ("circle", (lo[0] + hi[0]) / 2 + tx, (lo[1] + hi[1]) / 2 + ty, max(p["w"], p["h"]) / 2)
+    if p["rotated"]:
+        return ("rect", -hi[1] + tx, lo[0] + ty, -lo[1] + tx, hi[0] + ty)
+    return ("rect", lo[0] + tx, lo[1] + ty, hi[0] + tx, hi[1] + ty)
+
+
+def _gap(a, b) -> float:
+    if a[0] == "circle" and b[0] == "circle":
+        return math.hypot(a[1] - b[1], a[2] - b[2]) - a[3] - b[3]
+    if a[0] == "circle":
+        a, b = b, a
+    if b[0] == "circle":
+        dx = max(a[1] - b[1], 0.0, b[1] - a[3])
+        dy = max(a[2] - b[2], 0.0, b[2] - a[4])
+        return math.hypot(dx, dy) - b[3]
+    return max(b[1] - a[3], a[1] - b[3], b[2] - a[4], a[2] - b[4])
+
+
+def _check_plate(placements):
+    shapes = [_footprint(p) for p in placements]
+    for p, s in zip(placements, shapes):
+        if s[0] == "circle":
+            box = (s[1] - s[3], s[2] - s[3], s[1] + s[3], s[2] + s[3])
+        else:
+            box = s[1:]
+        assert box[0] >= MARGIN - TOL and box[1] >= MARGIN - TOL
+        assert box[2] <= BED[0] - MARGIN + TOL and box[3] <= BED[1] - MARGIN + TOL
+        assert p["lo"][2] + p["translate"][2] == pytest.approx(0.0)
+    for a, b in itertools.combinations(shapes, 2):
+        assert _gap(a, b) >= SPACING - TOL
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_mixed_parts_are_packed_in_bed_without_overlap(seed):
+    rng = np.random.default_rng(seed)
+    parts = []
+    for i in range(60):
+        if rng.random() < 0.4:
+            d = float(rng.choice([40.0, 90.0]))
+            parts.append(_part("circle", d, d, lo=(-d / 2, -d / 2, 0.0), job=f"c{i}"))
+        else:
+            w, h = rng.uniform(10, 150), rng.uniform(10, 60)
+            parts.append(_part("rect", w, h, lo=rng.uniform(-50, 50, 3), job=f"r{i}"))
+    plates, unplaced = pack(parts, BED, SPACING, MARGIN)
+    assert unplaced == []
+    assert sorted(p["job"] for plate in plates for p in plate) == sorted(p["job"] for p in parts)
+    for placements in plates:
+        _check_plate(placements)
+    area = sum(p["w"] * p["h"] for p in parts)
+    assert len(plates) <= math.ceil(area / (BED[0] * BED[1]) * 2)
+
+
+def test_tall_parts_are_turned_and_too_big_parts_left_out():
+    parts = [_part("rect", 40, 200, job=f"t{i}") for i in range(4)] + [_part("rect", 300, 10, job="huge")]
+    plates, unplaced = pack(parts, BED, SPACING, MARGIN)
+    assert [p["job"] for p in unplaced] == ["huge"]
+    assert len(plates) == 1
+    assert all(p["rotated"] for p in plates[0])  # lying down they stack lower
+    _check_plate(plates[0])
+    assert not pack(parts[:1], BED, SPACING, MARGIN, rotate=False)[0][0][0]["rotated"]
+
+
+def test_four_quarter_bed_parts_share_one_plate():
+    plates, _ = pack([_part("rect", 100, 100, job=str(i)) for i in range(4)], BED, SPACING, MARGIN)
+    assert len(plates) == 1 and len(plates[0]) == 4
+
+
+def test_skyline_places_bottom_left_first():
+    sky = Skyline(100, 100)
+    assert sky.place(*sky.find(60, 10)[2:], 60, 10) == (0.0, 0.0)
+    # (top, x): the 40 mm gap beside the first piece is lower, when it fits
+    assert sky.find(40, 10)[:2] == (10.0, 60.0)
+    assert sky.find(50, 10)[:2] == (20.0, 0.0)
+    assert sky.find(101, 1) is None
+
+
+def test_written_plates_match_their_placements(tmp_path):
+    box_v = np.array([[x, y, z] for x in (0, 30) for y in (0, 20) for z in (2, 6)], dtype=float) - [15, 10, 0]
+    box_f = np.array([[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5], [0, 5, 1],
+                      [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3]])
+    job = tmp_path / "out" / "box"
+    write_binary_stl(job / "model_1.stl", box_v, box_f)
+    (job / "report.json").write_text(json.dumps({"ok": True}))
+    parts, skipped = load_parts([tmp_path / "out"], copies=3)
+    assert skipped == [] and len(parts) == 3 and (parts[0]["w"], parts[0]["h"]) == (30, 20)
+
+    plates, unplaced = pack(parts, BED, SPACING, MARGIN)
+    manifest = json.loads(write_plates(plates, tmp_path / "plates", unplaced, BED).read_text())
+    assert [p["parts"] for p in manifest["plates"]] == [3]
+    vertices, faces = read_stl(manifest["plates"][0]["stl_path"])
+    assert len(faces) == 36
+    assert vertices.min(axis=0)[2] == 0 and vertices.max(axis=0)[2] == 4
+    assert vertices[:, :2].min() >= MARGIN - TOL and vertices[:, :2].max() <= BED[0] - MARGIN + TOL
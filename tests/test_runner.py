@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from src.core.runner import run_openscad, run_openscad_async
+
+STUB = str(Path(__file__).resolve().parents[1] / "benchmarks" / "stub_openscad.py")
+SLEEPER = f"""#!{sys.executable}
+import os, sys, time
+print("pid", os.getpid(), flush=True)
+time.sleep(60)
+"""
+
+
+@pytest.fixture
+def sleeper(tmp_path):
+    path = tmp_path / "sleepy_openscad"
+    path.write_text(SLEEPER)
+    path.chmod(0o755)
+    return str(path)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def _pid_from(lines) -> int:
+    return int(next(line for stream, line in lines if line.startswith("pid")).split()[1])
+
+
+def test_async_render_streams_lines(tmp_path):
+    lines = []
+    logs = asyncio.run(run_openscad_async(STUB, tmp_path / "a.scad", tmp_path / "a.stl", {"w": 20},
+                                          on_line=lambda stream, line: lines.append((stream, line))))
+    assert "Total rendering time" in logs
+    assert any("Total rendering time" in line for _, line in lines)
+    assert (tmp_path / "a.stl").stat().st_size > 84
+
+
+def test_async_timeout_kills_the_child(tmp_path, sleeper):
+    lines = []
+    t0 = time.monotonic()
+    with pytest.raises(RuntimeError, match="timed out after 1.0s"):
+        asyncio.run(run_openscad_async(sleeper, tmp_path / "a.scad", tmp_path / "a.stl", {}, timeout=1.0,
+                                       on_line=lambda stream, line: lines.append((stream, line))))
+    assert time.monotonic() - t0 < 30
+    assert not _alive(_pid_from(lines))
+
+
+def test_async_cancel_kills_the_child(tmp_path, sleeper):
+    lines = []
+
+    async def main():
+        task = asyncio.create_task(run_openscad_async(sleeper, tmp_path / "a.scad", tmp_path / "a.stl", {},
+                                                      on_line=lambda stream, line: lines.append((stream, line))))
+        while not lines:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(asyncio.wait_for(main(), 30))
+    assert not _alive(_pid_from(lines))
+
+
+def test_sync_timeout_kills_the_child(tmp_path, sleeper):
+    t0 = time.monotonic()
+    with pytest.raises(RuntimeError, match="timed out") as exc:
+        run_openscad(sleeper, tmp_path / "a.scad", tmp_path / "a.stl", {}, timeout=1.0)
+    assert time.monotonic() - t0 < 30
+    pid = int(str(exc.value).split("pid", 1)[1].split()[0])
+    assert not _alive(pid)
@@ -0,0 +1,134 @@
+import http.client
+import json
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import src.core.service as service_module
+from src.core.service import BuildService, make_server
+
+STUB = str(Path(__file__).resolve().parents[1] / "benchmarks" / "stub_openscad.py")
+
+
+@pytest.fixture
+def serve(tmp_path):
+    started = []
+
+    def start(**kwargs):
+        service = BuildService(STUB, tmp_path / "out", **kwargs)
+        server = make_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started.append((server, service))
+        return server.server_address[1], service
+
+    yield start
+    for server, service in started:
+        server.shutdown()
+        server.server_close()
+        service.shutdown()
+
+
+def _request(port, method, path, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    data = body if isinstance(body, (bytes, type(None))) else json.dumps(body).encode("utf-8")
+    conn.request(method, path, body=data, headers={"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    raw = resp.read()
+    conn.close()
+    payload = json.loads(raw) if resp.getheader("Content-Type") == "application/json" else raw
+    return resp.status, dict(resp.getheaders()), payload
+
+
+def _wait_for(service, job_id, states, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = service.status(job_id)
+        if status and status["status"] in states:
+            return status
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} never reached {states}")
+
+
+@pytest.mark.parametrize("body", [
+    [],
+    "nameplate",
+    {"template_id": "nameplate", "params": []},
+    {"template_id": "nameplate", "params": "x"},
+    {"template_id": "nameplate", "emblem_svg": 3},
+    {"template_id": "no_such_template"},
+])
+def test_bad_job_requests_get_400(serve, body):
+    port, _ = serve(workers=1)
+    code, _, payload = _request(port, "POST", "/jobs", body)
+    assert code == 400
+    assert payload["error"]
+
+
+@pytest.mark.parametrize("path", ["/jobs?limit=abc", "/jobs?offset=-1", "/jobs/x/thumbnail?size=big",
+                                  "/jobs/x/thumbnail?size=100"])
+def test_bad_query_ints_get_400(serve, path):
+    port, _ = serve(workers=1)
+    code, _, payload = _request(port, "GET", path)
+    assert code == 400 and payload["error"]
+
+
+def test_malformed_json_gets_400(serve):
+    port, _ = serve(workers=1)
+    code, _, payload = _request(port, "POST", "/jobs", b"{not json")
+    assert code == 400 and payload["error"].startswith("bad request")
+
+
+def test_full_queue_answers_429_with_retry_after(serve, monkeypatch):
+    release = threading.Event()
+    original = service_module.build_job
+
+    def held_build_job(*args, **kwargs):
+        release.wait(30)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(service_module, "build_job", held_build_job)
+    port, service = serve(workers=1, queue_size=1)
+    try:
+        first = _request(port, "POST", "/jobs", {"template_id": "nameplate", "params": {"line1": "A"}})
+        assert first[0] == 202
+        _wait_for(service, first[2]["job_id"], {"running"})
+        assert _request(port, "POST", "/jobs", {"template_id": "nameplate", "params": {"line1": "B"}})[0] == 202
+        code, headers, payload = _request(port, "POST", "/jobs", {"template_id": "nameplate", "params": {"line1": "C"}})
+        assert code == 429
+        assert headers["Retry-After"] == "5"
+        assert payload == {"error": "queue full"}
+    finally:
+        release.set()
+
+
+def test_identical_geometry_gets_the_same_job_id(serve):
+    port, service = serve(workers=1)
+    spec = {"template_id": "coaster_round", "params": {"line1": "A", "rim": 0, "rim_w": 2}}
+    code, headers, first = _request(port, "POST", "/jobs", spec)
+    assert code == 202 and headers["Location"] == f"/jobs/{first['job_id']}"
+    # rim_w is dead without a rim, so this is the same geometry
+    same = {"template_id": "coaster_round", "params": {"line1": "A", "rim": 0, "rim_w": 3}}
+    code, _, second = _request(port, "POST", "/jobs", same)
+    assert code == 200 and second["job_id"] == first["job_id"]
+    other = {"template_id": "coaster_round", "params": {"line1": "B", "rim": 0}}
+    assert _request(port, "POST", "/jobs", other)[2]["job_id"] != first["job_id"]
+
+    assert _wait_for(service, first["job_id"], {"done", "failed"})["status"] == "done"
+    code, _, stl = _request(port, "GET", f"/jobs/{first['job_id']}/stl")
+    assert code == 200 and len(stl) > 84
+
+
+def test_emblem_job_ids_follow_the_emblem_content(serve, monkeypatch):
+    def no_build(*args, **kwargs):
+        raise RuntimeError("not built")  # only the ids matter here
+
+    monkeypatch.setattr(service_module, "build_job", no_build)
+    port, _ = serve(workers=1)
+    svg = '<svg xmlns="http://www.w3.org/2000/svg"><rect width="{}" height="10"/></svg>'
+    ids = []
+    for width in (10, 10, 20):
+        spec = {"template_id": "nameplate", "params": {"line1": "A"}, "emblem_svg": svg.format(width)}
+        ids.append(_request(port, "POST", "/jobs", spec)[2]["job_id"])
+    assert ids[0] == ids[1] != ids[2]
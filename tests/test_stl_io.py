@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+
+from src.core import stl_io
+from src.core.stl_io import is_binary_stl, read_stl, read_triangles, stl_info, write_binary_stl
+
+RNG = np.random.default_rng(0)
+# a closed tetrahedron with awkward coordinates, including -0.0
+VERTICES = np.array([[-0.0, 0.0, 0.0], [12.345678, -0.1, 0.0], [0.5, 7.25e-3, 0.0], [1.0, 2.0, -33.333333]],
+                    dtype=np.float32)
+FACES = np.array([[0, 2, 1], [0, 1, 3], [1, 2, 3], [2, 0, 3]])
+
+
+def _write_ascii(path, vertices, faces):
+    lines = ["solid test"]
+    for face in faces:
+        lines += ["  facet normal 0 0 0", "    outer loop"]
+        lines += [f"      vertex {x!r} {y!r} {z!r}" for x, y, z in vertices[face].tolist()]
+        lines += ["    endloop", "  endfacet"]
+    path.write_text("\n".join(lines + ["endsolid test"]) + "\n")
+
+
+def test_binary_and_ascii_load_the_same_mesh(tmp_path):
+    vertices = np.vstack([VERTICES, RNG.uniform(-100, 100, (200, 3)).astype(np.float32)])
+    faces = np.vstack([FACES, RNG.integers(0, len(vertices), (300, 3))])
+    write_binary_stl(tmp_path / "m.stl", vertices, faces)
+    _write_ascii(tmp_path / "m_ascii.stl", vertices, faces)
+
+    assert is_binary_stl(tmp_path / "m.stl") and not is_binary_stl(tmp_path / "m_ascii.stl")
+    tris = read_triangles(tmp_path / "m.stl")
+    np.testing.assert_array_equal(tris, vertices[faces])
+    np.testing.assert_array_equal(read_triangles(tmp_path / "m_ascii.stl"), tris)
+
+    bv, bf = read_stl(tmp_path / "m.stl")
+    av, af = read_stl(tmp_path / "m_ascii.stl")
+    np.testing.assert_array_equal(bv, av)
+    np.testing.assert_array_equal(bf, af)
+    np.testing.assert_array_equal(bv[bf], vertices[faces] + np.float32(0.0))
+
+
+def test_ascii_reader_handles_lines_split_across_chunks(tmp_path):
+    _write_ascii(tmp_path / "t.stl", VERTICES, FACES)
+    whole = read_triangles(tmp_path / "t.stl")
+    chunks = np.concatenate(list(stl_io._iter_ascii_vertices(tmp_path / "t.stl", 7)))
+    np.testing.assert_array_equal(chunks.reshape(-1, 3, 3), whole)
+    assert len(whole) == 4
+
+
+def test_negative_zero_merges_with_zero(tmp_path):
+    write_binary_stl(tmp_path / "t.stl", VERTICES, FACES)
+    vertices, faces = read_stl(tmp_path / "t.stl")
+    assert len(vertices) == 4 and faces.shape == (4, 3)
+
+
+def test_binary_header_starting_with_solid_is_still_binary(tmp_path):
+    write_binary_stl(tmp_path / "t.stl", VERTICES, FACES, header="solid exported by some CAD tool")
+    assert stl_info(tmp_path / "t.stl") == {"format": "binary", "triangles": 4,
+                                            "header": "solid exported by some CAD tool"}
+    np.testing.assert_array_equal(read_triangles(tmp_path / "t.stl"), VERTICES[FACES])
+
+
+def test_write_replaces_instead_of_rewriting_a_hardlinked_file(tmp_path):
+    write_binary_stl(tmp_path / "entry.stl", VERTICES, FACES)
+    before = (tmp_path / "entry.stl").read_bytes()
+    os.link(tmp_path / "entry.stl", tmp_path / "job.stl")
+    write_binary_stl(tmp_path / "job.stl", VERTICES * 2, FACES)
+    assert (tmp_path / "entry.stl").read_bytes() == before
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["entry.stl", "job.stl"]
@@ -0,0 +1,37 @@
+import csv
+from pathlib import Path
+
+import src.core.batch as batch
+from src.core.sweep import RESULT_COLUMNS, plan_sweep, run_sweep, write_results
+
+STUB = str(Path(__file__).resolve().parents[1] / "benchmarks" / "stub_openscad.py")
+# rim_w only matters with a rim, so the first two points are one geometry
+POINTS = [{"rim": 0, "rim_w": 2}, {"rim": 0, "rim_w": 3}, {"rim": 1, "rim_w": 2}, {"rim": 1, "rim_w": 3}]
+
+
+def test_plan_dedupes_points_with_the_same_geometry():
+    plan = plan_sweep("coaster_round", POINTS, {"line1": "A"})
+    assert [e["duplicate_of"] for e in plan] == [None, 0, None, None]
+    assert plan[0]["key"] == plan[1]["key"] != plan[2]["key"]
+    params, _ = plan[0]["prepared"]
+    assert params["line1"] == "A" and params["rim"] == 0
+
+
+def test_run_sweep_builds_each_geometry_once_without_preparing_again(tmp_path, monkeypatch):
+    calls = []
+    original = batch.prepare_params_many
+    monkeypatch.setattr(batch, "prepare_params_many", lambda *a: calls.append(a) or original(*a))
+    table = run_sweep("coaster_round", POINTS, {"line1": "A"}, openscad_exe=STUB, out_dir=tmp_path,
+                      workers=2, use_cache=False, name="t")
+    assert calls == []
+    assert [r["point"] for r in table] == [0, 1, 2, 3]
+    assert all(r["ok"] for r in table)
+    assert table[1]["job_name"] == table[0]["job_name"] == "t_00000"
+    assert len({r["job_name"] for r in table}) == 3
+    assert all(r["build_s"] is not None for r in table)
+
+    out = tmp_path / "results.csv"
+    write_results(table, out)
+    with out.open() as f:
+        header = next(csv.reader(f))
+    assert header == ["rim", "rim_w"] + RESULT_COLUMNS
@@ -0,0 +1,84 @@
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.core.validate import CHECKS, MeshArrays, enabled_checks, validate_stl, wall_thickness_samples
+
+STUB = str(Path(__file__).resolve().parents[1] / "benchmarks" / "stub_openscad.py")
+CUBE_V = np.array([[(i >> 2) & 1, (i >> 1) & 1, i & 1] for i in range(8)], dtype=float) * 10.0
+CUBE_F = np.array([
+    [0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5],
+    [0, 4, 5], [0, 5, 1], [2, 3, 7], [2, 7, 6],
+    [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3],
+])
+
+
+def _run_all(vertices, faces, config=None) -> dict:
+    mesh = MeshArrays(vertices, faces)
+    report = {}
+    for check in CHECKS.values():
+        report.update(check(mesh, config or {}))
+    return report
+
+
+def test_checks_on_a_closed_cube():
+    r = _run_all(CUBE_V, CUBE_F)
+    assert r["bounds_min"] == [0, 0, 0] and r["bounds_max"] == [10, 10, 10]
+    assert r["size_xyz_mm"] == [10, 10, 10]
+    assert r["watertight"] is True
+    assert (r["non_manifold_edges"], r["boundary_edges"]) == (0, 0)
+    assert r["volume_mm3"] == pytest.approx(1000.0)
+    assert r["surface_area_mm2"] == pytest.approx(600.0)
+    assert r["inverted"] is False
+    assert r["degenerate_faces"] == 0
+    assert r["mean_wall_mm_est"] == pytest.approx(2000.0 / 600.0)
+    assert r["min_wall_mm"] == pytest.approx(10.0)
+    assert r["wall_samples"] == 12
+    assert r["thin_wall_warning"] is False
+    assert r["filament_g_est"] == pytest.approx(1.24)
+
+
+def test_checks_on_an_open_mesh():
+    r = _run_all(CUBE_V, CUBE_F[1:])
+    assert r["watertight"] is False
+    assert (r["non_manifold_edges"], r["boundary_edges"]) == (0, 3)
+    # rays through the missing face escape; the rest still see the 10 mm wall
+    assert r["wall_samples"] < 11
+    assert r["min_wall_mm"] == pytest.approx(10.0)
+
+
+def test_checks_flag_non_manifold_degenerate_and_inverted_faces():
+    faces = np.vstack([CUBE_F, [[0, 1, 7]], [[2, 2, 5]]])
+    r = _run_all(CUBE_V, faces)
+    assert r["non_manifold_edges"] >= 1
+    assert r["degenerate_faces"] == 1
+
+    r = _run_all(CUBE_V, CUBE_F[:, ::-1])
+    assert r["inverted"] is True
+    assert r["volume_mm3"] == pytest.approx(1000.0)
+    assert r["min_wall_mm"] == pytest.approx(10.0)
+
+
+def test_thin_wall_uses_ray_thickness_not_edge_length():
+    # a 40 x 40 x 0.5 slab: thin however finely it is tessellated
+    slab = CUBE_V * [4.0, 4.0, 0.05]
+    r = _run_all(slab, CUBE_F, {"min_wall_mm": 0.8})
+    assert r["min_wall_mm"] == pytest.approx(0.5)
+    assert r["thin_wall_warning"] is True
+    assert "min_feature_mm_est" not in r
+    depths = wall_thickness_samples(MeshArrays(slab, CUBE_F), samples=4)
+    assert len(depths) == 4 and np.all(np.isfinite(depths))
+
+
+def test_validate_stl_runs_enabled_checks(tmp_path):
+    out = tmp_path / "box.stl"
+    subprocess.run([STUB, "-o", str(out), "-D", "w=40", "-D", "h=20", "-D", "th=3", "x.scad"], check=True)
+    report = validate_stl(out, {"disable": ["thin_wall", "filament"]})
+    assert report["ok"] and report["watertight"]
+    assert report["size_xyz_mm"] == pytest.approx([40, 20, 3])
+    assert "min_wall_mm" not in report and "filament_g_est" not in report
+    assert set(report["check_timings_ms"]) == {"load", "bounds", "watertight", "manifold", "volume", "degenerate"}
+    assert enabled_checks({"checks": ["volume"], "disable": ["watertight"]}) == ["bounds", "watertight", "volume"]
+    assert validate_stl(tmp_path / "missing.stl") == {"ok": False, "error": "STL missing"}
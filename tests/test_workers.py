@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from src.core.workers import RenderThreadPool
+
+STUB = str(Path(__file__).resolve().parents[1] / "benchmarks" / "stub_openscad.py")
+
+
+def test_workers_warm_up_at_start_and_split_timings(tmp_path):
+    pool = RenderThreadPool(workers=2, openscad_exe=STUB, root=tmp_path / "workers")
+    try:
+        timings = {}
+        logs = pool.run_openscad(STUB, tmp_path / "a.scad", tmp_path / "a.stl", {"w": 20}, timings=timings)
+        assert "Total rendering time" in logs
+        assert (tmp_path / "a.stl").exists()
+        assert set(timings) == {"wall_s", "startup_s", "openscad_render_s"}
+        assert abs(timings["startup_s"] + timings["openscad_render_s"] - timings["wall_s"]) < 1e-9
+    finally:
+        pool.shutdown()
+    stats = pool.stats()
+    assert (stats["jobs"], stats["warmups"], stats["timed"]) == (1, 2, 1)
+    for i in range(2):
+        assert (tmp_path / "workers" / f"worker-{i}" / "cache").is_dir()
+        assert (tmp_path / "workers" / f"worker-{i}" / "warm.stl").exists()
+
+
+def test_workers_warm_up_before_first_job_for_an_executable(tmp_path):
+    pool = RenderThreadPool(workers=1, root=tmp_path / "workers")
+    try:
+        for i in range(3):
+            pool.run_openscad(STUB, tmp_path / "a.scad", tmp_path / f"{i}.stl", {})
+    finally:
+        pool.shutdown()
+    stats = pool.stats()
+    assert (stats["jobs"], stats["warmups"]) == (3, 1)
@@ -0,0 +1,82 @@
+"""
+Generates the glyph advance-width table used by src.core.font_metrics.
+
+    python tools/gen_font_metrics.py /path/to/LiberationSans-Regular.ttf \
+        -o src/core/fonts/liberation_sans.json
+
+Reads advances from the font's hmtx table with fontTools and keeps them in
+the font's own units per em. fontTools is only needed to regenerate the
+table.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import unicodedata
+from pathlib import Path
+
+# OpenSCAD's text(size=s) uses an em of s / 0.72 (size is given in points at
+# 72 dpi mapped to mm, so cap height lands close to s).
+SIZE_TO_EM = 1 / 0.72
+FIRST_CODEPOINT = 32
+LAST_CODEPOINT = 255
+EXTRA_CODEPOINTS = [0x2013, 0x2014, 0x2018, 0x2019, 0x201C, 0x201D, 0x2022, 0x2026, 0x20AC]
+
+
+def codepoints() -> list:
+    cps = list(range(FIRST_CODEPOINT, LAST_CODEPOINT + 1)) + EXTRA_CODEPOINTS
+    return [cp for cp in cps if not unicodedata.category(chr(cp)).startswith("C")]
+
+
+def widths_from_ttf(path: Path) -> dict:
+    from fontTools.ttLib import TTFont
+
+    font = TTFont(str(path))
+    cmap = font.getBestCmap()
+    hmtx = font["hmtx"]
+    out = {}
+    for cp in codepoints():
+        glyph = cmap.get(cp)
+        if glyph is not None:
+            out[cp] = hmtx[glyph][0]
+    names = font["name"]
+    name = names.getDebugName(4) or path.stem
+    version = names.getDebugName(5)
+    return {
+        "font": f"{name} ({version})" if version else name,
+        "units_per_em": font["head"].unitsPerEm,
+        "widths": out,
+    }
+
+
+def build_table(source: dict, font_label: str) -> dict:
+    widths = source["widths"]
+    default = widths.get(ord("0"), source["units_per_em"] // 2)
+    dense = [widths.get(cp, 0) for cp in range(FIRST_CODEPOINT, LAST_CODEPOINT + 1)]
+    return {
+        "font": font_label,
+        "source": source["font"],
+        "units_per_em": source["units_per_em"],
+        "size_to_em": SIZE_TO_EM,
+        "default": default,
+        "first_codepoint": FIRST_CODEPOINT,
+        "widths": dense,
+        "extra": {str(cp): widths[cp] for cp in EXTRA_CODEPOINTS if cp in widths},
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Generate a glyph advance-width table.")
+    parser.add_argument("font", type=Path, help="TTF/OTF font file")
+    parser.add_argument("--label", default="Liberation Sans", help="Font name as used by OpenSCAD")
+    parser.add_argument("-o", "--output", type=Path, required=True)
+    args = parser.parse_args(argv)
+
+    source = widths_from_ttf(args.font)
+    table = build_table(source, args.label)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(table, separators=(",", ":")) + "\n")
+
+
+if __name__ == "__main__":
+    main()